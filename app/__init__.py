@@ -1,11 +1,12 @@
 # app/__init__.py
-from flask import Flask, Blueprint, render_template, request, jsonify, flash, redirect, url_for, send_from_directory
+from flask import Flask, Blueprint, render_template, request, jsonify, flash, redirect, url_for, send_from_directory, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from config import Config
 import os
 import logging
+import mimetypes
 from logging.handlers import RotatingFileHandler
 from flask_mail import Mail
 from flask_apscheduler import APScheduler
@@ -53,11 +54,28 @@ def create_app(config_class=Config):
     app.register_blueprint(connect_points_bp, url_prefix='/api/connect-points')
     app.register_blueprint(academy_bp)
 
+    # Query counts and timing per request (Server-Timing, N+1 warnings)
+    from app.utils.query_stats import init_query_stats
+    init_query_stats(app)
+
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+
     # Schedule jobs
     from app.utils.scheduler import init_scheduler_jobs
     with app.app_context():
         init_scheduler_jobs(scheduler)
         
+    # Deliver queued emails in the background from processes that serve requests,
+    # so CLI commands never start workers (tests drain the outbox explicitly)
+    if not app.testing and app.config['EMAIL_WORKERS']:
+        from app.utils.email_outbox import start_email_workers
+
+        @app.before_request
+        def ensure_email_workers():
+            start_email_workers(app)
+        
     # Ensure the upload directories exist
     os.makedirs(app.config['PROFILE_PICS_FOLDER'], exist_ok=True)
     os.makedirs(app.config['SHOWCASE_IMAGES_FOLDER'], exist_ok=True)
@@ -80,9 +98,37 @@ def create_app(config_class=Config):
     # Configure static files with longer cache time for uploaded images
     @app.route('/static/uploads/<path:filename>')
     def serve_uploads(filename):
-        response = send_from_directory(app.config['UPLOAD_FOLDER'], filename)
-        cache_time = app.config.get('STATIC_CACHE_TIMEOUT', 60*60*24*7)  # Default to 7 days
-        response.headers['Cache-Control'] = f'max-age={cache_time}, public'
+        from werkzeug.security import safe_join
+        from app.utils.file_store import blob_etag
+
+        full_path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+        if full_path is None or not os.path.isfile(full_path):
+            abort(404)
+
+        # Content-addressed files never change, so their name is a strong ETag
+        etag = blob_etag(filename)
+        if etag:
+            cache_control = 'max-age=31536000, public, immutable'
+        else:
+            cache_time = app.config.get('STATIC_CACHE_TIMEOUT', 60*60*24*7)  # Default to 7 days
+            cache_control = f'max-age={cache_time}, public'
+
+        accel_prefix = app.config.get('UPLOADS_ACCEL_REDIRECT_PREFIX')
+        if accel_prefix:
+            # Let nginx send the bytes (and handle ranges) from an internal location
+            stat = os.stat(full_path)
+            response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{filename}"
+            response.set_etag(etag or f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+            response.last_modified = stat.st_mtime
+            response.make_conditional(request)
+        else:
+            # Answers If-None-Match / If-Modified-Since with 304 and serves byte ranges;
+            # USE_X_SENDFILE hands the file to the front server instead
+            response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, etag=etag or True)
+
+        response.headers['Cache-Control'] = cache_control
+        response.accept_ranges = 'bytes'
         return response
 
     # Set up logging
@@ -0,0 +1,84 @@
+# app/cli.py
+import click
+from flask.cli import AppGroup
+
+ratings_cli = AppGroup('ratings', help='Coach rating summary maintenance.')
+
+@ratings_cli.command('rebuild')
+@click.option('--coach-id', type=int, default=None, help='Only rebuild the summary for this coach.')
+def rebuild_ratings(coach_id):
+    """Recompute coach rating summaries from CoachRating rows"""
+    from app.models.rating import CoachRatingSummary
+    rebuilt = CoachRatingSummary.rebuild(coach_id=coach_id)
+    click.echo(f"Rebuilt rating summaries for {rebuilt} coach(es)")
+
+search_cli = AppGroup('search', help='Full-text search index maintenance.')
+
+@search_cli.command('rebuild')
+def rebuild_search():
+    """Rebuild the coach and academy full-text search index"""
+    from app.utils.search import rebuild_search_index
+    counts = rebuild_search_index()
+    if counts is None:
+        click.echo("Full-text search is not available on this database")
+        return
+    click.echo(f"Indexed {counts[0]} coach(es) and {counts[1]} academy(ies)")
+
+courts_cli = AppGroup('courts', help='Court data maintenance.')
+
+@courts_cli.command('geocode')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--overwrite', is_flag=True, help='Also replace coordinates that are already set.')
+def geocode_courts(csv_path, overwrite):
+    """Set court coordinates from a local CSV/gazetteer file"""
+    from app.utils.geo import import_court_coordinates
+    updated, unmatched = import_court_coordinates(csv_path, overwrite=overwrite)
+    click.echo(f"Geocoded {updated} court(s), {unmatched} without a match")
+
+email_cli = AppGroup('email', help='Email outbox delivery.')
+
+@email_cli.command('drain')
+def drain_email():
+    """Send every due email in the outbox now"""
+    from app.utils.email_outbox import drain_outbox
+    sent, failed = drain_outbox()
+    click.echo(f"Sent {sent} email(s), {failed} failed or rescheduled")
+
+@email_cli.command('debug-server')
+@click.option('--host', default='127.0.0.1', help='Address to listen on.')
+@click.option('--port', type=int, default=1025, help='Port to listen on.')
+def email_debug_server(host, port):
+    """Run a local SMTP server that prints every message it receives"""
+    from app.utils.smtp_debug import DebugSMTPServer
+    server = DebugSMTPServer((host, port), echo=True)
+    click.echo(f"Debugging SMTP server on {host}:{server.port}; set MAIL_SERVER={host} MAIL_PORT={server.port} MAIL_USE_TLS=false")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+rollup_cli = AppGroup('rollup', help='Daily booking revenue rollup maintenance.')
+
+@rollup_cli.command('rebuild')
+@click.option('--from', 'start_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only rebuild days from this date (YYYY-MM-DD).')
+@click.option('--to', 'end_date', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only rebuild days up to this date (YYYY-MM-DD).')
+def rebuild_rollup(start_date, end_date):
+    """Recompute the daily booking rollup from completed bookings"""
+    from app.models.booking_rollup import BookingDailyRollup
+    rows = BookingDailyRollup.rebuild(
+        start_date=start_date.date() if start_date else None,
+        end_date=end_date.date() if end_date else None
+    )
+    click.echo(f"Rebuilt {rows} rollup row(s)")
+
+def register_commands(app):
+    """Attach maintenance commands to the Flask CLI"""
+    app.cli.add_command(ratings_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(courts_cli)
+    app.cli.add_command(email_cli)
+    app.cli.add_command(rollup_cli)
@@ -1,6 +1,6 @@
 # app/models/__init__.py
 from app.models.user import User
-from app.models.coach import Coach
+from app.models.coach import Coach, CoachImage, CoachProfileVersion
 from app.models.court import Court, CoachCourt
 from app.models.court_fee import CourtFee
 from app.models.connect_points import ConnectPointsConfig, ConnectPoints, ConnectVoucher
@@ -12,6 +12,11 @@ from app.models.package import BookingPackage, booking_package_association
 from app.models.academy import Academy, AcademyCoach, AcademyManager
 from app.models.academy_pricing import AcademyPricingPlan  # New model
 from app.models.payment import PaymentProof
+from app.models.booking_rollup import BookingDailyRollup
+from app.models.image import ImageVariant
+from app.models.stored_file import StoredFile
 from app.models.notification import Notification
+from app.models.email_outbox import EmailOutbox
 from app.models.tag import Tag, CoachTag
+from app.models.rating import CoachRating, CoachRatingSummary
 from app.models.booking import Availability, Booking, AvailabilityReservation
\ No newline at end of file
@@ -1,6 +1,7 @@
 # app/models/booking.py (updated)
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import column_property
 
 class Availability(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -25,17 +26,19 @@ class Availability(db.Model):
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    coach_id = db.Column(db.Integer, db.ForeignKey('coach.id'), nullable=False)
-    court_id = db.Column(db.Integer, db.ForeignKey('court.id'), nullable=False)
+    # active_history keeps the previous values of the columns BookingDailyRollup
+    # depends on around, so the rollup can be adjusted on update
+    coach_id = column_property(db.Column(db.Integer, db.ForeignKey('coach.id'), nullable=False), active_history=True)
+    court_id = column_property(db.Column(db.Integer, db.ForeignKey('court.id'), nullable=False), active_history=True)
     availability_id = db.Column(db.Integer, db.ForeignKey('availability.id'), nullable=False)
-    date = db.Column(db.Date, nullable=False)
+    date = column_property(db.Column(db.Date, nullable=False), active_history=True)
     start_time = db.Column(db.Time, nullable=False)
     end_time = db.Column(db.Time, nullable=False)
     base_price = db.Column(db.Float, nullable=False)  # Original price before discount
-    price = db.Column(db.Float, nullable=False)       # Final price after discount
-    court_fee = db.Column(db.Float, nullable=False, default=0.0)  # Court fee component
-    coach_fee = db.Column(db.Float, nullable=False)               # Coach fee component
-    status = db.Column(db.String(20), default='upcoming')  # 'upcoming', 'completed', 'cancelled'
+    price = column_property(db.Column(db.Float, nullable=False), active_history=True)  # Final price after discount
+    court_fee = column_property(db.Column(db.Float, nullable=False, default=0.0), active_history=True)  # Court fee component
+    coach_fee = column_property(db.Column(db.Float, nullable=False), active_history=True)  # Coach fee component
+    status = column_property(db.Column(db.String(20), default='upcoming'), active_history=True)  # 'upcoming', 'completed', 'cancelled'
     venue_confirmed = db.Column(db.Boolean, default=False)
     coaching_payment_required = db.Column(db.Boolean, default=True)
     coaching_payment_status = db.Column(db.String(20), default='pending')  # 'pending', 'uploaded', 'approved', 'rejected'
@@ -49,8 +52,13 @@ class Booking(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Track applied discount if any
-    pricing_plan_id = db.Column(db.Integer, db.ForeignKey('pricing_plan.id'), nullable=True)
-    discount_amount = db.Column(db.Float, nullable=True)
+    pricing_plan_id = column_property(db.Column(db.Integer, db.ForeignKey('pricing_plan.id'), nullable=True), active_history=True)
+    # The plan's discount_type when it was applied ('regular' without a plan) and the
+    # coach's academy when the booking was made, so the booking keeps its rollup key
+    # if the plan or the coach's affiliation changes later
+    discount_type = column_property(db.Column(db.String(20), nullable=True), active_history=True)
+    academy_id = column_property(db.Column(db.Integer, nullable=True), active_history=True)
+    discount_amount = column_property(db.Column(db.Float, nullable=True), active_history=True)
     discount_percentage = db.Column(db.Float, nullable=True)
     
     # Unique constraint to prevent double bookings
@@ -120,7 +128,7 @@ class AvailabilityReservation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     availability_id = db.Column(db.Integer, db.ForeignKey('availability.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    reservation_token = db.Column(db.String(64), unique=True, nullable=False)
+    reservation_token = db.Column(db.String(64), index=True, nullable=False)  # Shared by all slots held in one checkout
     expires_at = db.Column(db.DateTime, nullable=False)  # Typically 15 minutes from creation
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -131,4 +139,28 @@ class AvailabilityReservation(db.Model):
     # Create a unique constraint to prevent multiple reservations for the same availability
     __table_args__ = (
         db.UniqueConstraint('availability_id', name='unique_availability_reservation'),
-    )
\ No newline at end of file
+    )
+
+class BookingCheckout(db.Model):
+    """Outcome of a create-with-proofs checkout, keyed by the client's idempotency key.
+
+    The row is claimed in the same transaction that creates the bookings, so a
+    double-submitted checkout either waits for and replays the original response or
+    is told it is still being processed.
+    """
+    __tablename__ = 'booking_checkout'
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    confirmation_number = db.Column(db.String(20), nullable=True)
+    response = db.Column(db.JSON, nullable=True)  # Stored success payload, replayed on retries
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'idempotency_key', name='unique_checkout_idempotency_key'),
+    )
+
+    def __repr__(self):
+        return f'<BookingCheckout {self.student_id} {self.idempotency_key}>'
+
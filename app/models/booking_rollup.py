@@ -0,0 +1,211 @@
+# app/models/booking_rollup.py
+from app import db
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.booking import Booking
+from app.models.pricing import PricingPlan
+from app.models.academy import AcademyCoach
+
+# Booking columns that decide whether and where a booking is counted
+ROLLUP_KEY_COLUMNS = ('status', 'date', 'coach_id', 'court_id', 'academy_id', 'discount_type')
+ROLLUP_AMOUNT_COLUMNS = ('price', 'coach_fee', 'court_fee', 'discount_amount')
+ROLLUP_METRICS = ('sessions', 'gross', 'coach_fees', 'court_fees', 'discounts')
+
+class BookingDailyRollup(db.Model):
+    """Completed bookings summed per day, coach, court, academy and pricing plan type.
+
+    Kept in sync with Booking by the mapper events below, so earnings and
+    analytics read a few rows per day instead of every completed booking.
+    """
+    __tablename__ = 'booking_daily_rollup'
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    coach_id = db.Column(db.Integer, db.ForeignKey('coach.id'), nullable=False)
+    court_id = db.Column(db.Integer, db.ForeignKey('court.id'), nullable=False)
+    academy_id = db.Column(db.Integer, nullable=False, default=0)  # Booking.academy_id, 0 for none
+    discount_type = db.Column(db.String(20), nullable=False, default='regular')  # Booking.discount_type
+
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+    gross = db.Column(db.Float, nullable=False, default=0.0)
+    coach_fees = db.Column(db.Float, nullable=False, default=0.0)
+    court_fees = db.Column(db.Float, nullable=False, default=0.0)
+    discounts = db.Column(db.Float, nullable=False, default=0.0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('date', 'coach_id', 'court_id', 'academy_id', 'discount_type', name='unique_booking_rollup_key'),
+        db.Index('ix_booking_rollup_coach_date', 'coach_id', 'date'),
+    )
+
+    @classmethod
+    def rebuild(cls, start_date=None, end_date=None):
+        """Recompute the rollup from completed bookings (all dates, or start_date..end_date)"""
+        delete_query = cls.query
+        filters = [Booking.status == 'completed']
+        if start_date:
+            delete_query = delete_query.filter(cls.date >= start_date)
+            filters.append(Booking.date >= start_date)
+        if end_date:
+            delete_query = delete_query.filter(cls.date <= end_date)
+            filters.append(Booking.date <= end_date)
+
+        delete_query.delete(synchronize_session=False)
+
+        academy_id = db.func.coalesce(Booking.academy_id, 0)
+        discount_type = db.func.coalesce(Booking.discount_type, 'regular')
+        grouped = db.session.query(
+            Booking.date, Booking.coach_id, Booking.court_id, academy_id, discount_type,
+            db.func.count(Booking.id),
+            db.func.sum(Booking.price),
+            db.func.sum(Booking.coach_fee),
+            db.func.sum(Booking.court_fee),
+            db.func.sum(db.func.coalesce(Booking.discount_amount, 0))
+        ).filter(*filters).group_by(
+            Booking.date, Booking.coach_id, Booking.court_id, academy_id, discount_type
+        )
+
+        rows = []
+        now = datetime.utcnow()
+        for day, coach_id, court_id, booking_academy_id, plan_type, *totals in grouped.yield_per(1000):
+            row = {
+                'date': day,
+                'coach_id': coach_id,
+                'court_id': court_id,
+                'academy_id': booking_academy_id,
+                'discount_type': plan_type,
+                'updated_at': now
+            }
+            row.update(zip(ROLLUP_METRICS, (value or 0 for value in totals)))
+            rows.append(row)
+
+        if rows:
+            db.session.execute(cls.__table__.insert(), rows)
+        db.session.commit()
+
+        return len(rows)
+
+    def __repr__(self):
+        return f'<BookingDailyRollup {self.date} coach={self.coach_id} court={self.court_id} {self.discount_type}: {self.gross}>'
+
+
+def coach_academies(connection, coach_ids):
+    """{coach_id: academy_id} of each coach's first active academy"""
+    coach_ids = [coach_id for coach_id in coach_ids if coach_id is not None]
+    if not coach_ids:
+        return {}
+    return dict(connection.execute(
+        select(AcademyCoach.coach_id, db.func.min(AcademyCoach.academy_id)).where(
+            AcademyCoach.coach_id.in_(coach_ids),
+            AcademyCoach.is_active == True
+        ).group_by(AcademyCoach.coach_id)
+    ).all())
+
+def _discount_types(connection, plan_ids):
+    plan_ids = [plan_id for plan_id in plan_ids if plan_id is not None]
+    if not plan_ids:
+        return {}
+    return dict(connection.execute(
+        select(PricingPlan.id, PricingPlan.discount_type).where(PricingPlan.id.in_(plan_ids))
+    ).all())
+
+def _contribution(values, sign):
+    """(key, metrics) that a booking with these column values adds (sign=1) or removes (sign=-1)"""
+    if values.get('status') != 'completed' or values.get('date') is None:
+        return None
+    return (
+        (values['date'], values['coach_id'], values['court_id'], values.get('academy_id') or 0,
+         values.get('discount_type') or 'regular'),
+        [sign, *(sign * float(values.get(column) or 0) for column in ROLLUP_AMOUNT_COLUMNS)]
+    )
+
+def apply_booking_changes(connection, changes):
+    """Add or remove booking contributions in the rollup.
+
+    changes is a list of (column values, sign) pairs; bookings that are not
+    completed contribute nothing. Every key part comes from the booking's own
+    values, so removing a contribution always hits the row that added it.
+    Returns the number of rollup keys touched.
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+    for key, metrics in (c for c in (_contribution(values, sign) for values, sign in changes) if c):
+        deltas[key] = [total + value for total, value in zip(deltas[key], metrics)]
+
+    for key, metrics in deltas.items():
+        _upsert_rollup(connection, key, metrics)
+    return len(deltas)
+
+def _upsert_rollup(connection, key, metrics):
+    """Add metrics to the rollup row for key, creating it if needed"""
+    table = BookingDailyRollup.__table__
+    now = datetime.utcnow()
+    values = dict(zip(('date', 'coach_id', 'court_id', 'academy_id', 'discount_type'), key))
+    values.update(zip(ROLLUP_METRICS, metrics), updated_at=now)
+    increments = {metric: table.c[metric] + values[metric] for metric in ROLLUP_METRICS}
+    increments['updated_at'] = now
+    index_elements = ['date', 'coach_id', 'court_id', 'academy_id', 'discount_type']
+
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        connection.execute(sqlite.insert(table).values(values).on_conflict_do_update(
+            index_elements=index_elements, set_=increments))
+    elif dialect == 'postgresql':
+        connection.execute(postgresql.insert(table).values(values).on_conflict_do_update(
+            index_elements=index_elements, set_=increments))
+    else:
+        matches = [table.c[column] == values[column] for column in index_elements]
+        if connection.execute(table.update().where(*matches).values(increments)).rowcount == 0:
+            connection.execute(table.insert().values(values))
+
+def _booking_values(target, previous=False):
+    """Rollup-relevant column values of a booking, before the pending change if previous"""
+    state = inspect(target)
+    values = {}
+    for column in ROLLUP_KEY_COLUMNS + ROLLUP_AMOUNT_COLUMNS:
+        history = state.attrs[column].history
+        values[column] = history.deleted[0] if previous and history.deleted else getattr(target, column)
+    return values
+
+def _snapshot_discount_type(connection, target):
+    target.discount_type = _discount_types(connection, [target.pricing_plan_id]).get(target.pricing_plan_id, 'regular')
+
+def _snapshot_academy(connection, target):
+    target.academy_id = coach_academies(connection, [target.coach_id]).get(target.coach_id)
+
+@event.listens_for(Booking, 'before_insert')
+def _booking_inserting(mapper, connection, target):
+    """Record the plan's discount_type and the coach's academy on a new booking"""
+    if target.discount_type is None:
+        _snapshot_discount_type(connection, target)
+    if target.academy_id is None:
+        _snapshot_academy(connection, target)
+
+@event.listens_for(Booking, 'before_update')
+def _booking_updating(mapper, connection, target):
+    """Record them again when the booking moves to another plan or coach"""
+    state = inspect(target)
+    if state.attrs.pricing_plan_id.history.has_changes():
+        _snapshot_discount_type(connection, target)
+    if state.attrs.coach_id.history.has_changes():
+        _snapshot_academy(connection, target)
+
+@event.listens_for(Booking, 'after_insert')
+def _booking_inserted(mapper, connection, target):
+    apply_booking_changes(connection, [(_booking_values(target), 1)])
+
+@event.listens_for(Booking, 'after_delete')
+def _booking_deleted(mapper, connection, target):
+    apply_booking_changes(connection, [(_booking_values(target, previous=True), -1)])
+
+@event.listens_for(Booking, 'after_update')
+def _booking_updated(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[column].history.has_changes() for column in ROLLUP_KEY_COLUMNS + ROLLUP_AMOUNT_COLUMNS):
+        return
+    apply_booking_changes(connection, [
+        (_booking_values(target, previous=True), -1),
+        (_booking_values(target), 1)
+    ])
@@ -36,4 +36,16 @@ class CoachImage(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship with Coach model
-    coach = db.relationship('Coach', backref='showcase_images')
\ No newline at end of file
+    coach = db.relationship('Coach', backref='showcase_images')
+
+class CoachProfileVersion(db.Model):
+    """Version stamp for a coach's public profile, bumped whenever profile data changes"""
+    __tablename__ = 'coach_profile_version'
+    
+    # No foreign key: the stamp must outlive the coach so deleted profiles stop matching old ETags
+    coach_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CoachProfileVersion {self.coach_id} v{self.version}>'
@@ -12,8 +12,19 @@ class Court(db.Model):
     indoor = db.Column(db.Boolean, default=False)
     number_of_courts = db.Column(db.Integer, default=1)
     booking_link = db.Column(db.String(256))  # URL to booking page for this court
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    grid_cell = db.Column(db.String(24), nullable=True, index=True)  # Spatial bucket, see app/utils/geo.py
+    fees_version = db.Column(db.Integer, nullable=False, default=0)  # Bumped whenever the court's fees change
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    def set_coordinates(self, latitude, longitude):
+        """Set the court location and keep its spatial bucket in sync"""
+        from app.utils.geo import grid_cell
+        self.latitude = latitude
+        self.longitude = longitude
+        self.grid_cell = grid_cell(latitude, longitude) if latitude is not None and longitude is not None else None
+    
     def __repr__(self):
         return f'<Court {self.name}>'
 
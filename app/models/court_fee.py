@@ -1,6 +1,8 @@
 # app/models/court_fee.py
 from app import db
 from datetime import datetime, time
+from sqlalchemy import event, inspect
+from app.models.court import Court
 
 class CourtFee(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -14,4 +16,26 @@ class CourtFee(db.Model):
     court = db.relationship('Court', backref='fees')
     
     def __repr__(self):
-        return f'<CourtFee {self.court_id} {self.start_time}-{self.end_time}: ${self.fee}>'
\ No newline at end of file
+        return f'<CourtFee {self.court_id} {self.start_time}-{self.end_time}: ${self.fee}>'
+
+
+# Court.fees_version lets every process's fee cache (app/utils/court_fees.py)
+# notice changes made elsewhere
+
+def _bump_fees_version(connection, court_ids):
+    court_ids = [court_id for court_id in set(court_ids) if court_id is not None]
+    if court_ids:
+        table = Court.__table__
+        connection.execute(table.update().where(table.c.id.in_(court_ids)).values(
+            fees_version=table.c.fees_version + 1
+        ))
+
+@event.listens_for(CourtFee, 'after_insert')
+@event.listens_for(CourtFee, 'after_delete')
+def _court_fee_added_or_removed(mapper, connection, target):
+    _bump_fees_version(connection, [target.court_id])
+
+@event.listens_for(CourtFee, 'after_update')
+def _court_fee_updated(mapper, connection, target):
+    history = inspect(target).attrs.court_id.history
+    _bump_fees_version(connection, [target.court_id, *history.deleted])
@@ -0,0 +1,21 @@
+# app/models/image.py
+from app import db
+from datetime import datetime
+
+class ImageVariant(db.Model):
+    """A resized copy of an uploaded image, keyed by the stored path of the original"""
+    id = db.Column(db.Integer, primary_key=True)
+    source_path = db.Column(db.String(255), nullable=False, index=True)
+    variant = db.Column(db.String(20), nullable=False)  # 'thumb', 'card' or 'full'
+    format = db.Column(db.String(10), nullable=False)  # 'webp' or the original's extension
+    path = db.Column(db.String(255), nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('source_path', 'variant', 'format', name='unique_image_variant'),
+    )
+
+    def __repr__(self):
+        return f'<ImageVariant {self.variant}.{self.format} of {self.source_path}>'
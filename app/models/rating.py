@@ -1,13 +1,17 @@
 # app/models/rating.py
 from app import db
 from datetime import datetime
+from sqlalchemy import event, case, inspect
+from sqlalchemy.orm import column_property
+from sqlalchemy.dialects import postgresql, sqlite
 
 class CoachRating(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    coach_id = db.Column(db.Integer, db.ForeignKey('coach.id'), nullable=False)
+    # active_history keeps the previous values around so the summary can be adjusted on update
+    coach_id = column_property(db.Column(db.Integer, db.ForeignKey('coach.id'), nullable=False), active_history=True)
     booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=True)
-    rating = db.Column(db.Float, nullable=False)  # Rating from 1 to 5
+    rating = column_property(db.Column(db.Float, nullable=False), active_history=True)  # Rating from 1 to 5
     comment = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -20,4 +24,142 @@ class CoachRating(db.Model):
     )
     
     def __repr__(self):
-        return f'<CoachRating {self.student_id} -> {self.coach_id}: {self.rating}>'
\ No newline at end of file
+        return f'<CoachRating {self.student_id} -> {self.coach_id}: {self.rating}>'
+
+class CoachRatingSummary(db.Model):
+    """Materialized per-coach rating aggregates, kept in sync with CoachRating"""
+    __tablename__ = 'coach_rating_summary'
+    
+    coach_id = db.Column(db.Integer, db.ForeignKey('coach.id'), primary_key=True)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0.0)
+    avg_rating = db.Column(db.Float, nullable=True, index=True)  # NULL when the coach has no ratings
+    
+    # Histogram of ratings rounded to the nearest star
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    coach = db.relationship('Coach', backref=db.backref('rating_summary', uselist=False))
+    
+    @property
+    def histogram(self):
+        return {star: getattr(self, f'stars_{star}') or 0 for star in range(1, 6)}
+    
+    @classmethod
+    def get_for_coach(cls, coach_id):
+        """Return (avg_rating, rating_count) for a coach, (0, 0) if unrated"""
+        summary = db.session.get(cls, coach_id)
+        if not summary or not summary.rating_count:
+            return 0, 0
+        return summary.avg_rating or 0, summary.rating_count
+    
+    @classmethod
+    def rebuild(cls, coach_id=None):
+        """Recompute summaries from CoachRating rows (all coaches, or just one)"""
+        delete_query = cls.query
+        ratings_query = db.session.query(CoachRating.coach_id, CoachRating.rating)
+        if coach_id is not None:
+            delete_query = delete_query.filter(cls.coach_id == coach_id)
+            ratings_query = ratings_query.filter(CoachRating.coach_id == coach_id)
+        
+        delete_query.delete(synchronize_session=False)
+        
+        summaries = {}
+        for rated_coach_id, rating in ratings_query.yield_per(1000):
+            row = summaries.setdefault(rated_coach_id, {
+                'coach_id': rated_coach_id,
+                'rating_count': 0,
+                'rating_sum': 0.0,
+                'stars_1': 0, 'stars_2': 0, 'stars_3': 0, 'stars_4': 0, 'stars_5': 0
+            })
+            row['rating_count'] += 1
+            row['rating_sum'] += rating
+            row[f'stars_{_star_bucket(rating)}'] += 1
+        
+        for row in summaries.values():
+            row['avg_rating'] = row['rating_sum'] / row['rating_count']
+            row['updated_at'] = datetime.utcnow()
+        
+        if summaries:
+            db.session.execute(cls.__table__.insert(), list(summaries.values()))
+        db.session.commit()
+        
+        return len(summaries)
+    
+    def __repr__(self):
+        return f'<CoachRatingSummary {self.coach_id}: {self.avg_rating} ({self.rating_count})>'
+
+
+def _star_bucket(rating):
+    """Round a rating to the nearest whole star (1-5)"""
+    return min(5, max(1, int(float(rating) + 0.5)))
+
+def _apply_rating_delta(connection, coach_id, rating, sign):
+    """Add (sign=1) or remove (sign=-1) a single rating from a coach's summary"""
+    if coach_id is None or rating is None:
+        return
+    
+    rating = float(rating)
+    table = CoachRatingSummary.__table__
+    bucket = table.c[f'stars_{_star_bucket(rating)}']
+    new_count = table.c.rating_count + sign
+    new_sum = table.c.rating_sum + sign * rating
+    
+    updates = {
+        'rating_count': new_count,
+        'rating_sum': case((new_count > 0, new_sum), else_=0.0),
+        'avg_rating': case((new_count > 0, new_sum / new_count), else_=None),
+        bucket.name: bucket + sign,
+        'updated_at': datetime.utcnow()
+    }
+    
+    if sign < 0:
+        connection.execute(table.update().where(table.c.coach_id == coach_id).values(updates))
+        return
+    
+    # A coach's first rating creates the row; concurrent first ratings meet on the primary key
+    values = {
+        'coach_id': coach_id,
+        'rating_count': 1,
+        'rating_sum': rating,
+        'avg_rating': rating,
+        bucket.name: 1,
+        'updated_at': datetime.utcnow()
+    }
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        connection.execute(sqlite.insert(table).values(values).on_conflict_do_update(
+            index_elements=['coach_id'], set_=updates))
+    elif dialect == 'postgresql':
+        connection.execute(postgresql.insert(table).values(values).on_conflict_do_update(
+            index_elements=['coach_id'], set_=updates))
+    elif connection.execute(table.update().where(table.c.coach_id == coach_id).values(updates)).rowcount == 0:
+        connection.execute(table.insert().values(values))
+
+@event.listens_for(CoachRating, 'after_insert')
+def _rating_inserted(mapper, connection, target):
+    _apply_rating_delta(connection, target.coach_id, target.rating, 1)
+
+@event.listens_for(CoachRating, 'after_delete')
+def _rating_deleted(mapper, connection, target):
+    _apply_rating_delta(connection, target.coach_id, target.rating, -1)
+
+@event.listens_for(CoachRating, 'after_update')
+def _rating_updated(mapper, connection, target):
+    state = inspect(target)
+    coach_history = state.attrs.coach_id.history
+    rating_history = state.attrs.rating.history
+    if not coach_history.has_changes() and not rating_history.has_changes():
+        return
+    
+    old_coach_id = coach_history.deleted[0] if coach_history.deleted else target.coach_id
+    old_rating = rating_history.deleted[0] if rating_history.deleted else target.rating
+    
+    _apply_rating_delta(connection, old_coach_id, old_rating, -1)
+    _apply_rating_delta(connection, target.coach_id, target.rating, 1)
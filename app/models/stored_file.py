@@ -0,0 +1,16 @@
+# app/models/stored_file.py
+from app import db
+from datetime import datetime
+
+class StoredFile(db.Model):
+    """A content-addressed upload and the number of records referencing it"""
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(255), nullable=False, unique=True)  # '<category>/<ab>/<sha256>.<ext>' under UPLOAD_FOLDER
+    digest = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.Integer)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    released_at = db.Column(db.DateTime, nullable=True)  # When ref_count last dropped to zero
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StoredFile {self.path} refs={self.ref_count}>'
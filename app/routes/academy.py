@@ -7,6 +7,7 @@ from app.models.academy_pricing import AcademyPricingPlan
 from app.models.coach import Coach
 from app.models.user import User
 from app.models.booking import Booking, Availability
+from app.utils.earnings import EarningsReport
 from functools import wraps
 import uuid
 
@@ -198,18 +199,14 @@ def academy_dashboard(academy_id):
     ).order_by(Booking.date, Booking.start_time).all()
     
     # Get coach statistics
+    earnings = EarningsReport(coach_ids).coaches
     coach_stats = []
     for coach in coaches:
-        total_earnings = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id == coach.id,
-            Booking.status == 'completed'
-        ).scalar() or 0
-        
         coach_stats.append({
             'coach': coach,
             'user': coach.user,
             'bookings_count': Booking.query.filter_by(coach_id=coach.id).count(),
-            'total_earnings': float(total_earnings)
+            'total_earnings': earnings[coach.id].earnings if coach.id in earnings else 0.0
         })
     
     return render_template(
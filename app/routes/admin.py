@@ -1,6 +1,5 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import current_user, login_required
-from sqlalchemy import func, extract, desc
 from app import db
 from app.models.court import Court, CoachCourt
 from app.models.court_fee import CourtFee
@@ -10,19 +9,18 @@ from app.models.booking import Booking, Availability
 from app.models.session_log import SessionLog
 from app.models.rating import CoachRating
 from app.models.pricing import PricingPlan
-from app.models.rating import CoachRating
-from app.models.package import BookingPackage, booking_package_association
+from app.models.package import BookingPackage
 from app.models.support import SupportTicket, TicketResponse
 from app.models.academy import Academy, AcademyCoach, AcademyManager
 from app.models.academy_pricing import AcademyPricingPlan  # New model
 from app.models.payment import PaymentProof
 from app.models.notification import Notification
 from app.models.tag import Tag, CoachTag
-from datetime import datetime, timedelta, time
+from app.utils.earnings import EarningsReport, CourtEarnings, month_starts, previous_month
+from datetime import datetime
 from sqlalchemy import inspect
 from functools import wraps
 import calendar
-import json
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -48,21 +46,15 @@ def dashboard():
     bookings_count = Booking.query.count()
     
     # Get revenue stats
-    total_revenue = db.session.query(func.sum(Booking.price)).filter(Booking.status == 'completed').scalar() or 0
+    earnings = EarningsReport(by_court_and_coach=False)
+    total_revenue = earnings.total
     
     # Get monthly revenue for current year
-    current_year = datetime.utcnow().year
-    monthly_revenue = {}
-    
-    for month in range(1, 13):
-        month_revenue = db.session.query(func.sum(Booking.price)).filter(
-            Booking.status == 'completed',
-            extract('year', Booking.date) == current_year,
-            extract('month', Booking.date) == month
-        ).scalar() or 0
-        
-        month_name = calendar.month_name[month]
-        monthly_revenue[month_name] = float(month_revenue)
+    this_month = month_starts(1)[0]
+    monthly_revenue = {
+        calendar.month_name[month]: earnings.month(this_month.replace(month=month))
+        for month in range(1, 13)
+    }
     
     # Get recent bookings
     recent_bookings = Booking.query.order_by(Booking.created_at.desc()).limit(5).all()
@@ -92,6 +84,8 @@ def add_court():
         indoor = request.form.get('indoor') == 'on'
         number_of_courts = request.form.get('number_of_courts', type=int)
         booking_link = request.form.get('booking_link')
+        latitude = request.form.get('latitude', type=float)
+        longitude = request.form.get('longitude', type=float)
         
         if not name:
             flash('Court name is required.', 'error')
@@ -107,6 +101,7 @@ def add_court():
             number_of_courts=number_of_courts,
             booking_link=booking_link
         )
+        court.set_coordinates(latitude, longitude)
         
         try:
             db.session.add(court)
@@ -135,6 +130,10 @@ def edit_court(court_id):
         court.indoor = request.form.get('indoor') == 'on'
         court.number_of_courts = request.form.get('number_of_courts', type=int)
         court.booking_link = request.form.get('booking_link')
+        court.set_coordinates(
+            request.form.get('latitude', type=float),
+            request.form.get('longitude', type=float)
+        )
         
         try:
             db.session.commit()
@@ -383,69 +382,25 @@ def coach_details(coach_id):
 @admin_required
 def earnings():
     """View earnings analytics"""
-    # Get overall earnings
-    total_earnings = db.session.query(func.sum(Booking.price)).filter(Booking.status == 'completed').scalar() or 0
+    report = EarningsReport()
     
     # Get earnings by month for the current year
-    current_year = datetime.utcnow().year
-    current_month = datetime.utcnow().month
-    monthly_earnings = []
-    
-    for month in range(1, 13):
-        month_earnings = db.session.query(func.sum(Booking.price)).filter(
-            Booking.status == 'completed',
-            extract('year', Booking.date) == current_year,
-            extract('month', Booking.date) == month
-        ).scalar() or 0
-        
-        month_name = calendar.month_name[month]
-        monthly_earnings.append({
-            'month': month_name,
-            'earnings': float(month_earnings)
-        })
+    this_month = month_starts(1)[0]
+    monthly_earnings = [{
+        'month': calendar.month_name[month],
+        'earnings': report.month(this_month.replace(month=month))
+    } for month in range(1, 13)]
     
-    # Calculate this month and last month earnings
-    this_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.status == 'completed',
-        extract('year', Booking.date) == current_year,
-        extract('month', Booking.date) == current_month
-    ).scalar() or 0
-    
-    # Calculate last month earnings
-    last_month = current_month - 1 if current_month > 1 else 12
-    last_month_year = current_year if current_month > 1 else current_year - 1
-    
-    last_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.status == 'completed',
-        extract('year', Booking.date) == last_month_year,
-        extract('month', Booking.date) == last_month
-    ).scalar() or 0
-    
-    # Get earnings by court
-    court_earnings = db.session.query(
-        Court.name,
-        func.sum(Booking.price).label('earnings')
-    ).join(Booking, Booking.court_id == Court.id).filter(
-        Booking.status == 'completed'
-    ).group_by(Court.name).all()
-    
-    # Get earnings by coach
-    coach_earnings = db.session.query(
-        User.first_name,
-        User.last_name,
-        func.sum(Booking.price).label('earnings')
-    ).join(Coach, Coach.id == Booking.coach_id).join(
-        User, User.id == Coach.user_id
-    ).filter(
-        Booking.status == 'completed'
-    ).group_by(User.first_name, User.last_name).all()
+    # Get earnings by court and by coach
+    court_earnings = [CourtEarnings(name, amount) for name, amount in report.by_court().items()]
+    coach_earnings = list(report.coaches.values())
     
     return render_template(
         'dashboard/admin/earnings.html',
-        total_earnings=total_earnings,
+        total_earnings=report.total,
         monthly_earnings=monthly_earnings,
-        this_month_earnings=this_month_earnings,
-        last_month_earnings=last_month_earnings,
+        this_month_earnings=report.month(this_month),
+        last_month_earnings=report.month(previous_month(this_month)),
         court_earnings=court_earnings,
         coach_earnings=coach_earnings
     )
@@ -777,12 +732,6 @@ def booking_details(booking_id):
     """View booking details"""
     booking = Booking.query.get_or_404(booking_id)
     return render_template('dashboard/admin/booking_details.html', booking=booking)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_admin:
-            flash('Access denied. Admin privileges required.')
-            return redirect(url_for('main.index'))
-        return f(*args, **kwargs)
-    return decorated_function
 
 @bp.route('/courts')
 @login_required
@@ -1,7 +1,6 @@
 # app/routes/api.py
-from flask import Blueprint, request, jsonify, current_app, flash, redirect, url_for
+from flask import Blueprint, request, jsonify, current_app, flash, redirect, url_for, stream_with_context
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 from app import db
 from app.models.coach import Coach, CoachImage
 from app.models.user import User
@@ -9,22 +8,38 @@ from app.models.court import Court, CoachCourt
 from app.models.booking import Availability, Booking, AvailabilityTemplate
 from app.models.package import BookingPackage, booking_package_association
 from app.models.session_log import SessionLog
-from app.models.rating import CoachRating
+from app.models.rating import CoachRatingSummary
 from app.models.pricing import PricingPlan  # Add missing import for PricingPlan
 from app.forms.coach import CoachProfileForm, AvailabilityForm, SessionLogForm  # Also add the missing form import
 from app.models.academy import Academy, AcademyCoach, AcademyManager
 from app.models.academy_pricing import AcademyPricingPlan
 from app.models.user import User
 from app.utils.file_utils import save_uploaded_file, delete_file
+from app.utils.proof_storage import store_proof
+from app.utils.search import academy_search_matches
+from app.utils.court_fees import resolve_court_fee
+from app.utils.earnings import EarningsReport, month_starts, previous_month
+from app.utils.booking_serializer import (
+    coach_booking_serializer, calendar_booking_serializer,
+    dashboard_booking_serializer, student_booking_serializer
+)
+from app.utils.exports import (
+    EXPORT_FORMATS, BOOKING_EXPORT_FIELDS, EARNINGS_EXPORT_FIELDS,
+    booking_export_rows, earnings_export_rows, encode_export
+)
+from app.utils.availability import (
+    load_existing_slots, sweep_overlaps, bulk_insert_availability, parse_availability_slots,
+    find_slot_conflicts, insert_availability_ignoring_conflicts, slot_key, describe_slot
+)
 from datetime import datetime, timedelta, time
 from app.models.payment import PaymentProof
 from app.models.notification import Notification
 from app.models.tag import Tag, CoachTag
 from functools import wraps
-import os
 import json
-import uuid 
-from sqlalchemy import func, or_, extract 
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
+from sqlalchemy.exc import IntegrityError
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -91,8 +106,7 @@ def get_coach_profile():
     coach = Coach.query.filter_by(user_id=current_user.id).first_or_404()
     
     # Get coach rating
-    avg_rating = db.session.query(func.avg(CoachRating.rating)).filter(CoachRating.coach_id == coach.id).scalar() or 0
-    rating_count = CoachRating.query.filter_by(coach_id=coach.id).count()
+    avg_rating, rating_count = CoachRatingSummary.get_for_coach(coach.id)
     
     # Get coach courts
     courts = Court.query.join(CoachCourt).filter(CoachCourt.coach_id == coach.id).all()
@@ -140,66 +154,29 @@ def get_coach_stats():
     ).count()
     
     # Get total earnings from completed sessions
-    total_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach.id,
-        Booking.status == 'completed'
-    ).scalar() or 0
-    
-    # Get average rating
-    avg_rating = db.session.query(func.avg(CoachRating.rating)).filter(
-        CoachRating.coach_id == coach.id
-    ).scalar() or 0
+    earnings = EarningsReport([coach.id], by_court_and_coach=False)
+    total_earnings = earnings.total
     
-    # Get rating count
-    rating_count = CoachRating.query.filter_by(coach_id=coach.id).count()
+    # Get average rating and rating count
+    avg_rating, rating_count = CoachRatingSummary.get_for_coach(coach.id)
     
     # Get monthly earnings for dashboard chart
     # This will get earnings for the last 6 months
-    monthly_earnings = {}
-    for i in range(5, -1, -1):
-        month_start = datetime.utcnow().replace(day=1) - timedelta(days=i*30)
-        month_name = month_start.strftime('%B %Y')
-        
-        month_earnings = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id == coach.id,
-            Booking.status == 'completed',
-            extract('year', Booking.date) == month_start.year,
-            extract('month', Booking.date) == month_start.month
-        ).scalar() or 0
-        
-        monthly_earnings[month_name] = float(month_earnings)
+    monthly_earnings = earnings.monthly(6)
     
     # Get upcoming bookings (limited to 3 for dashboard)
-    upcoming_bookings_query = Booking.query.filter(
+    upcoming_bookings_query = dashboard_booking_serializer.query().filter(
         Booking.coach_id == coach.id,
         Booking.status == 'upcoming',
         Booking.date >= datetime.utcnow().date()
     ).order_by(Booking.date, Booking.start_time).limit(3)
     
-    upcoming_bookings = []
-    for booking in upcoming_bookings_query:
-        upcoming_bookings.append({
-            'id': booking.id,
-            'student': {
-                'first_name': booking.student.first_name,
-                'last_name': booking.student.last_name,
-                'email': booking.student.email
-            },
-            'date': booking.date.isoformat(),
-            'start_time': booking.start_time.strftime('%H:%M:%S'),
-            'end_time': booking.end_time.strftime('%H:%M:%S'),
-            'price': float(booking.price),
-            'status': booking.status,
-            'court': {
-                'id': booking.court_id,
-                'name': booking.court.name
-            },
-            'venue_confirmed': booking.venue_confirmed,
-            'court_booking_responsibility': booking.court_booking_responsibility
-        })
+    upcoming_bookings = dashboard_booking_serializer.dump_many(upcoming_bookings_query)
     
     # Get recent session logs (limited to 3 for dashboard)
-    recent_logs_query = SessionLog.query.filter_by(coach_id=coach.id).order_by(
+    recent_logs_query = SessionLog.query.options(
+        joinedload(SessionLog.booking).joinedload(Booking.court)
+    ).filter_by(coach_id=coach.id).order_by(
         SessionLog.created_at.desc()
     ).limit(3)
     
@@ -243,14 +220,17 @@ def get_coach_stats():
             academy_id = academy_manager.academy_id
             
             # Get academy coaches
-            academy_coaches_query = AcademyCoach.query.filter_by(
+            academy_coaches_query = AcademyCoach.query.options(
+                joinedload(AcademyCoach.coach).joinedload(Coach.user),
+                joinedload(AcademyCoach.role)
+            ).filter_by(
                 academy_id=academy_id,
                 is_active=True
             ).limit(4)  # Limit to 4 for dashboard display
             
             academy_coaches = []
             for ac in academy_coaches_query:
-                coach_obj = Coach.query.get(ac.coach_id)
+                coach_obj = ac.coach
                 if not coach_obj or not coach_obj.user:
                     continue
                 
@@ -261,20 +241,25 @@ def get_coach_stats():
                     'id': coach_obj.id,
                     'first_name': coach_obj.user.first_name,
                     'last_name': coach_obj.user.last_name,
-                    'role': ac.role,
+                    'role': ac.role.name if ac.role else None,
                     'dupr_rating': coach_obj.user.dupr_rating,
                     'profile_picture': profile_picture,
                     'sessions_completed': coach_obj.sessions_completed
                 })
             
             # Get recent package requests
-            recent_packages_query = BookingPackage.query.filter_by(
+            recent_packages_query = BookingPackage.query.options(
+                joinedload(BookingPackage.student),
+                joinedload(BookingPackage.pricing_plan),
+                joinedload(BookingPackage.academy_pricing_plan),
+                joinedload(BookingPackage.coach).joinedload(Coach.user)
+            ).filter_by(
                 academy_id=academy_id
             ).order_by(BookingPackage.purchase_date.desc()).limit(3)
             
             recent_packages = []
             for package in recent_packages_query:
-                student = User.query.get(package.student_id)
+                student = package.student
                 if not student:
                     continue
                 
@@ -292,18 +277,18 @@ def get_coach_stats():
                 
                 # Get package name from pricing plan
                 if package.package_type == 'coach' and package.pricing_plan_id:
-                    pricing_plan = PricingPlan.query.get(package.pricing_plan_id)
+                    pricing_plan = package.pricing_plan
                     if pricing_plan:
                         package_data['package_name'] = pricing_plan.name
                 
                 elif package.package_type == 'academy' and package.academy_pricing_plan_id:
-                    academy_plan = AcademyPricingPlan.query.get(package.academy_pricing_plan_id)
+                    academy_plan = package.academy_pricing_plan
                     if academy_plan:
                         package_data['package_name'] = academy_plan.name
                 
                 # Add coach info if available
                 if package.coach_id:
-                    coach_obj = Coach.query.get(package.coach_id)
+                    coach_obj = package.coach
                     if coach_obj and coach_obj.user:
                         package_data['coach'] = {
                             'first_name': coach_obj.user.first_name,
@@ -575,50 +560,64 @@ def add_bulk_availability():
     if not slots:
         return jsonify({'error': 'No slots provided'}), 400
     
+    # 'all_or_nothing' writes nothing if any slot fails; 'partial' inserts what it can
+    mode = data.get('mode', 'all_or_nothing')
+    if mode not in ('all_or_nothing', 'partial'):
+        return jsonify({'error': "mode must be 'all_or_nothing' or 'partial'"}), 400
+    
     coach = Coach.query.filter_by(user_id=current_user.id).first_or_404()
-    created_slots = []
-    errors = []
     
-    # Start a transaction
+    # Validate and parse every slot before writing anything
+    rows, errors = parse_availability_slots(coach.id, slots)
+    
     try:
-        for slot_data in slots:
-            try:
-                # Parse date and times
-                date_obj = datetime.strptime(slot_data['date'], '%Y-%m-%d').date()
-                start_time = datetime.strptime(slot_data['start_time'], '%H:%M').time()
-                end_time = datetime.strptime(slot_data['end_time'], '%H:%M').time()
-                
-                # Create availability record
-                availability = Availability(
-                    coach_id=coach.id,
-                    court_id=slot_data['court_id'],
-                    date=date_obj,
-                    start_time=start_time,
-                    end_time=end_time,
-                    is_booked=False,
-                    student_books_court=slot_data.get('student_books_court', True)  # New field
-                )
-                
-                db.session.add(availability)
-                created_slots.append(availability)
-            except Exception as e:
-                errors.append(f"Error creating slot {slot_data['date']} {slot_data['start_time']}-{slot_data['end_time']}: {str(e)}")
-        
-        # Only commit if there were no errors
-        if not errors:
+        if mode == 'all_or_nothing':
+            conflicts = find_slot_conflicts(coach.id, rows)
+            if errors or conflicts:
+                return jsonify({
+                    'error': 'Some slots could not be created',
+                    'errors': errors + [
+                        f"Slot already exists: {row['date'].isoformat()} {row['start_time'].strftime('%H:%M')}"
+                        for row in conflicts
+                    ],
+                    'conflicts': [describe_slot(row) for row in conflicts]
+                }), 400
+            
+            bulk_insert_availability(rows)
             db.session.commit()
+            
             return jsonify({
                 'success': True,
-                'created_count': len(created_slots)
+                'created_count': len(rows)
             })
-        else:
-            # Rollback if there were any errors
-            db.session.rollback()
-            return jsonify({
-                'error': 'Some slots could not be created',
-                'errors': errors
-            }), 400
-            
+        
+        inserted = insert_availability_ignoring_conflicts(rows)
+        db.session.commit()
+        
+        # Duplicates inside the batch share a key; only the first one was inserted
+        created_count = 0
+        conflicts = []
+        for row in rows:
+            key = slot_key(row)
+            if key in inserted:
+                inserted.discard(key)
+                created_count += 1
+            else:
+                conflicts.append(describe_slot(row))
+        
+        return jsonify({
+            'success': True,
+            'created_count': created_count,
+            'errors': errors if errors else None,
+            'conflicts': conflicts
+        })
+    
+    except IntegrityError:
+        # Another request created one of these slots after the conflict check
+        db.session.rollback()
+        return jsonify({
+            'error': 'Some slots were created by another request. Please refresh and try again.'
+        }), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -744,6 +743,24 @@ def apply_availability_template():
     
     # Start transaction
     try:
+        # Existing availability for the whole range, loaded once and checked in memory
+        existing_intervals, taken_timeslots = load_existing_slots(coach.id, start_date, end_date)
+        
+        # Parse start and end times
+        start_time_obj = datetime.strptime(start_time, '%H:%M').time()
+        end_time_obj = datetime.strptime(end_time, '%H:%M').time()
+        
+        # Calculate start and end times in minutes for easier processing
+        start_minutes = start_time_obj.hour * 60 + start_time_obj.minute
+        end_minutes = end_time_obj.hour * 60 + end_time_obj.minute
+        
+        # Slot times are the same for every day and court
+        template_slots = []
+        for time_minutes in range(start_minutes, end_minutes - duration_minutes + 1, increment):
+            slot_start_time = time(hour=time_minutes // 60, minute=time_minutes % 60)
+            slot_end_time = time(hour=(time_minutes + duration_minutes) // 60, minute=(time_minutes + duration_minutes) % 60)
+            template_slots.append((slot_start_time, slot_end_time))
+        
         # For each day in the date range
         current_date = start_date
         while current_date <= end_date:
@@ -759,52 +776,42 @@ def apply_availability_template():
             if template_day in selected_days:
                 # For each court
                 for court in courts:
-                    court_id = court.get('id')
+                    court_id = int(court.get('id'))
                     
-                    # Parse start and end times
-                    start_time_obj = datetime.strptime(start_time, '%H:%M').time()
-                    end_time_obj = datetime.strptime(end_time, '%H:%M').time()
+                    # A start time already used on any court would break unique_coach_timeslot
+                    free_slots = [
+                        slot for slot in template_slots
+                        if (current_date, slot[0]) not in taken_timeslots
+                    ]
                     
-                    # Calculate start and end times in minutes for easier processing
-                    start_minutes = start_time_obj.hour * 60 + start_time_obj.minute
-                    end_minutes = end_time_obj.hour * 60 + end_time_obj.minute
+                    # Check for overlapping slots on this court
+                    accepted, _ = sweep_overlaps(
+                        existing_intervals.get((court_id, current_date), []),
+                        free_slots
+                    )
+                    accepted = set(accepted)
                     
-                    # Create slots based on duration and increment
-                    for time_minutes in range(start_minutes, end_minutes - duration_minutes + 1, increment):
-                        slot_start_time = time(hour=time_minutes // 60, minute=time_minutes % 60)
-                        slot_end_time = time(hour=(time_minutes + duration_minutes) // 60, minute=(time_minutes + duration_minutes) % 60)
-                        
-                        # Check for overlapping slots
-                        overlapping = Availability.query.filter(
-                            Availability.coach_id == coach.id,
-                            Availability.court_id == court_id,
-                            Availability.date == current_date,
-                            Availability.start_time < slot_end_time,
-                            Availability.end_time > slot_start_time
-                        ).first()
-                        
-                        if overlapping:
+                    for slot_start_time, slot_end_time in template_slots:
+                        if (slot_start_time, slot_end_time) not in accepted:
                             errors.append(f"Overlapping slot: {current_date.isoformat()} {slot_start_time}-{slot_end_time}")
                             continue
                         
-                        # Create availability record
-                        availability = Availability(
-                            coach_id=coach.id,
-                            court_id=court_id,
-                            date=current_date,
-                            start_time=slot_start_time,
-                            end_time=slot_end_time,
-                            is_booked=False
-                        )
-                        
-                        db.session.add(availability)
-                        created_slots.append(availability)
+                        taken_timeslots.add((current_date, slot_start_time))
+                        created_slots.append({
+                            'coach_id': coach.id,
+                            'court_id': court_id,
+                            'date': current_date,
+                            'start_time': slot_start_time,
+                            'end_time': slot_end_time,
+                            'is_booked': False
+                        })
             
             # Move to next day
             current_date += timedelta(days=1)
         
         # Commit if any slots were created
         if created_slots:
+            bulk_insert_availability(created_slots)
             db.session.commit()
             
             return jsonify({
@@ -865,113 +872,10 @@ def get_earnings(period):
     
     coach = Coach.query.filter_by(user_id=current_user.id).first_or_404()
     
-    # Get total earnings
-    total_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach.id,
-        Booking.status == 'completed'
-    ).scalar() or 0
+    # Months shown in the chart
+    months = int(period) if period.isdigit() else 12
     
-    # Current month earnings
-    now = datetime.utcnow()
-    this_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach.id,
-        Booking.status == 'completed',
-        extract('year', Booking.date) == now.year,
-        extract('month', Booking.date) == now.month
-    ).scalar() or 0
-    
-    # Last month earnings
-    last_month = now.replace(day=1) - timedelta(days=1)
-    last_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach.id,
-        Booking.status == 'completed',
-        extract('year', Booking.date) == last_month.year,
-        extract('month', Booking.date) == last_month.month
-    ).scalar() or 0
-    
-    # Get monthly earnings for chart
-    monthly_data = {}
-    months_to_fetch = 12
-    if period.isdigit():
-        months_to_fetch = int(period)
-    
-    for i in range(months_to_fetch-1, -1, -1):
-        month_date = now.replace(day=1) - timedelta(days=i*30)
-        month_key = month_date.strftime('%Y-%m')
-        month_name = month_date.strftime('%B %Y')
-        
-        month_earnings = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id == coach.id,
-            Booking.status == 'completed',
-            extract('year', Booking.date) == month_date.year,
-            extract('month', Booking.date) == month_date.month
-        ).scalar() or 0
-        
-        monthly_data[month_name] = float(month_earnings)
-    
-    # Get earnings by court
-    court_earnings = {}
-    courts = Court.query.join(CoachCourt).filter(CoachCourt.coach_id == coach.id).all()
-    for court in courts:
-        court_total = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id == coach.id,
-            Booking.court_id == court.id,
-            Booking.status == 'completed'
-        ).scalar() or 0
-        
-        if court_total > 0:
-            court_earnings[court.name] = float(court_total)
-    
-    # Get earnings breakdown by discount type
-    earnings_breakdown = {}
-    # Regular sessions (no discount)
-    regular_count = Booking.query.filter(
-        Booking.coach_id == coach.id,
-        Booking.status == 'completed',
-        Booking.pricing_plan_id.is_(None)
-    ).count()
-    
-    regular_amount = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach.id,
-        Booking.status == 'completed',
-        Booking.pricing_plan_id.is_(None)
-    ).scalar() or 0
-    
-    earnings_breakdown['regular'] = {
-        'sessions': regular_count,
-        'amount': float(regular_amount)
-    }
-    
-    # Discounted sessions by type
-    for discount_type in ['first_time', 'package', 'seasonal', 'custom']:
-        discount_count = Booking.query.join(PricingPlan).filter(
-            Booking.coach_id == coach.id,
-            Booking.status == 'completed',
-            PricingPlan.discount_type == discount_type
-        ).count()
-        
-        discount_amount = db.session.query(func.sum(Booking.price)).join(PricingPlan).filter(
-            Booking.coach_id == coach.id,
-            Booking.status == 'completed',
-            PricingPlan.discount_type == discount_type
-        ).scalar() or 0
-        
-        if discount_count > 0:
-            earnings_breakdown[discount_type] = {
-                'sessions': discount_count,
-                'amount': float(discount_amount)
-            }
-    
-    response = {
-        'total': float(total_earnings),
-        'this_month': float(this_month_earnings),
-        'last_month': float(last_month_earnings),
-        'monthly': monthly_data,
-        'by_court': court_earnings,
-        'breakdown': earnings_breakdown
-    }
-    
-    return jsonify(response)
+    return jsonify(EarningsReport([coach.id]).summary(months))
 
 @bp.route('/coach/bookings/<int:booking_id>')
 @login_required
@@ -1041,7 +945,7 @@ def get_coach_bookings(status):
     coach = Coach.query.filter_by(user_id=current_user.id).first_or_404()
     
     # Define query based on status
-    query = Booking.query.filter(Booking.coach_id == coach.id)
+    query = coach_booking_serializer.query().filter(Booking.coach_id == coach.id)
     
     if status == 'upcoming':
         query = query.filter(
@@ -1065,67 +969,7 @@ def get_coach_bookings(status):
     else:
         return jsonify({'error': 'Invalid status provided'}), 400
     
-    bookings = query.all()
-
-    # Get all booking IDs for efficient payment proof lookup
-    booking_ids = [booking.id for booking in bookings]
-
-    # Get all payment proofs for these bookings in one query
-    payment_proofs = {}
-    if booking_ids:
-        proofs = PaymentProof.query.filter(
-            PaymentProof.booking_id.in_(booking_ids)
-        ).all()
-
-        # Organize proofs by booking_id and proof_type
-        for proof in proofs:
-            if proof.booking_id not in payment_proofs:
-                payment_proofs[proof.booking_id] = {}
-            payment_proofs[proof.booking_id][proof.proof_type] = proof.image_path
-    
-    
-    # Format bookings data
-    result = []
-    for booking in bookings:
-        booking_payment_proofs = payment_proofs.get(booking.id, {})
-
-        booking_data = {
-            'id': booking.id,
-            'student': {
-                'id': booking.student_id,
-                'first_name': booking.student.first_name,
-                'last_name': booking.student.last_name,
-                'email': booking.student.email
-            },
-            'date': booking.date.isoformat(),
-            'start_time': booking.start_time.strftime('%H:%M:%S'),
-            'end_time': booking.end_time.strftime('%H:%M:%S'),
-            'price': float(booking.price),
-            'status': booking.status,
-            'court': {
-                'id': booking.court_id,
-                'name': booking.court.name
-            },
-            'venue_confirmed': booking.venue_confirmed,
-            'court_booking_responsibility': booking.court_booking_responsibility,
-            # Use the payment proofs from our lookup
-            'payment_proof': booking_payment_proofs.get('coaching'),
-            'court_booking_proof': booking_payment_proofs.get('court')
-        }
-        
-        # Add session log if it exists
-        if booking.session_log:
-            booking_data['session_log'] = {
-                'id': booking.session_log.id,
-                'title': booking.session_log.title,
-                'notes': booking.session_log.notes,
-                'coach_notes': booking.session_log.coach_notes,
-                'created_at': booking.session_log.created_at.isoformat()
-            }
-        
-        result.append(booking_data)
-    
-    return jsonify(result)
+    return jsonify(coach_booking_serializer.dump_many(query))
 
 @bp.route('/coach/bookings/period')
 @login_required
@@ -1171,7 +1015,7 @@ def get_bookings_by_period():
         return jsonify({'error': 'Access denied'}), 403
     
     # Define query based on parameters
-    query = Booking.query
+    query = calendar_booking_serializer.query()
     
     # Filter by date range
     query = query.filter(
@@ -1196,75 +1040,62 @@ def get_bookings_by_period():
     # Order by date and time
     query = query.order_by(Booking.date, Booking.start_time)
     
-    # Execute query
-    bookings = query.all()
+    return jsonify(calendar_booking_serializer.dump_many(query))
+
+def _export_coach_ids():
+    """Coach ids whose bookings the current user may export, with an error response if none"""
+    if current_user.is_academy_manager:
+        academy_ids = [am.academy_id for am in AcademyManager.query.filter_by(user_id=current_user.id).all()]
+        coach_ids = [ac.coach_id for ac in AcademyCoach.query.filter(AcademyCoach.academy_id.in_(academy_ids)).all()]
+        
+        # Academy managers may narrow the export to one of their coaches
+        coach_id = request.args.get('coach_id', type=int)
+        if coach_id:
+            if coach_id not in coach_ids:
+                return None, (jsonify({'error': 'You do not have access to this coach'}), 403)
+            coach_ids = [coach_id]
+        return coach_ids, None
     
-    # Get all booking IDs for efficient payment proof lookup
-    booking_ids = [booking.id for booking in bookings]
+    if current_user.is_coach:
+        coach = Coach.query.filter_by(user_id=current_user.id).first_or_404()
+        return [coach.id], None
     
-    # Get all payment proofs for these bookings in one query
-    payment_proofs = {}
-    if booking_ids:
-        proofs = PaymentProof.query.filter(
-            PaymentProof.booking_id.in_(booking_ids)
-        ).all()
-        
-        # Organize proofs by booking_id and proof_type
-        for proof in proofs:
-            if proof.booking_id not in payment_proofs:
-                payment_proofs[proof.booking_id] = {}
-            payment_proofs[proof.booking_id][proof.proof_type] = proof.image_path
+    return None, (jsonify({'error': 'Access denied'}), 403)
+
+def _export_response(name, rows_for, fields, export_format):
+    """Stream an export of rows_for(coach_ids, start_date, end_date) as CSV or NDJSON"""
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Invalid export format. Use csv or ndjson'}), 400
     
-    # Format bookings data
-    result = []
-    for booking in bookings:
-        # Get payment proofs for this booking
-        booking_payment_proofs = payment_proofs.get(booking.id, {})
-        
-        booking_data = {
-            'id': booking.id,
-            'student': {
-                'id': booking.student_id,
-                'first_name': booking.student.first_name,
-                'last_name': booking.student.last_name,
-                'email': booking.student.email
-            },
-            'coach': {
-                'id': booking.coach_id,
-                'user': {
-                    'first_name': booking.coach.user.first_name,
-                    'last_name': booking.coach.user.last_name
-                }
-            },
-            'date': booking.date.isoformat(),
-            'start_time': booking.start_time.strftime('%H:%M:%S'),
-            'end_time': booking.end_time.strftime('%H:%M:%S'),
-            'price': float(booking.price),
-            'status': booking.status,
-            'court': {
-                'id': booking.court_id,
-                'name': booking.court.name
-            },
-            'venue_confirmed': booking.venue_confirmed,
-            'court_booking_responsibility': booking.court_booking_responsibility,
-            # Use the payment proofs from our lookup
-            'payment_proof': booking_payment_proofs.get('coaching'),
-            'court_booking_proof': booking_payment_proofs.get('court')
-        }
-        
-        # Add session log if it exists
-        if hasattr(booking, 'session_log') and booking.session_log:
-            booking_data['session_log'] = {
-                'id': booking.session_log.id,
-                'title': booking.session_log.title,
-                'notes': booking.session_log.notes,
-                'coach_notes': booking.session_log.coach_notes,
-                'created_at': booking.session_log.created_at.isoformat()
-            }
-        
-        result.append(booking_data)
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() if request.args.get('start_date') else None
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    return jsonify(result)
+    coach_ids, error = _export_coach_ids()
+    if error:
+        return error
+    
+    rows = rows_for(coach_ids, start_date, end_date)
+    response = current_app.response_class(
+        stream_with_context(encode_export(rows, fields, export_format)),
+        mimetype=EXPORT_FORMATS[export_format]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}.{export_format}"'
+    return response
+
+@bp.route('/coach/bookings/export.<export_format>')
+@login_required
+def export_bookings(export_format):
+    """Stream the bookings of the current coach (or academy) as CSV or NDJSON"""
+    return _export_response('bookings', booking_export_rows, BOOKING_EXPORT_FIELDS, export_format)
+
+@bp.route('/coach/earnings/export.<export_format>')
+@login_required
+def export_earnings(export_format):
+    """Stream daily completed-session earnings of the current coach (or academy) as CSV or NDJSON"""
+    return _export_response('earnings', earnings_export_rows, EARNINGS_EXPORT_FIELDS, export_format)
 
 @bp.route('/coach/sessions')
 @login_required
@@ -1305,10 +1136,10 @@ def session_detail(booking_id):
     coach = Coach.query.filter_by(user_id=current_user.id).first()
     
     # Get booking and verify it belongs to this coach
-    booking = Booking.query.filter_by(id=booking_id, coach_id=coach.id).first_or_404()
+    booking = coach_booking_serializer.query().filter_by(id=booking_id, coach_id=coach.id).first_or_404()
     
     # Get or create session log
-    session_log = SessionLog.query.filter_by(booking_id=booking.id).first()
+    session_log = booking.session_log
     if not session_log and booking.status == 'completed':
         session_log = SessionLog(
             booking_id=booking.id,
@@ -2100,10 +1931,13 @@ def upload_qr_code():
         # Update coach payment info
         coach = Coach.query.filter_by(user_id=current_user.id).first()
         
-        if not coach.payment_info:
-            coach.payment_info = {}
+        payment_info = dict(coach.payment_info or {})
+        if payment_info.get('qr_code_url'):
+            delete_file(payment_info['qr_code_url'])
         
-        coach.payment_info['qr_code_url'] = qr_path
+        # Reassign so the JSON column change is persisted
+        payment_info['qr_code_url'] = qr_path
+        coach.payment_info = payment_info
         db.session.commit()
         
         return jsonify({
@@ -2276,19 +2110,10 @@ def upload_payment_proof(booking_id):
     
     # Save the image
     try:
-        from app.utils.file_utils import save_uploaded_file
-        
-        # Create directory path for payment proofs
-        import os
-        proof_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'payment_proofs')
-        os.makedirs(proof_dir, exist_ok=True)
-        
-        # Save file with unique name
-        filename = f"booking_{booking_id}_{proof_type}_{int(datetime.utcnow().timestamp())}"
-        image_path = save_uploaded_file(file, proof_dir, filename)
+        image_path = store_proof(file, 'payment_proofs')
         
         if not image_path:
-            return jsonify({'error': 'Failed to save file'}), 500
+            return jsonify({'error': 'File must be an image or PDF'}), 400
         
         # Create payment proof record
         proof = PaymentProof(
@@ -2398,8 +2223,6 @@ def update_payment_status():
     elif proof.proof_type == 'court':
         booking.court_payment_status = status
     
-    db.session.commit()
-    
     # Create notification for student
     from app.models.notification import Notification
     
@@ -2415,12 +2238,13 @@ def update_payment_status():
         notification.message += f": {notes}"
     
     db.session.add(notification)
-    db.session.commit()
     
-    # Send email notification
+    # Queue the email notification in the same transaction
     from app.utils.email import send_student_payment_status_notification
     send_student_payment_status_notification(booking, proof.proof_type, status, notes)
     
+    db.session.commit()
+    
     return jsonify({
         'success': True,
         'message': f'Payment proof {status}'
@@ -2692,9 +2516,10 @@ def create_booking_for_student():
         
         final_price = base_price - discount_amount
         
-        # Determine court fee and coach fee components
-        court_fee = 0  # Can be updated with actual court fee logic
-        coach_fee = final_price - court_fee
+        # Determine court fee and coach fee components. The package covers coaching
+        # only, so the court fee is owed on top of the (coach-only) session price
+        court_fee = resolve_court_fee(int(data['court_id']), start_time, end_time)
+        coach_fee = final_price
         
         # Court booking responsibility
         court_booking_responsibility = 'coach'
@@ -2861,9 +2686,7 @@ def get_academy_coaches():
             continue
             
         # Get average rating
-        avg_rating = db.session.query(func.avg(CoachRating.rating)).filter(
-            CoachRating.coach_id == coach.id
-        ).scalar() or 0
+        avg_rating, _ = CoachRatingSummary.get_for_coach(coach.id)
         
         coach_data = {
             'id': coach.id,
@@ -2899,11 +2722,10 @@ def get_academy_analytics():
     academy_coaches = AcademyCoach.query.filter_by(academy_id=academy_id).all()
     coach_ids = [ac.coach_id for ac in academy_coaches]
     
+    earnings = EarningsReport(coach_ids)
+    
     # Get total sessions (completed bookings)
-    total_sessions = Booking.query.filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed'
-    ).count()
+    total_sessions = earnings.sessions
     
     # Get total students (unique students who have booked with academy coaches)
     total_students = db.session.query(func.count(func.distinct(Booking.student_id))).filter(
@@ -2911,41 +2733,19 @@ def get_academy_analytics():
     ).scalar() or 0
     
     # Get total revenue
-    total_revenue = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed'
-    ).scalar() or 0
+    total_revenue = earnings.total
     
     # Get sessions by coach
-    sessions_by_coach = {}
-    for coach_id in coach_ids:
-        coach = Coach.query.get(coach_id)
-        if coach and coach.user:
-            coach_name = f"{coach.user.first_name} {coach.user.last_name}"
-            session_count = Booking.query.filter(
-                Booking.coach_id == coach_id,
-                Booking.status == 'completed'
-            ).count()
-            
-            if session_count > 0:
-                sessions_by_coach[coach_name] = session_count
+    sessions_by_coach = {
+        f"{coach.first_name} {coach.last_name}": coach.sessions
+        for coach in earnings.coaches.values() if coach.sessions > 0
+    }
     
     # Get revenue by month
-    revenue_by_month = {}
-    now = datetime.utcnow()
-    
-    for i in range(11, -1, -1):
-        month_start = now.replace(day=1) - timedelta(days=i*30)
-        month_key = month_start.strftime('%Y-%m')
-        
-        month_revenue = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.status == 'completed',
-            extract('year', Booking.date) == month_start.year,
-            extract('month', Booking.date) == month_start.month
-        ).scalar() or 0
-        
-        revenue_by_month[month_key] = float(month_revenue)
+    revenue_by_month = {
+        month_start.strftime('%Y-%m'): earnings.month(month_start)
+        for month_start in month_starts(12)
+    }
     
     return jsonify({
         'total_sessions': total_sessions,
@@ -3051,116 +2851,10 @@ def get_academy_earnings():
             'breakdown': {}
         })
     
-    # Get total earnings
-    total_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed'
-    ).scalar() or 0
-    
-    # Current month earnings
-    now = datetime.utcnow()
-    this_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed',
-        extract('year', Booking.date) == now.year,
-        extract('month', Booking.date) == now.month
-    ).scalar() or 0
-    
-    # Last month earnings
-    last_month = now.replace(day=1) - timedelta(days=1)
-    last_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed',
-        extract('year', Booking.date) == last_month.year,
-        extract('month', Booking.date) == last_month.month
-    ).scalar() or 0
-    
-    # Get monthly earnings for chart
-    monthly_data = {}
-    months_to_fetch = 12
-    
-    for i in range(months_to_fetch-1, -1, -1):
-        month_date = now.replace(day=1) - timedelta(days=i*30)
-        month_key = month_date.strftime('%Y-%m')
-        month_name = month_date.strftime('%B %Y')
-        
-        month_earnings = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.status == 'completed',
-            extract('year', Booking.date) == month_date.year,
-            extract('month', Booking.date) == month_date.month
-        ).scalar() or 0
-        
-        monthly_data[month_name] = float(month_earnings)
-    
-    # Get earnings by court
-    court_earnings = {}
-    courts = Court.query.all()
-    for court in courts:
-        court_total = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.court_id == court.id,
-            Booking.status == 'completed'
-        ).scalar() or 0
-        
-        if court_total > 0:
-            court_earnings[court.name] = float(court_total)
-    
-    # Get earnings breakdown by discount type
-    earnings_breakdown = {}
-    
-    # Regular sessions (no discount)
-    regular_count = Booking.query.filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed',
-        Booking.pricing_plan_id.is_(None)
-    ).count()
-    
-    regular_amount = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed',
-        Booking.pricing_plan_id.is_(None)
-    ).scalar() or 0
-    
-    if regular_count > 0:
-        earnings_breakdown['regular'] = {
-            'sessions': regular_count,
-            'amount': float(regular_amount)
-        }
-    
-    # Discounted sessions by type
-    for discount_type in ['first_time', 'package', 'seasonal', 'custom']:
-        discount_count = Booking.query.join(PricingPlan).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.status == 'completed',
-            PricingPlan.discount_type == discount_type
-        ).count()
-        
-        discount_amount = db.session.query(func.sum(Booking.price)).join(PricingPlan).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.status == 'completed',
-            PricingPlan.discount_type == discount_type
-        ).scalar() or 0
-        
-        if discount_count > 0:
-            earnings_breakdown[discount_type] = {
-                'sessions': discount_count,
-                'amount': float(discount_amount)
-            }
-    
-    # Calculate monthly average
-    months_with_earnings = sum(1 for e in monthly_data.values() if e > 0)
-    monthly_average = total_earnings / months_with_earnings if months_with_earnings > 0 else 0
-    
-    return jsonify({
-        'total': float(total_earnings),
-        'monthly_average': float(monthly_average),
-        'this_month': float(this_month_earnings),
-        'last_month': float(last_month_earnings),
-        'monthly': monthly_data,
-        'by_court': court_earnings,
-        'breakdown': earnings_breakdown
-    })
+    report = EarningsReport(coach_ids)
+    earnings = report.summary()
+    earnings['monthly_average'] = report.monthly_average()
+    return jsonify(earnings)
 
 @bp.route('/academy/earnings/breakdown/<period>', methods=['GET'])
 @login_required
@@ -3182,74 +2876,24 @@ def get_academy_earnings_breakdown(period):
         return jsonify({'breakdown': {}})
     
     # Define date range based on period
-    now = datetime.utcnow()
-    start_date = None
+    this_month = month_starts(1)[0]
+    start_date = end_date = None
     
     if period == 'this-month':
-        start_date = now.replace(day=1)
+        start_date = this_month
     elif period == 'last-month':
-        first_day_of_month = now.replace(day=1)
-        start_date = first_day_of_month - timedelta(days=1)
-        start_date = start_date.replace(day=1)
-        # End date is the last day of last month
-        end_date = first_day_of_month - timedelta(days=1)
+        start_date = previous_month(this_month)
+        end_date = this_month - timedelta(days=1)
     elif period == 'this-year':
-        start_date = now.replace(month=1, day=1)
+        start_date = this_month.replace(month=1)
     elif period == 'all-time':
         # No date filter needed
         pass
     else:
         return jsonify({'error': 'Invalid period specified'}), 400
     
-    # Get earnings breakdown by discount type
-    breakdown = {}
-    
-    # Base query for completed bookings by academy coaches
-    base_query = Booking.query.filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed'
-    )
-    
-    # Apply date filter if needed
-    if start_date:
-        if period == 'last-month':
-            base_query = base_query.filter(
-                Booking.date >= start_date,
-                Booking.date <= end_date
-            )
-        else:
-            base_query = base_query.filter(Booking.date >= start_date)
-    
-    # Regular sessions (no discount)
-    regular_count = base_query.filter(Booking.pricing_plan_id.is_(None)).count()
-    
-    regular_amount = db.session.query(func.sum(Booking.price)).filter(
-        Booking.id.in_([b.id for b in base_query.filter(Booking.pricing_plan_id.is_(None)).all()])
-    ).scalar() or 0
-    
-    breakdown['regular'] = {
-        'sessions': regular_count,
-        'amount': float(regular_amount)
-    }
-    
-    # Discounted sessions by type
-    for discount_type in ['first_time', 'package', 'seasonal', 'custom']:
-        discount_bookings = base_query.join(PricingPlan).filter(
-            PricingPlan.discount_type == discount_type
-        ).all()
-        
-        discount_count = len(discount_bookings)
-        
-        discount_amount = db.session.query(func.sum(Booking.price)).filter(
-            Booking.id.in_([b.id for b in discount_bookings])
-        ).scalar() or 0
-        
-        breakdown[discount_type] = {
-            'sessions': discount_count,
-            'amount': float(discount_amount)
-        }
-    
-    return jsonify({'breakdown': breakdown})
+    report = EarningsReport(coach_ids, start_date=start_date, end_date=end_date, by_court_and_coach=False)
+    return jsonify({'breakdown': report.breakdown(include_empty=True)})
 
 @bp.route('/coach/update-payment-details', methods=['POST'])
 @login_required
@@ -3262,6 +2906,10 @@ def update_payment_details():
     data = request.get_json()
     coach = Coach.query.filter_by(user_id=current_user.id).first_or_404()
     
+    # The QR code is not part of the new details
+    if coach.payment_info and coach.payment_info.get('qr_code_url'):
+        delete_file(coach.payment_info['qr_code_url'])
+    
     # Update payment info
     payment_info = {
         'bank_name': data.get('bank_name'),
@@ -3775,16 +3423,10 @@ def upload_court_proof():
     ).first_or_404()
     
     try:
-        # Create directory for proofs if it doesn't exist
-        proofs_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'booking_proofs')
-        os.makedirs(proofs_dir, exist_ok=True)
-        
-        # Save the file with a unique name
-        filename = f"court_proof_{booking_id}_{int(datetime.utcnow().timestamp())}"
-        file_path = save_uploaded_file(file, proofs_dir, filename)
+        file_path = store_proof(file, 'booking_proofs')
         
         if not file_path:
-            return jsonify({'error': 'Failed to save file'}), 500
+            return jsonify({'error': 'File must be an image or PDF'}), 400
         
         # Check if proof already exists
         existing_proof = PaymentProof.query.filter_by(
@@ -4143,20 +3785,10 @@ def purchase_package():
         
         # Save payment proof
         if payment_proof:
-            # Create directory for proofs if it doesn't exist
-            proofs_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'package_proofs')
-            os.makedirs(proofs_dir, exist_ok=True)
-            
-            # Save the file with a unique name
-            unique_id = uuid.uuid4().hex
-            filename = f"package_{package.id}_{unique_id}_{secure_filename(payment_proof.filename)}"
-            file_path = os.path.join(proofs_dir, filename)
-            payment_proof.save(file_path)
-            
-            # Store the payment proof in the database
-            # Let's create a PaymentProof entry for the package
-            # This assumes we can use the same PaymentProof model with a new type
-            relative_path = os.path.join('package_proofs', filename).replace('\\', '/')
+            relative_path = store_proof(payment_proof, 'package_proofs')
+            if not relative_path:
+                db.session.rollback()
+                return jsonify({'error': 'Payment proof must be an image or PDF'}), 400
             
             # Create a payment proof record
             from app.models.payment import PaymentProof
@@ -4216,7 +3848,7 @@ def get_academies():
     """API endpoint to get filtered academies data"""
     # Get query parameters
     search_query = request.args.get('query', '')
-    sort_by = request.args.get('sort_by', 'name')  # Default sort by name
+    sort_by = request.args.get('sort_by', 'relevance' if search_query else 'name')  # Default sort by name
     sort_direction = request.args.get('sort_direction', 'asc')
     
     # Base query - join with coaches to count them
@@ -4232,23 +3864,33 @@ def get_academies():
     )
     
     # Apply filters
+    matches = None
     if search_query:
-        search_term = f"%{search_query}%"
-        query = query.filter(
-            db.or_(
-                Academy.name.ilike(search_term),
-                Academy.description.ilike(search_term)
+        matches = academy_search_matches(search_query)
+        if matches is None:
+            # No full-text index available on this database
+            search_term = f"%{search_query}%"
+            query = query.filter(
+                db.or_(
+                    Academy.name.ilike(search_term),
+                    Academy.description.ilike(search_term)
+                )
             )
-        )
+        else:
+            query = query.join(matches, matches.c.academy_id == Academy.id)
     
     # Group by academy to support coach count
     query = query.group_by(Academy.id)
+    if matches is not None:
+        query = query.group_by(matches.c.search_rank)
     
     # Apply sorting
     if sort_by == 'name':
         order_col = Academy.name
     elif sort_by == 'coaches':
         order_col = func.count(AcademyCoach.id)
+    elif sort_by == 'relevance' and matches is not None:
+        order_col = matches.c.search_rank
     else:  # Default to name
         order_col = Academy.name
     
@@ -4362,11 +4004,7 @@ def get_academy_by_url_code(private_url_code):
     formatted_coaches = []
     for coach in coaches:
         # Get coach rating
-        avg_rating = db.session.query(func.avg(CoachRating.rating)).filter(
-            CoachRating.coach_id == coach.id
-        ).scalar() or 0
-        
-        rating_count = CoachRating.query.filter_by(coach_id=coach.id).count()
+        avg_rating, rating_count = CoachRatingSummary.get_for_coach(coach.id)
         
         formatted_coaches.append({
             'id': coach.id,
@@ -4616,8 +4254,7 @@ def get_student_coaches():
     result = []
     for coach in coaches:
         # Get coach rating
-        avg_rating = db.session.query(func.avg(CoachRating.rating)).filter(CoachRating.coach_id == coach.id).scalar() or 0
-        rating_count = CoachRating.query.filter_by(coach_id=coach.id).count()
+        avg_rating, rating_count = CoachRatingSummary.get_for_coach(coach.id)
         
         # Get coach courts
         coach_courts = CoachCourt.query.filter_by(coach_id=coach.id).all()
@@ -4653,11 +4290,11 @@ def get_student_bookings(status):
     
     if not current_user.is_coach:
         student_id = current_user.id
-        query = Booking.query.filter(Booking.student_id == student_id)
+        query = student_booking_serializer.query().filter(Booking.student_id == student_id)
     else:
         student_id = request.args.get('student_id', type=int)
         coach = Coach.query.filter_by(user_id=current_user.id).first_or_404()
-        query = Booking.query.filter(Booking.student_id == student_id, Booking.coach_id == coach.id)
+        query = student_booking_serializer.query().filter(Booking.student_id == student_id, Booking.coach_id == coach.id)
 
     # Define query based on status
     #query = Booking.query.filter(Booking.student_id == student_id)
@@ -4678,50 +4315,7 @@ def get_student_bookings(status):
     else:
         return jsonify({'error': 'Invalid status provided'}), 400
     
-    bookings = query.all()
-    
-    # Format bookings data
-    result = []
-    for booking in bookings:
-        coach = Coach.query.get(booking.coach_id)
-        coach_user = User.query.get(coach.user_id)
-        
-        booking_data = {
-            'id': booking.id,
-            'coach_id': booking.coach_id,
-            'coach': {
-                'id': coach.id,
-                'user': {
-                    'first_name': coach_user.first_name,
-                    'last_name': coach_user.last_name
-                }
-            },
-            'court_id': booking.court_id,
-            'court': {
-                'id': booking.court.id,
-                'name': booking.court.name
-            },
-            'date': booking.date.isoformat(),
-            'start_time': booking.start_time.strftime('%H:%M:%S'),
-            'end_time': booking.end_time.strftime('%H:%M:%S'),
-            'price': float(booking.price),
-            'base_price': float(booking.base_price),
-            'status': booking.status,
-            'discount_amount': float(booking.discount_amount) if booking.discount_amount else None,
-            'discount_percentage': float(booking.discount_percentage) if booking.discount_percentage else None
-        }
-        
-        # Add session log if it exists
-        if hasattr(booking, 'session_log') and booking.session_log:
-            booking_data['session_log'] = {
-                'id': booking.session_log.id,
-                'title': booking.session_log.title,
-                'notes': booking.session_log.notes
-            }
-        
-        result.append(booking_data)
-    
-    return jsonify(result)
+    return jsonify(student_booking_serializer.dump_many(query))
 
 @bp.route('/student/bookings/cancel', methods=['POST'])
 @login_required
@@ -5,19 +5,20 @@ from app import db
 from app.models.user import User
 from app.models.coach import Coach
 from app.models.court import Court, CoachCourt
-from app.models.court_fee import CourtFee
 from app.models.pricing import PricingPlan
 from app.models.booking import Availability, Booking, AvailabilityReservation
 from app.models.package import BookingPackage
 from app.forms.booking import BookingForm
 from datetime import datetime, timedelta
-from sqlalchemy import and_
+from sqlalchemy import and_, or_
 from sqlalchemy.exc import IntegrityError
-from app.models.notification import Notification
 from app.utils.email import send_coach_booking_notification
-from werkzeug.utils import secure_filename
-from app.models.payment import PaymentProof
-import os
+from app.utils.court_fees import get_court_fee_table, get_court_fee_tables
+from app.utils.proof_storage import store_proof
+from app.utils.checkout import (
+    CheckoutError, find_checkout, claim_checkout, lock_reserved_slots, load_checkout_context,
+    check_package, price_bookings, insert_bookings, notify_coaches, serialize_checkout_booking
+)
 import uuid 
 import json
 
@@ -51,7 +52,7 @@ def get_availability(coach_id, court_id, date):
         ).all()
         
         # Get court fees for this court
-        court_fees = CourtFee.query.filter_by(court_id=court_id).all()
+        fee_table = get_court_fee_table(court_id)
         
         # Get coach pricing plans
         pricing_plans = PricingPlan.query.filter(
@@ -60,61 +61,13 @@ def get_availability(coach_id, court_id, date):
         ).all()
         
         # Organize pricing plans for easier client-side processing
-        formatted_plans = []
-        for plan in pricing_plans:
-            if plan.discount_type != 'package':
-                plan_data = {
-                    'id': plan.id,
-                    'name': plan.name,
-                    'description': plan.description,
-                    'discount_type': plan.discount_type,
-                    'sessions_required': plan.sessions_required,
-                    'first_time_only': plan.first_time_only,
-                }
-                
-                if plan.percentage_discount:
-                    plan_data['discount_amount'] = plan.percentage_discount
-                    plan_data['discount_type_amount'] = 'percentage'
-                elif plan.fixed_discount:
-                    plan_data['discount_amount'] = plan.fixed_discount
-                    plan_data['discount_type_amount'] = 'fixed'
-                    
-                if plan.valid_from and plan.valid_to:
-                    plan_data['valid_from'] = plan.valid_from.isoformat() if plan.valid_from else None
-                    plan_data['valid_to'] = plan.valid_to.isoformat() if plan.valid_to else None
-                    
-                formatted_plans.append(plan_data)
+        formatted_plans = format_pricing_plans(pricing_plans)
         
         # Format court fees for client-side use
-        formatted_fees = []
-        for fee in court_fees:
-            formatted_fees.append({
-                'start_time': fee.start_time.strftime('%H:%M'),
-                'end_time': fee.end_time.strftime('%H:%M'),
-                'fee': fee.fee
-            })
-        
-        available_slots = []
-        booked_slots = []
+        formatted_fees = format_court_fees(fee_table.bands)
         
-        for a in availabilities:
-            # Determine court fee for this time slot
-            court_fee = get_court_fee_for_time(court_fees, a.start_time)
-            
-            available_slots.append({
-                'id': a.id,
-                'time': a.start_time.strftime('%I:%M %p'),
-                'court_fee': court_fee,
-                'student_books_court': a.student_books_court  # Include booking responsibility
-            })
-            
-        for b in bookings:
-            court_fee = get_court_fee_for_time(court_fees, b.start_time)
-            
-            booked_slots.append({
-                'time': b.start_time.strftime('%I:%M %p'),
-                'court_fee': court_fee
-            })
+        available_slots = [format_available_slot(a, fee_table) for a in availabilities]
+        booked_slots = [format_booked_slot(b, fee_table) for b in bookings]
             
         return jsonify({
             'available': available_slots,
@@ -125,15 +78,144 @@ def get_availability(coach_id, court_id, date):
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+MAX_CALENDAR_DAYS = 62
+
+@bp.route('/api/availability/<int:coach_id>/calendar')
+def get_availability_calendar(coach_id):
+    """API endpoint to get availability for a coach over a date range and several courts.
 
-def get_court_fee_for_time(court_fees, slot_time):
-    """Helper function to determine the court fee for a specific time slot"""
-    for fee in court_fees:
-        if fee.start_time <= slot_time <= fee.end_time:
-            return fee.fee
+    Query parameters: start and end (YYYY-MM-DD, inclusive) and an optional
+    comma-separated court_ids list (defaults to all of the coach's courts).
+    Everything is loaded with a fixed number of queries regardless of range size.
+    """
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'start and end are required in YYYY-MM-DD format'}), 400
+    
+    if end_date < start_date:
+        return jsonify({'error': 'end must not be before start'}), 400
+    if (end_date - start_date).days + 1 > MAX_CALENDAR_DAYS:
+        return jsonify({'error': f'Date range cannot exceed {MAX_CALENDAR_DAYS} days'}), 400
+    
+    court_ids_param = request.args.get('court_ids', '')
+    try:
+        court_ids = [int(court_id) for court_id in court_ids_param.split(',') if court_id.strip()]
+    except ValueError:
+        return jsonify({'error': 'court_ids must be a comma-separated list of integers'}), 400
     
-    # Default fee if no matching time range is found
-    return 0.0
+    if not court_ids:
+        court_ids = [court_id for court_id, in db.session.query(CoachCourt.court_id).filter(
+            CoachCourt.coach_id == coach_id
+        )]
+    
+    courts = Court.query.filter(Court.id.in_(court_ids)).all() if court_ids else []
+    court_ids = [court.id for court in courts]
+    
+    availabilities = Availability.query.filter(
+        Availability.coach_id == coach_id,
+        Availability.court_id.in_(court_ids),
+        Availability.date >= start_date,
+        Availability.date <= end_date,
+        Availability.is_booked == False
+    ).order_by(Availability.date, Availability.start_time).all() if court_ids else []
+    
+    bookings = Booking.query.filter(
+        Booking.coach_id == coach_id,
+        Booking.court_id.in_(court_ids),
+        Booking.date >= start_date,
+        Booking.date <= end_date
+    ).order_by(Booking.date, Booking.start_time).all() if court_ids else []
+    
+    fee_tables = get_court_fee_tables(court_ids)
+    
+    pricing_plans = PricingPlan.query.filter(
+        PricingPlan.coach_id == coach_id,
+        PricingPlan.is_active == True
+    ).all()
+    
+    # days -> court -> {'available', 'booked'}; every requested day/court is present
+    days = {}
+    day = start_date
+    while day <= end_date:
+        days[day.isoformat()] = {
+            str(court_id): {'available': [], 'booked': []} for court_id in court_ids
+        }
+        day += timedelta(days=1)
+    
+    for a in availabilities:
+        days[a.date.isoformat()][str(a.court_id)]['available'].append(
+            format_available_slot(a, fee_tables[a.court_id])
+        )
+    
+    for b in bookings:
+        days[b.date.isoformat()][str(b.court_id)]['booked'].append(
+            format_booked_slot(b, fee_tables[b.court_id])
+        )
+    
+    return jsonify({
+        'coach_id': coach_id,
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'courts': [{
+            'id': court.id,
+            'name': court.name,
+            'court_fees': format_court_fees(fee_tables[court.id].bands)
+        } for court in courts],
+        'days': days,
+        'pricing_plans': format_pricing_plans(pricing_plans)
+    })
+
+def format_pricing_plans(pricing_plans):
+    """Format non-package pricing plans for client-side price calculation"""
+    formatted_plans = []
+    for plan in pricing_plans:
+        if plan.discount_type != 'package':
+            plan_data = {
+                'id': plan.id,
+                'name': plan.name,
+                'description': plan.description,
+                'discount_type': plan.discount_type,
+                'sessions_required': plan.sessions_required,
+                'first_time_only': plan.first_time_only,
+            }
+            
+            if plan.percentage_discount:
+                plan_data['discount_amount'] = plan.percentage_discount
+                plan_data['discount_type_amount'] = 'percentage'
+            elif plan.fixed_discount:
+                plan_data['discount_amount'] = plan.fixed_discount
+                plan_data['discount_type_amount'] = 'fixed'
+                
+            if plan.valid_from and plan.valid_to:
+                plan_data['valid_from'] = plan.valid_from.isoformat() if plan.valid_from else None
+                plan_data['valid_to'] = plan.valid_to.isoformat() if plan.valid_to else None
+                
+            formatted_plans.append(plan_data)
+    return formatted_plans
+
+def format_court_fees(court_fees):
+    """Format court fee bands for client-side use"""
+    return [{
+        'start_time': fee.start_time.strftime('%H:%M'),
+        'end_time': fee.end_time.strftime('%H:%M'),
+        'fee': fee.fee
+    } for fee in court_fees]
+
+def format_available_slot(availability, fee_table):
+    return {
+        'id': availability.id,
+        'time': availability.start_time.strftime('%I:%M %p'),
+        'court_fee': fee_table.fee_for_slot(availability.start_time, availability.end_time),
+        'student_books_court': availability.student_books_court  # Include booking responsibility
+    }
+
+def format_booked_slot(booking, fee_table):
+    return {
+        'time': booking.start_time.strftime('%I:%M %p'),
+        'court_fee': fee_table.fee_for_slot(booking.start_time, booking.end_time)
+    }
 
 @bp.route('/api/bookings/create-with-proofs', methods=['POST'])
 @login_required
@@ -199,302 +281,115 @@ def create_booking_with_proofs():
         if not bookings_data:
             return jsonify({'error': 'No booking data provided'}), 400
         
-        # Ensure all bookings are for a single court
-        unique_court_ids = set()
-        for booking_item in bookings_data:
-            court_id = booking_item.get('court_id')
-            if court_id:
-                unique_court_ids.add(court_id)
-        
-        if len(unique_court_ids) > 1:
-            return jsonify({'error': 'All bookings must be for the same court. Please book one court at a time.'}), 400
-
         # Analyze all availability slots to determine requirements
         all_availability_ids = []
-        total_availability_slots = 0
         for booking_item in bookings_data:
-            all_availability_ids.extend(booking_item.get('availability_ids', []))
-            total_availability_slots += len(booking_item.get('availability_ids', []))
+            try:
+                booking_item['availability_ids'] = parse_availability_ids(booking_item.get('availability_ids', []))
+            except ValueError:
+                return jsonify({'error': 'availability_ids must be a list of integers'}), 400
+            all_availability_ids.extend(booking_item['availability_ids'])
+        total_availability_slots = len(all_availability_ids)
+        
+        if len(set(all_availability_ids)) != total_availability_slots:
+            return jsonify({'error': 'Each availability slot can only be booked once'}), 400
+        
+        # A retried checkout is recognised by its idempotency key (the reservation
+        # token identifies a checkout when the client does not send one)
+        idempotency_key = (
+            request.headers.get('Idempotency-Key')
+            or request.form.get('idempotency_key')
+            or reservation_token
+        )[:64]
 
         # Start a transaction
         db.session.rollback()
         db.session.begin()
-
-        # Verify all slots are reserved by this user with valid reservations
-        for avail_id in all_availability_ids:
-            reservation = AvailabilityReservation.query.filter(
-                AvailabilityReservation.availability_id == avail_id,
-                AvailabilityReservation.student_id == user_id,
-                AvailabilityReservation.reservation_token == reservation_token,
-                AvailabilityReservation.expires_at > datetime.utcnow()
-            ).first()
-            
-            if not reservation:
-                db.session.rollback()
-                return jsonify({
-                    'error': 'Your reservation for one or more slots has expired. Please try again.',
-                    'code': 'RESERVATION_EXPIRED'
-                }), 400
-
-        # Lock and verify all slots are still available
-        unavailable = []
-        for avail_id in all_availability_ids:
-            avail = db.session.query(Availability).filter(
-                Availability.id == avail_id,
-                Availability.is_booked == False
-            ).with_for_update().first()
-            
-            if not avail:
-                unavailable.append(avail_id)
-
-        if unavailable:
+        
+        checkout = find_checkout(user_id, idempotency_key)
+        if checkout and checkout.response:
+            db.session.rollback()
+            return jsonify(checkout.response)
+        
+        try:
+            checkout = claim_checkout(user_id, idempotency_key)
+        except IntegrityError:
             db.session.rollback()
+            checkout = find_checkout(user_id, idempotency_key)
+            if checkout and checkout.response:
+                return jsonify(checkout.response)
             return jsonify({
-                'error': 'One or more selected slots are no longer available',
-                'code': 'SLOT_UNAVAILABLE',
-                'availability_ids': unavailable
+                'error': 'This booking is already being processed. Please wait a moment.',
+                'code': 'CHECKOUT_IN_PROGRESS'
             }), 409
+
+        # Validate and lock: all slots with their reservations in one query
+        availabilities = lock_reserved_slots(user_id, reservation_token, all_availability_ids)
+        
+        # Ensure all bookings are for a single court
+        if len({avail.court_id for avail in availabilities.values()}) > 1:
+            raise CheckoutError({'error': 'All bookings must be for the same court. Please book one court at a time.'})
+        
+        context = load_checkout_context(bookings_data, availabilities)
         
         # Check if a package is being used and has enough sessions
         package = None
-        package_id = None
         for booking_item in bookings_data:
             if booking_item.get('package_id'):
-                package_id = booking_item.get('package_id')
+                package = context['packages'].get(booking_item.get('package_id'))
                 break
-
-        if package_id:
-            package = BookingPackage.query.get(package_id)
-            if package:
-                # Verify package belongs to this user and has sessions remaining
-                if package.student_id != user_id:
-                    return jsonify({'error': 'This package does not belong to you'}), 400
-                    
-                # Verify package is active
-                if package.status != 'active':
-                    return jsonify({'error': 'This package is not active yet. Please wait for approval.'}), 400
-
-                # Check if package has enough remaining sessions
-                sessions_remaining = package.total_sessions - package.sessions_booked
-                if sessions_remaining < total_availability_slots:
-                    return jsonify({'error': f'Not enough sessions remaining in package. You have {sessions_remaining} sessions left, but are trying to book {total_availability_slots} sessions.'}), 400
-                    
-        # Get all availabilities to check booking responsibilities
-        availabilities = Availability.query.filter(Availability.id.in_(all_availability_ids)).all()
+        
+        if package:
+            check_package(package, user_id, total_availability_slots)
         
         # Check if any slots require student booking and any require coach booking
-        has_student_booked_courts = any(a.student_books_court for a in availabilities)
-        has_coach_booked_courts = any(not a.student_books_court for a in availabilities)
+        has_student_booked_courts = any(a.student_books_court for a in availabilities.values())
+        has_coach_booked_courts = any(not a.student_books_court for a in availabilities.values())
         
-        # Check if coach payment is required
-        coach_payment_required = True
-        package_id = None
-        for booking_item in bookings_data:
-            package_id = booking_item.get('package_id')
-            if package_id:
-                # If using a package, coach payment might not be needed
-                break
-                
-        if package_id:
-            # Get package to check if it's valid and covers coaching fee
-            package = BookingPackage.query.get(package_id)
-            if package and package.sessions_booked < package.total_sessions:
-                # Package is valid and has remaining sessions - no coach payment needed
-                coach_payment_required = False
+        # Package is valid and has remaining sessions - no coach payment needed
+        coach_payment_required = not (package and package.sessions_booked < package.total_sessions)
         
         # Validate required proofs based on scenario
         if coach_payment_required and not coach_payment_proof:
-            return jsonify({'error': 'Coach payment proof is required for coaching fees'}), 400
+            raise CheckoutError({'error': 'Coach payment proof is required for coaching fees'})
             
         # Validate court-related proofs
         if has_student_booked_courts and not court_booking_proof:
-            return jsonify({'error': 'Court booking proof is required for courts you need to book'}), 400
+            raise CheckoutError({'error': 'Court booking proof is required for courts you need to book'})
             
         # For coach-booked courts, we need to check if a payment proof is required
         # (could be the same as coach_payment_proof in some systems, separate in others)
         court_payment_required = has_coach_booked_courts
         if court_payment_required and not court_booking_proof:
-            return jsonify({'error': 'Court payment proof is required for court fees paid to coach'}), 400
+            raise CheckoutError({'error': 'Court payment proof is required for court fees paid to coach'})
         
-        # Save uploaded files
-        unique_id = uuid.uuid4().hex
-        proofs_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'payment_proofs')
-        os.makedirs(proofs_dir, exist_ok=True)
+        # Price every slot before anything is written
+        priced, package_sessions_used = price_bookings(
+            bookings_data, availabilities, context, user_id,
+            has_coach_proof=bool(coach_payment_proof),
+            has_court_proof=bool(court_booking_proof)
+        )
         
-        # Save coach payment proof if provided
+        # Stream uploaded files to content-addressed storage; verification and
+        # thumbnails are finished by the upload workers
+        # Each proof row attached below is one reference to the stored file
         coach_proof_path = None
         if coach_payment_proof:
-            coach_proof_filename = f"coach_payment_{unique_id}_{secure_filename(coach_payment_proof.filename)}"
-            coach_proof_path = os.path.join(proofs_dir, coach_proof_filename)
-            coach_payment_proof.save(coach_proof_path)
+            coaching_proofs = sum(1 for booking, _ in priced if booking['coaching_payment_required'])
+            coach_proof_path = store_proof(coach_payment_proof, 'payment_proofs', references=coaching_proofs)
+            if not coach_proof_path:
+                raise CheckoutError({'error': 'Coach payment proof must be an image or PDF'})
+            coach_proof_path = f"uploads/{coach_proof_path}"
         
-        # Save court booking/payment proof if provided
         court_proof_path = None
         if court_booking_proof:
-            court_proof_filename = f"court_booking_{unique_id}_{secure_filename(court_booking_proof.filename)}"
-            court_proof_path = os.path.join(proofs_dir, court_proof_filename)
-            court_booking_proof.save(court_proof_path)
-        
-        # Process each booking
-        bookings_created = []
+            court_proof_path = store_proof(court_booking_proof, 'payment_proofs', references=len(priced))
+            if not court_proof_path:
+                raise CheckoutError({'error': 'Court booking proof must be an image or PDF'})
+            court_proof_path = f"uploads/{court_proof_path}"
         
-        # Initialize package session counter
-        package_sessions_used = 0
-
-        for booking_item in bookings_data:
-            coach_id = booking_item.get('coach_id')
-            court_id = booking_item.get('court_id')
-            availability_ids = booking_item.get('availability_ids', [])
-            package_id = booking_item.get('package_id')
-            
-            # Get coach hourly rate
-            coach = Coach.query.get(coach_id)
-            if not coach:
-                return jsonify({'error': f'Coach with ID {coach_id} not found'}), 404
-                
-            hourly_rate = coach.hourly_rate
-            
-            # Check for package
-            package = None
-            if package_id:
-                package = BookingPackage.query.get(package_id)
-                
-                # Verify package belongs to this user and has sessions remaining
-                if not package or package.student_id != user_id or package.sessions_booked >= package.total_sessions:
-                    return jsonify({'error': 'Invalid package or insufficient sessions remaining'}), 400
-                
-                # Verify package can be used with this coach
-                if not package.can_use_for_coach(coach_id):
-                    return jsonify({'error': 'This package cannot be used with this coach'}), 400
-            
-            # Process each availability slot
-            for avail_id in availability_ids:
-                availability = Availability.query.get(avail_id)
-                
-                if not availability or availability.is_booked:
-                    return jsonify({'error': 'One or more selected slots are no longer available'}), 400
-                    
-                # Get court fee for this time
-                court_fees = CourtFee.query.filter_by(court_id=court_id).all()
-                court_fee = get_court_fee_for_time(court_fees, availability.start_time)
-                
-                # Calculate total price (coach fee + court fee)
-                base_price = hourly_rate + court_fee
-                
-                # Apply discount if any
-                discount_percentage = None
-                discount_amount = None
-                price = base_price
-                
-                # Check for applied pricing plan
-                pricing_plan_id = booking_item.get('pricing_plan_id')
-                if pricing_plan_id:
-                    pricing_plan = PricingPlan.query.get(pricing_plan_id)
-                    
-                    if pricing_plan and pricing_plan.is_active:
-                        # Set discount values
-                        if pricing_plan.percentage_discount:
-                            discount_percentage = pricing_plan.percentage_discount
-                            discount_value = base_price * (discount_percentage / 100)
-                            price = base_price - discount_value
-                        elif pricing_plan.fixed_discount:
-                            # Distribute fixed discount proportionally across all booked sessions
-                            per_session_discount = pricing_plan.fixed_discount / len(availability_ids)
-                            discount_amount = per_session_discount
-                            price = base_price - per_session_discount
-                
-                # If using package, set coach fee to 0
-                if package and package_sessions_used < (package.total_sessions - package.sessions_booked):
-                    price = court_fee  # Only pay for court
-                    package_sessions_used += 1  # Increment package session counter
-                
-                    package.bookings.append(booking)
-
-                # Mark availability as booked
-                availability.is_booked = True
-                
-                # Determine payment statuses based on this specific slot
-                student_books_court = availability.student_books_court
-                
-                # Coaching payment status
-                coaching_payment_required = not package  # No coaching payment needed if using package
-                coaching_payment_status = 'not_required'
-                if coaching_payment_required:
-                    coaching_payment_status = 'uploaded' if coach_payment_proof else 'pending'
-                
-                # Court payment/booking status
-                court_payment_required = True  # Court fee is always required
-                
-                if student_books_court:
-                    # Student books court directly with venue
-                    court_payment_status = 'uploaded' if court_booking_proof else 'pending'
-                else:
-                    # Coach books court, student pays coach for court fee
-                    court_payment_status = 'uploaded' if court_booking_proof else 'pending'
-
-                # Create booking
-                booking = Booking(
-                    student_id=user_id,
-                    coach_id=coach_id,
-                    court_id=court_id,
-                    availability_id=availability.id,
-                    date=availability.date,
-                    start_time=availability.start_time,
-                    end_time=availability.end_time,
-                    base_price=base_price,
-                    price=price,
-                    court_fee=court_fee,
-                    coach_fee=hourly_rate,
-                    status='upcoming',
-                    pricing_plan_id=pricing_plan_id,
-                    discount_percentage=discount_percentage,
-                    discount_amount=discount_amount,
-                    court_payment_required=court_payment_required,
-                    court_payment_status=court_payment_status,
-                    coaching_payment_required=coaching_payment_required,
-                    coaching_payment_status=coaching_payment_status,
-                    court_booking_responsibility = 'student' if availability.student_books_court else 'student',
-                )
-                
-                db.session.add(booking)
-                db.session.flush()  # Get booking ID
-                
-                # Associate booking with package if applicable
-                if package:
-                    package.bookings.append(booking)
-            
-                # Add coach payment proof if provided
-                if coach_payment_proof and coach_proof_path and coaching_payment_required:
-                    coach_proof = PaymentProof(
-                        booking_id=booking.id,
-                        image_path=coach_proof_path.replace(current_app.config['UPLOAD_FOLDER'] + '\\', 'uploads\\'),
-                        proof_type='coaching',
-                        status='pending'
-                    )
-                    db.session.add(coach_proof)
-                
-                # Add court proof - this covers both direct booking proof and court fee payment to coach
-                if court_booking_proof and court_proof_path:
-                    proof_type = 'court'
-                    court_proof = PaymentProof(
-                        booking_id=booking.id,
-                        image_path=court_proof_path.replace(current_app.config['UPLOAD_FOLDER'] + '\\', 'uploads\\'),
-                        proof_type=proof_type,
-                        status='pending'
-                    )
-                    db.session.add(court_proof)
-                
-                bookings_created.append({
-                    'id': booking.id,
-                    'date': availability.date.isoformat(),
-                    'start_time': availability.start_time.strftime('%I:%M %p'),
-                    'end_time': availability.end_time.strftime('%I:%M %p'),
-                    'coach_fee': hourly_rate,
-                    'court_fee': court_fee,
-                    'base_price': base_price,
-                    'price': price,
-                    'student_books_court': availability.student_books_court
-                })
+        # Insert bookings, attach proofs and link packages
+        insert_bookings(priced, availabilities, coach_proof_path, court_proof_path)
         
         # After all bookings are processed, update the package sessions count ONCE
         if package and package_sessions_used > 0:
@@ -503,113 +398,103 @@ def create_booking_with_proofs():
         # Generate confirmation number
         confirmation_number = f"PBC-{uuid.uuid4().hex[:8].upper()}"
         
-        # Create notification for coach
-        notification = Notification(
-            user_id=coach.user_id,
-            title="New booking with payment proof",
-            message=f"New booking on {booking.date.strftime('%Y-%m-%d')} with payment proof uploaded",
-            notification_type="booking",
-            related_id=booking.id
-        )
-        db.session.add(notification)
+        # Create notifications for coaches
+        notify_coaches(priced, context['coaches'])
         
-        try:
-            for avail_id in all_availability_ids:
-                AvailabilityReservation.query.filter_by(
-                    availability_id=avail_id,
-                    student_id=user_id
-                ).delete()
-        except Exception as e:
-            # Just log this error, don't affect the booking success
-            current_app.logger.warning(f"Failed to clean up reservations for user {user_id}: {str(e)}")
-
-        # Commit all changes
-        db.session.commit()
+        AvailabilityReservation.query.filter(
+            AvailabilityReservation.availability_id.in_(all_availability_ids),
+            AvailabilityReservation.student_id == user_id
+        ).delete(synchronize_session=False)
         
-        return jsonify({
+        response = {
             'success': True,
             'message': 'Bookings created successfully with payment proofs',
             'confirmation_number': confirmation_number,
-            'bookings': bookings_created
-        })
+            'bookings': [
+                serialize_checkout_booking(booking, availabilities[booking['availability_id']])
+                for booking, _ in priced
+            ]
+        }
+        checkout.confirmation_number = confirmation_number
+        checkout.response = response
+
+        # Commit all changes
+        db.session.commit()
         
-    except Exception as e:
+        return jsonify(response)
+    
+    except CheckoutError as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 400
+        return jsonify(e.payload), e.status
+        
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Checkout failed')
+        return jsonify({'error': 'Could not create the bookings. Please try again.'}), 500
 
 @bp.route('/api/reserve-slots', methods=['POST'])
 def reserve_availability_slots():
     """Create temporary reservations for selected availability slots"""
     data = request.get_json()
-    availability_ids = data.get('availability_ids', [])
-    
-    current_user_id = -1
-
     try:
-        current_user_id = current_user.id
-    except:
-        print("Current user is an anonymous user")
+        availability_ids = parse_availability_ids(data.get('availability_ids', []))
+    except ValueError:
+        return jsonify({'error': 'availability_ids must be a list of integers'}), 400
+    
+    # Anonymous visitors hold slots as user -1
+    current_user_id = current_user.id if current_user.is_authenticated else -1
 
     if not availability_ids:
         return jsonify({'error': 'No availability slots selected'}), 400
     
-    # Check if any slots are already booked or reserved
-    availabilities = Availability.query.filter(
+    # Each slot can only carry one hold
+    availability_ids = list(dict.fromkeys(availability_ids))
+    now = datetime.utcnow()
+    
+    # Check booked state and live holds for every slot in one query
+    rows = db.session.query(
+        Availability,
+        AvailabilityReservation.student_id
+    ).outerjoin(
+        AvailabilityReservation,
+        and_(
+            AvailabilityReservation.availability_id == Availability.id,
+            AvailabilityReservation.expires_at > now
+        )
+    ).filter(
         Availability.id.in_(availability_ids)
-    ).all()
+    ).order_by(Availability.id).all()
     
     # Check availability
-    for avail in availabilities:
+    for avail, holder_id in rows:
         if avail.is_booked:
-            return jsonify({
-                'error': 'One or more selected slots are no longer available',
-                'availability_id': avail.id,
-                'start_time': avail.start_time.strftime("%H:%M"),
-                'availability_date': avail.date.strftime("%m/%d/%Y")
-            }), 409  # 409 Conflict
+            return slot_conflict_response(avail, 'One or more selected slots are no longer available')
         
-        # Check for existing non-expired reservations
-        existing_reservation = AvailabilityReservation.query.filter(
-            AvailabilityReservation.availability_id == avail.id,
-            AvailabilityReservation.expires_at > datetime.utcnow()
-        ).first()
-        
-        if existing_reservation and existing_reservation.student_id != current_user_id:
-            return jsonify({
-                'error': 'One or more selected slots are currently being booked by another student',
-                'availability_id': avail.id,
-                'start_time': avail.start_time.strftime("%H:%M"),
-                'availability_date': avail.date.strftime("%m/%d/%Y")
-            }), 409  # 409 Conflict
+        if holder_id is not None and holder_id != current_user_id:
+            return slot_conflict_response(avail, 'One or more selected slots are currently being booked by another student')
     
     # Create reservations
-    reservations = []
     reservation_token = str(uuid.uuid4())
-    expires_at = datetime.utcnow() + timedelta(minutes=15)  # 15-minute timeout
+    expires_at = now + timedelta(minutes=15)  # 15-minute timeout
     
     try:
-        for avail_id in availability_ids:
-            # Delete any existing expired reservations
-            AvailabilityReservation.query.filter(
-                AvailabilityReservation.availability_id == avail_id,
-                AvailabilityReservation.expires_at <= datetime.utcnow()
-            ).delete()
-            
-            # Delete existing reservation by this user if any
-            AvailabilityReservation.query.filter(
-                AvailabilityReservation.availability_id == avail_id,
+        # Delete expired reservations and this user's own holds on these slots
+        AvailabilityReservation.query.filter(
+            AvailabilityReservation.availability_id.in_(availability_ids),
+            or_(
+                AvailabilityReservation.expires_at <= now,
                 AvailabilityReservation.student_id == current_user_id
-            ).delete()
-            
-            # Create new reservation
-            reservation = AvailabilityReservation(
-                availability_id=avail_id,
-                student_id=current_user_id,
-                reservation_token=reservation_token,
-                expires_at=expires_at
             )
-            db.session.add(reservation)
-            reservations.append(reservation)
+        ).delete(synchronize_session=False)
+        
+        # Create all new reservations in one batch
+        db.session.execute(db.insert(AvailabilityReservation), [{
+            'availability_id': avail_id,
+            'student_id': current_user_id,
+            'reservation_token': reservation_token,
+            'expires_at': expires_at,
+            'created_at': now
+        } for avail_id in availability_ids])
         
         db.session.commit()
         
@@ -618,11 +503,40 @@ def reserve_availability_slots():
             'reservation_token': reservation_token,
             'expires_at': expires_at.isoformat()
         })
+    
+    except IntegrityError:
+        # Another request took a hold after the check; report it like any other conflict
+        db.session.rollback()
+        holders = dict(db.session.query(
+            AvailabilityReservation.availability_id,
+            AvailabilityReservation.student_id
+        ).filter(
+            AvailabilityReservation.availability_id.in_(availability_ids),
+            AvailabilityReservation.expires_at > datetime.utcnow()
+        ).all())
+        for avail, _ in rows:
+            if holders.get(avail.id, current_user_id) != current_user_id:
+                return slot_conflict_response(avail, 'One or more selected slots are currently being booked by another student')
+        return jsonify({'error': 'Could not reserve the selected slots. Please try again.'}), 409
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def parse_availability_ids(values):
+    """Return posted availability ids as ints (numeric strings are accepted); raises ValueError otherwise"""
+    if not isinstance(values, list):
+        raise ValueError('availability_ids must be a list')
+    return [int(str(value)) for value in values]
+
+def slot_conflict_response(avail, message):
+    return jsonify({
+        'error': message,
+        'availability_id': avail.id,
+        'start_time': avail.start_time.strftime("%H:%M"),
+        'availability_date': avail.date.strftime("%m/%d/%Y")
+    }), 409  # 409 Conflict
+
 
 @bp.route('/book/<int:coach_id>', methods=['GET', 'POST'])
 @login_required
@@ -1,20 +1,17 @@
 # app/routes/coaches.py
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import current_user, login_required
-from app import db
 from app.models.coach import Coach, CoachImage
-from app.models.user import User
 from app.models.court import Court, CoachCourt
 from app.models.booking import Availability, Booking
 from app.models.session_log import SessionLog
-from app.models.rating import CoachRating
+from app.models.rating import CoachRatingSummary
 from app.models.tag import Tag, CoachTag
 from app.models.pricing import PricingPlan
 from app.models.package import BookingPackage
-from app.models.academy import Academy, AcademyCoach, AcademyManager, AcademyCoachRole
-from app.models.academy_pricing import AcademyPricingPlan
-from datetime import datetime, timedelta
-from sqlalchemy import func, or_, extract
+from app.models.academy import AcademyCoach, AcademyManager
+from app.utils.earnings import EarningsReport
+from datetime import datetime
 from functools import wraps
 
 bp = Blueprint('coaches', __name__)
@@ -89,17 +86,11 @@ def dashboard():
     # Calculate total earnings
     total_earnings = 0
     if coach:
-        total_earnings = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id == coach.id,
-            Booking.status == 'completed'
-        ).scalar() or 0
+        total_earnings = EarningsReport([coach.id], by_court_and_coach=False).total
     elif current_user.is_academy_manager:
         # For academy managers, calculate earnings for all academy coaches
         if coach_ids:
-            total_earnings = db.session.query(func.sum(Booking.price)).filter(
-                Booking.coach_id.in_(coach_ids),
-                Booking.status == 'completed'
-            ).scalar() or 0
+            total_earnings = EarningsReport(coach_ids, by_court_and_coach=False).total
     
     profile_picture = None
     if current_user.profile_picture:
@@ -125,8 +116,7 @@ def dashboard_profile():
     coach = Coach.query.filter_by(user_id=current_user.id).first_or_404()
     
     # Get coach rating
-    avg_rating = db.session.query(func.avg(CoachRating.rating)).filter(CoachRating.coach_id == coach.id).scalar() or 0
-    rating_count = CoachRating.query.filter_by(coach_id=coach.id).count()
+    avg_rating, rating_count = CoachRatingSummary.get_for_coach(coach.id)
     
     # Get coach images
     showcase_images = CoachImage.query.filter_by(coach_id=coach.id).all()
@@ -559,109 +549,7 @@ def help():
 
 # Helper function to get coach earnings
 def get_coach_earnings(coach_id):
-    # Total earnings
-    total_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach_id,
-        Booking.status == 'completed'
-    ).scalar() or 0
-    
-    # Current month earnings
-    now = datetime.utcnow()
-    this_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach_id,
-        Booking.status == 'completed',
-        extract('year', Booking.date) == now.year,
-        extract('month', Booking.date) == now.month
-    ).scalar() or 0
-    
-    # Last month earnings
-    last_month = now.replace(day=1) - timedelta(days=1)
-    last_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach_id,
-        Booking.status == 'completed',
-        extract('year', Booking.date) == last_month.year,
-        extract('month', Booking.date) == last_month.month
-    ).scalar() or 0
-    
-    # Monthly earnings for chart
-    monthly_data = {}
-    months_to_fetch = 12
-    
-    for i in range(months_to_fetch-1, -1, -1):
-        month_date = now.replace(day=1) - timedelta(days=i*30)
-        month_key = month_date.strftime('%Y-%m')
-        month_name = month_date.strftime('%B %Y')
-        
-        month_earnings = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id == coach_id,
-            Booking.status == 'completed',
-            extract('year', Booking.date) == month_date.year,
-            extract('month', Booking.date) == month_date.month
-        ).scalar() or 0
-        
-        monthly_data[month_name] = float(month_earnings)
-    
-    # Earnings by court
-    court_earnings = {}
-    courts = Court.query.join(CoachCourt).filter(CoachCourt.coach_id == coach_id).all()
-    for court in courts:
-        court_total = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id == coach_id,
-            Booking.court_id == court.id,
-            Booking.status == 'completed'
-        ).scalar() or 0
-        
-        if court_total > 0:
-            court_earnings[court.name] = float(court_total)
-    
-    # Earnings breakdown by discount type
-    earnings_breakdown = {}
-    # Regular sessions (no discount)
-    regular_count = Booking.query.filter(
-        Booking.coach_id == coach_id,
-        Booking.status == 'completed',
-        Booking.pricing_plan_id.is_(None)
-    ).count()
-    
-    regular_amount = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id == coach_id,
-        Booking.status == 'completed',
-        Booking.pricing_plan_id.is_(None)
-    ).scalar() or 0
-    
-    earnings_breakdown['regular'] = {
-        'sessions': regular_count,
-        'amount': float(regular_amount)
-    }
-    
-    # Discounted sessions by type
-    for discount_type in ['first_time', 'package', 'seasonal', 'custom']:
-        discount_count = Booking.query.join(PricingPlan).filter(
-            Booking.coach_id == coach_id,
-            Booking.status == 'completed',
-            PricingPlan.discount_type == discount_type
-        ).count()
-        
-        discount_amount = db.session.query(func.sum(Booking.price)).join(PricingPlan).filter(
-            Booking.coach_id == coach_id,
-            Booking.status == 'completed',
-            PricingPlan.discount_type == discount_type
-        ).scalar() or 0
-        
-        if discount_count > 0:
-            earnings_breakdown[discount_type] = {
-                'sessions': discount_count,
-                'amount': float(discount_amount)
-            }
-    
-    return {
-        'total': float(total_earnings),
-        'this_month': float(this_month_earnings),
-        'last_month': float(last_month_earnings),
-        'monthly': monthly_data,
-        'by_court': court_earnings,
-        'breakdown': earnings_breakdown
-    }
+    return EarningsReport([coach_id]).summary()
 
 # Helper function to get academy earnings
 def get_academy_earnings(academy_ids):
@@ -684,127 +572,7 @@ def get_academy_earnings(academy_ids):
             'by_coach': {}
         }
     
-    # Total earnings
-    total_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed'
-    ).scalar() or 0
-    
-    # Current month earnings
-    now = datetime.utcnow()
-    this_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed',
-        extract('year', Booking.date) == now.year,
-        extract('month', Booking.date) == now.month
-    ).scalar() or 0
-    
-    # Last month earnings
-    last_month = now.replace(day=1) - timedelta(days=1)
-    last_month_earnings = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed',
-        extract('year', Booking.date) == last_month.year,
-        extract('month', Booking.date) == last_month.month
-    ).scalar() or 0
-    
-    # Monthly earnings for chart
-    monthly_data = {}
-    months_to_fetch = 12
-    
-    for i in range(months_to_fetch-1, -1, -1):
-        month_date = now.replace(day=1) - timedelta(days=i*30)
-        month_key = month_date.strftime('%Y-%m')
-        month_name = month_date.strftime('%B %Y')
-        
-        month_earnings = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.status == 'completed',
-            extract('year', Booking.date) == month_date.year,
-            extract('month', Booking.date) == month_date.month
-        ).scalar() or 0
-        
-        monthly_data[month_name] = float(month_earnings)
-    
-    # Earnings by court
-    court_earnings = {}
-    # Get all courts used by these coaches
-    courts = Court.query.join(
-        Booking, Booking.court_id == Court.id
-    ).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed'
-    ).distinct().all()
-    
-    for court in courts:
-        court_total = db.session.query(func.sum(Booking.price)).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.court_id == court.id,
-            Booking.status == 'completed'
-        ).scalar() or 0
-        
-        if court_total > 0:
-            court_earnings[court.name] = float(court_total)
-    
-    # Earnings breakdown by discount type
-    earnings_breakdown = {}
-    # Regular sessions (no discount)
-    regular_count = Booking.query.filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed',
-        Booking.pricing_plan_id.is_(None)
-    ).count()
-    
-    regular_amount = db.session.query(func.sum(Booking.price)).filter(
-        Booking.coach_id.in_(coach_ids),
-        Booking.status == 'completed',
-        Booking.pricing_plan_id.is_(None)
-    ).scalar() or 0
-    
-    earnings_breakdown['regular'] = {
-        'sessions': regular_count,
-        'amount': float(regular_amount)
-    }
-    
-    # Discounted sessions by type
-    for discount_type in ['first_time', 'package', 'seasonal', 'custom']:
-        discount_count = Booking.query.join(PricingPlan).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.status == 'completed',
-            PricingPlan.discount_type == discount_type
-        ).count()
-        
-        discount_amount = db.session.query(func.sum(Booking.price)).join(PricingPlan).filter(
-            Booking.coach_id.in_(coach_ids),
-            Booking.status == 'completed',
-            PricingPlan.discount_type == discount_type
-        ).scalar() or 0
-        
-        if discount_count > 0:
-            earnings_breakdown[discount_type] = {
-                'sessions': discount_count,
-                'amount': float(discount_amount)
-            }
-    
-    # Earnings by coach
-    by_coach = {}
-    for coach_id in coach_ids:
-        coach = Coach.query.get(coach_id)
-        if coach and coach.user:
-            coach_earnings = db.session.query(func.sum(Booking.price)).filter(
-                Booking.coach_id == coach_id,
-                Booking.status == 'completed'
-            ).scalar() or 0
-            
-            if coach_earnings > 0:
-                by_coach[f"{coach.user.first_name} {coach.user.last_name}"] = float(coach_earnings)
-    
-    return {
-        'total': float(total_earnings),
-        'this_month': float(this_month_earnings),
-        'last_month': float(last_month_earnings),
-        'monthly': monthly_data,
-        'by_court': court_earnings,
-        'breakdown': earnings_breakdown,
-        'by_coach': by_coach
-    }
\ No newline at end of file
+    report = EarningsReport(coach_ids)
+    earnings = report.summary()
+    earnings['by_coach'] = report.by_coach()
+    return earnings
\ No newline at end of file
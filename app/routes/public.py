@@ -1,5 +1,5 @@
 # app/routes/coaches.py
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, make_response
 from flask_login import current_user, login_required
 from app import db
 from app.models.coach import Coach, CoachImage
@@ -7,7 +7,7 @@ from app.models.user import User
 from app.models.court import Court, CoachCourt
 from app.models.booking import Availability, Booking
 from app.models.session_log import SessionLog
-from app.models.rating import CoachRating
+from app.models.rating import CoachRatingSummary
 from app.models.tag import Tag, CoachTag
 from app.models.pricing import PricingPlan
 from app.models.package import BookingPackage
@@ -15,6 +15,14 @@ from app.models.academy import Academy, AcademyCoach, AcademyManager, AcademyCoa
 from app.models.academy_pricing import AcademyPricingPlan
 from datetime import datetime, timedelta
 from sqlalchemy import func, or_, extract
+from sqlalchemy.orm import joinedload
+from app.utils.directory import (load_directory_relations, load_academy_affiliations, encode_cursor, decode_cursor, keyset_filter,
+                                 estimate_total, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PRICE_BUCKETS, DUPR_BUCKETS,
+                                 RATING_THRESHOLDS, count_range_buckets, count_threshold_buckets, count_grouped)
+from app.utils.search import coach_search_matches
+from app.utils.geo import find_coaches_near, DEFAULT_RADIUS_KM, MAX_RADIUS_KM
+from app.utils.profile_cache import profile_cache, get_profile_version, profile_etag
+from app.utils.images import load_image_variants
 from functools import wraps
 
 bp = Blueprint('public', __name__)
@@ -30,32 +38,123 @@ def register():
         return redirect(url_for('coaches.dashboard'))
     return render_template('public/register_coach.html')
 
+def _coach_filters_from_request():
+    """Parse the directory filter parameters shared by get_coaches and get_coach_facets"""
+    filters = {
+        'query': request.args.get('query', ''),
+        'min_price': request.args.get('min_price', type=float),
+        'max_price': request.args.get('max_price', type=float),
+        'min_dupr': request.args.get('min_dupr', type=float),
+        'max_dupr': request.args.get('max_dupr', type=float),
+        'min_rating': request.args.get('min_rating', type=float),
+        'court_id': request.args.get('court_id', type=int),
+        'tag_id': request.args.get('tag_id', type=int),
+        'academy_id': request.args.get('academy_id', -1, type=int),
+        'lat': request.args.get('lat', type=float),
+        'lon': request.args.get('lon', type=float),
+        'radius_km': request.args.get('radius_km', DEFAULT_RADIUS_KM, type=float),
+        'search_matches': None,
+        'nearby_coach_ids': None
+    }
+    
+    # Build the full-text match subquery once; None means no index and a LIKE fallback
+    if filters['query']:
+        filters['search_matches'] = coach_search_matches(filters['query'])
+    
+    # Resolve "near me" to the coaches with open availability at nearby courts
+    if filters['lat'] is not None and filters['lon'] is not None:
+        filters['nearby_coach_ids'] = list(find_coaches_near(
+            filters['lat'], filters['lon'], min(filters['radius_km'], MAX_RADIUS_KM)
+        ))
+    
+    return filters
+
+def _apply_coach_filters(query, filters, exclude=()):
+    """Apply directory filters to a query joining Coach, User and CoachRatingSummary.
+
+    Filters named in exclude are skipped, which is how facet counts ignore their own dimension.
+    """
+    if filters['academy_id'] != -1 and 'academy' not in exclude:
+        query = query.filter(Coach.id.in_(
+            db.session.query(AcademyCoach.coach_id).filter(
+                AcademyCoach.academy_id == filters['academy_id'],
+                AcademyCoach.is_active == True
+            )
+        ))
+    
+    if filters['query'] and 'query' not in exclude:
+        matches = filters['search_matches']
+        if matches is None:
+            # No full-text index available on this database
+            search_term = f"%{filters['query']}%"
+            query = query.filter(
+                or_(
+                    User.first_name.ilike(search_term),
+                    User.last_name.ilike(search_term)
+                )
+            )
+        else:
+            query = query.join(matches, matches.c.coach_id == Coach.id)
+    
+    if 'price' not in exclude:
+        if filters['min_price'] is not None:
+            query = query.filter(Coach.hourly_rate >= filters['min_price'])
+        
+        if filters['max_price'] is not None:
+            query = query.filter(Coach.hourly_rate <= filters['max_price'])
+    
+    if 'dupr' not in exclude:
+        if filters['min_dupr'] is not None:
+            query = query.filter(User.dupr_rating >= filters['min_dupr'])
+        
+        if filters['max_dupr'] is not None:
+            query = query.filter(User.dupr_rating <= filters['max_dupr'])
+    
+    if 'rating' not in exclude and filters['min_rating'] is not None and filters['min_rating'] > 0:
+        query = query.filter(CoachRatingSummary.avg_rating >= filters['min_rating'])
+    
+    if filters['court_id'] and 'court' not in exclude:
+        query = query.filter(Coach.id.in_(
+            db.session.query(CoachCourt.coach_id).filter(CoachCourt.court_id == filters['court_id'])
+        ))
+    
+    if filters['tag_id'] and 'tag' not in exclude:
+        query = query.filter(Coach.id.in_(
+            db.session.query(CoachTag.coach_id).filter(CoachTag.tag_id == filters['tag_id'])
+        ))
+    
+    if filters['nearby_coach_ids'] is not None and 'near' not in exclude:
+        query = query.filter(Coach.id.in_(filters['nearby_coach_ids']))
+    
+    return query
+
 @bp.route('/api/coaches')
 def get_coaches():
     """API endpoint to get filtered coaches data"""
     # Get query parameters
-    search_query = request.args.get('query', '')
-    min_price = request.args.get('min_price', type=float)
-    max_price = request.args.get('max_price', type=float)
-    min_dupr = request.args.get('min_dupr', type=float)
-    max_dupr = request.args.get('max_dupr', type=float)
-    min_rating = request.args.get('min_rating', type=float)
-    court_id = request.args.get('court_id', type=int)
-    sort_by = request.args.get('sort_by', 'name')  # Default sort by name
+    filters = _coach_filters_from_request()
+    search_query = filters['query']
+    sort_by = request.args.get('sort_by', 'relevance' if search_query else 'name')  # Default sort by name
     sort_direction = request.args.get('sort_direction', 'asc')
 
-    academy_id = request.args.get('academy_id', -1, type=int)
+    # Optional keyset pagination - without limit/cursor the full list is returned
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
+    include_total = request.args.get('include_total', 'false').lower() in ['true', '1', 'yes']
+    paginate = limit is not None or bool(cursor)
+
+    academy_id = filters['academy_id']
 
     # Base query - join Coach with User to access user details
     query = db.session.query(
         Coach, 
         User, 
-        func.avg(CoachRating.rating).label('avg_rating'),
-        func.count(CoachRating.id).label('rating_count')
+        CoachRatingSummary.avg_rating,
+        CoachRatingSummary.rating_count
     ).join(
         User, Coach.user_id == User.id
     ).outerjoin(
-        CoachRating, Coach.id == CoachRating.coach_id
+        CoachRatingSummary, Coach.id == CoachRatingSummary.coach_id
     )
     
     academy = None
@@ -67,47 +166,23 @@ def get_coaches():
         academy = Academy.query.get_or_404(academy_id)
         
         # Get academy coaches
-        academy_coaches = AcademyCoach.query.filter_by(
+        academy_coaches = AcademyCoach.query.options(
+            joinedload(AcademyCoach.coach).joinedload(Coach.user),
+            joinedload(AcademyCoach.role)
+        ).filter_by(
             academy_id=academy_id,
             is_active=True
         ).all()
 
         coach_ids = [ac.coach_id for ac in academy_coaches]
-        
-        query = query.filter(
-            Coach.id.in_(coach_ids)
-        )
 
     # Apply filters
-    if search_query:
-        search_term = f"%{search_query}%"
-        query = query.filter(
-            or_(
-                User.first_name.ilike(search_term),
-                User.last_name.ilike(search_term)
-            )
-        )
+    query = _apply_coach_filters(query, filters)
     
-    if min_price is not None:
-        query = query.filter(Coach.hourly_rate >= min_price)
-    
-    if max_price is not None:
-        query = query.filter(Coach.hourly_rate <= max_price)
-    
-    if min_dupr is not None:
-        query = query.filter(User.dupr_rating >= min_dupr)
-    
-    if max_dupr is not None:
-        query = query.filter(User.dupr_rating <= max_dupr)
-    
-    if min_rating is not None and min_rating > 0:
-        query = query.having(func.avg(CoachRating.rating) >= min_rating)
-    
-    if court_id:
-        query = query.join(CoachCourt, Coach.id == CoachCourt.coach_id).filter(CoachCourt.court_id == court_id)
-    
-    # Group by coach and user to support aggregations
-    query = query.group_by(Coach.id, User.id)
+    total = None
+    if include_total:
+        total_count, total_is_estimate = estimate_total(query)
+        total = {'count': total_count, 'is_estimate': total_is_estimate}
     
     # Apply sorting
     if sort_by == 'price':
@@ -115,17 +190,49 @@ def get_coaches():
     elif sort_by == 'dupr':
         order_col = User.dupr_rating
     elif sort_by == 'rating':
-        order_col = func.avg(CoachRating.rating)
+        order_col = CoachRatingSummary.avg_rating
+    elif sort_by == 'relevance' and filters['search_matches'] is not None:
+        order_col = filters['search_matches'].c.search_rank
     else:  # Default to name
+        sort_by = 'name'
         order_col = User.first_name
     
-    if sort_direction == 'desc':
-        query = query.order_by(order_col.desc())
-    else:
-        query = query.order_by(order_col.asc())
+    if sort_direction != 'desc':
+        sort_direction = 'asc'
     
-    # Execute query
-    coaches_data = query.all()
+    next_cursor = None
+    if paginate:
+        limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+        
+        # Keyset order needs a non-null sort key with the coach id as tie-breaker
+        sort_key = func.coalesce(order_col, -1) if sort_by in ('dupr', 'rating') else order_col
+        
+        if cursor:
+            try:
+                position = decode_cursor(cursor, sort_by, sort_direction)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            query = query.filter(keyset_filter(sort_key, Coach.id, position, sort_direction))
+        
+        if sort_direction == 'desc':
+            query = query.order_by(sort_key.desc(), Coach.id.desc())
+        else:
+            query = query.order_by(sort_key.asc(), Coach.id.asc())
+        
+        page_rows = query.add_columns(sort_key).limit(limit + 1).all()
+        if len(page_rows) > limit:
+            page_rows = page_rows[:limit]
+            last_row = page_rows[-1]
+            next_cursor = encode_cursor(sort_by, sort_direction, last_row[-1], last_row[0].id)
+        coaches_data = [row[:4] for row in page_rows]
+    else:
+        if sort_direction == 'desc':
+            query = query.order_by(order_col.desc())
+        else:
+            query = query.order_by(order_col.asc())
+        
+        # Execute query
+        coaches_data = query.all()
     
 
 
@@ -159,7 +266,7 @@ def get_coaches():
         role_ordering = {}
         
         for ac in academy_coaches:
-            coach = Coach.query.get(ac.coach_id)
+            coach = ac.coach
             if coach and coach.user:
                 coach_info = {
                     'id': coach.id,
@@ -233,49 +340,17 @@ def get_coaches():
     # Format response data
     result = []
 
-    for coach, user, avg_rating, rating_count in coaches_data:
-        # Get coach's courts
-        courts = Court.query.join(CoachCourt).filter(CoachCourt.coach_id == coach.id).all()
-        court_names = [court.name for court in courts]
-        
-        # Get coach's tags
-        tags = []
-        coach_tags = CoachTag.query.filter_by(coach_id=coach.id).all()
-        for ct in coach_tags:
-            tag = Tag.query.get(ct.tag_id)
-            if tag:
-                tags.append({
-                    'id': tag.id,
-                    'name': tag.name
-                })
+    # Load courts, tags and academy affiliations for the whole page at once
+    courts_by_coach, tags_by_coach, affiliations_by_coach = load_directory_relations(
+        [coach.id for coach, _, _, _ in coaches_data],
+        academy_id
+    )
+    picture_variants = load_image_variants(user.profile_picture for _, user, _, _ in coaches_data)
 
-        # Get coach's academies
-        academy_affiliations = []
-        academy_coaches = AcademyCoach.query.filter_by(
-            coach_id=coach.id,
-            is_active=True
-        ).all()
-        
-        for ac in academy_coaches:
-            academy = Academy.query.get(ac.academy_id)
-            if academy:
-                role_name = "Coach"
-                if ac.role:
-                    role_name = ac.role.name
-                if academy_id == -1:
-                    academy_affiliations.append({
-                        'id': academy.id,
-                        'name': academy.name,
-                        'private_url_code': academy.private_url_code,
-                        'role': role_name
-                    })
-                elif academy_id == academy.id:
-                    academy_affiliations.append({
-                        'id': academy.id,
-                        'name': academy.name,
-                        'private_url_code': academy.private_url_code,
-                        'role': role_name
-                    })
+    for coach, user, avg_rating, rating_count in coaches_data:
+        court_names = courts_by_coach.get(coach.id, [])
+        tags = tags_by_coach.get(coach.id, [])
+        academy_affiliations = affiliations_by_coach.get(coach.id, [])
 
         coach_data = {
             'id': coach.id,
@@ -285,30 +360,181 @@ def get_coaches():
             'hourly_rate': coach.hourly_rate,
             'sessions_completed': coach.sessions_completed,
             'avg_rating': round(avg_rating, 1) if avg_rating else 0,
-            'rating_count': rating_count,
+            'rating_count': rating_count or 0,
             'courts': court_names,
             'biography': coach.biography,
             'profile_picture': user.profile_picture,
+            'profile_picture_variants': picture_variants.get(user.profile_picture, {}),
             'tags': tags,
             'academy_affiliations': academy_affiliations
         }
         result.append(coach_data)
     
-    return jsonify({
+    response = {
         'coaches': result,
         'academy': academy_data
+    }
+    
+    if paginate:
+        response['next_cursor'] = next_cursor
+    if total is not None:
+        response['total'] = total
+    
+    return jsonify(response)
+
+
+@bp.route('/api/coaches/facets')
+def get_coach_facets():
+    """API endpoint to get result counts per filter bucket for the coach directory.
+
+    Accepts the same filters as get_coaches. Each facet ignores its own filter so the
+    UI can show how many coaches every alternative value would return.
+    """
+    filters = _coach_filters_from_request()
+    
+    def base_query(exclude=()):
+        query = db.session.query(Coach.id).join(
+            User, Coach.user_id == User.id
+        ).outerjoin(
+            CoachRatingSummary, Coach.id == CoachRatingSummary.coach_id
+        )
+        return _apply_coach_filters(query, filters, exclude)
+    
+    total = base_query().with_entities(func.count(Coach.id)).scalar() or 0
+    
+    price = count_range_buckets(base_query(exclude=('price',)), Coach.hourly_rate, PRICE_BUCKETS)
+    dupr = count_range_buckets(base_query(exclude=('dupr',)), User.dupr_rating, DUPR_BUCKETS)
+    rating = count_threshold_buckets(base_query(exclude=('rating',)), CoachRatingSummary.avg_rating, RATING_THRESHOLDS)
+    
+    courts = count_grouped(
+        base_query(exclude=('court',)).join(
+            CoachCourt, CoachCourt.coach_id == Coach.id
+        ).join(
+            Court, Court.id == CoachCourt.court_id
+        ),
+        Court.id, Court.name
+    )
+    
+    tags = count_grouped(
+        base_query(exclude=('tag',)).join(
+            CoachTag, CoachTag.coach_id == Coach.id
+        ).join(
+            Tag, Tag.id == CoachTag.tag_id
+        ),
+        Tag.id, Tag.name
+    )
+    
+    academies = count_grouped(
+        base_query(exclude=('academy',)).join(
+            AcademyCoach, db.and_(AcademyCoach.coach_id == Coach.id, AcademyCoach.is_active == True)
+        ).join(
+            Academy, Academy.id == AcademyCoach.academy_id
+        ),
+        Academy.id, Academy.name
+    )
+    
+    return jsonify({
+        'total': total,
+        'price': price,
+        'dupr': dupr,
+        'rating': rating,
+        'courts': courts,
+        'tags': tags,
+        'academies': academies
     })
 
+@bp.route('/api/coaches/near')
+def get_coaches_near():
+    """API endpoint to find coaches with open availability near a point"""
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lon', type=float)
+    radius_km = request.args.get('radius_km', DEFAULT_RADIUS_KM, type=float)
+    available_only = request.args.get('available_only', 'true').lower() in ['true', '1', 'yes']
+    
+    if latitude is None or longitude is None:
+        return jsonify({'error': 'lat and lon are required'}), 400
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return jsonify({'error': 'Invalid coordinates'}), 400
+    if radius_km <= 0 or radius_km > MAX_RADIUS_KM:
+        return jsonify({'error': f'radius_km must be between 0 and {MAX_RADIUS_KM}'}), 400
+    
+    try:
+        date_from = datetime.strptime(request.args['date_from'], '%Y-%m-%d').date() if request.args.get('date_from') else None
+        date_to = datetime.strptime(request.args['date_to'], '%Y-%m-%d').date() if request.args.get('date_to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    
+    nearby = find_coaches_near(latitude, longitude, radius_km, available_only=available_only,
+                               date_from=date_from, date_to=date_to)
+    if not nearby:
+        return jsonify({'coaches': []})
+    
+    rows = db.session.query(Coach, User).join(
+        User, Coach.user_id == User.id
+    ).filter(
+        Coach.id.in_(nearby.keys())
+    ).all()
+    
+    court_ids = {court_id for entry in nearby.values() for court_id in entry['court_ids']}
+    courts = {court.id: court for court in Court.query.filter(Court.id.in_(court_ids)).all()}
+    picture_variants = load_image_variants(user.profile_picture for _, user in rows)
+    
+    result = []
+    for coach, user in rows:
+        entry = nearby[coach.id]
+        result.append({
+            'id': coach.id,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'hourly_rate': coach.hourly_rate,
+            'dupr_rating': user.dupr_rating,
+            'profile_picture': user.profile_picture,
+            'profile_picture_variants': picture_variants.get(user.profile_picture, {}),
+            'distance_km': round(entry['distance_km'], 2),
+            'courts': [{
+                'id': court_id,
+                'name': courts[court_id].name,
+                'city': courts[court_id].city
+            } for court_id in entry['court_ids'] if court_id in courts]
+        })
+    
+    result.sort(key=lambda c: (c['distance_km'], c['id']))
+    
+    return jsonify({'coaches': result})
 
 @bp.route('/api/coach/<int:coach_id>')
 def get_coach_profile(coach_id):
-    """API endpoint to get a specific coach's profile data"""
+    """API endpoint to get a specific coach's profile data.
+
+    Responses carry a strong ETag from the coach's profile version and a digest of
+    the payload. With the payload cached, a revalidation costs a single version
+    lookup and unchanged profiles return 304.
+    """
+    version = get_profile_version(coach_id)
+    cached = profile_cache.get(coach_id, version)
+    if cached is None:
+        cached = profile_cache.set(coach_id, version, _build_coach_profile(coach_id))
+    coach_data, digest = cached
+    etag = profile_etag(coach_id, version, digest)
+    
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'public, no-cache'
+        return response
+    
+    response = jsonify(coach_data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+def _build_coach_profile(coach_id):
+    """Assemble the public profile payload for a coach (404 if missing)"""
     coach = Coach.query.get_or_404(coach_id)
     user = User.query.get_or_404(coach.user_id)
     
     # Get coach rating
-    avg_rating = db.session.query(func.avg(CoachRating.rating)).filter(CoachRating.coach_id == coach_id).scalar() or 0
-    rating_count = CoachRating.query.filter_by(coach_id=coach_id).count()
+    avg_rating, rating_count = CoachRatingSummary.get_for_coach(coach_id)
     
     # Get coach courts
     coach_courts = CoachCourt.query.filter_by(coach_id=coach_id).all()
@@ -332,24 +558,7 @@ def get_coach_profile(coach_id):
         showcase_images.append(url_for('static', filename=image.image_path))
         
     # Get coach's academies
-    academy_affiliations = []
-    academy_coaches = AcademyCoach.query.filter_by(
-        coach_id=coach.id,
-        is_active=True
-    ).all()
-    
-    for ac in academy_coaches:
-        academy = Academy.query.get(ac.academy_id)
-        if academy:
-            role_name = "Coach"
-            if ac.role:
-                role_name = ac.role.name
-            academy_affiliations.append({
-                'id': academy.id,
-                'name': academy.name,
-                'private_url_code': academy.private_url_code,
-                'role': role_name
-            })
+    academy_affiliations = load_academy_affiliations([coach.id]).get(coach.id, [])
 
     # Format response data
     coach_data = {
@@ -371,7 +580,7 @@ def get_coach_profile(coach_id):
         'payment_info': coach.payment_info
     }
     
-    return jsonify(coach_data)
+    return coach_data
 
 @bp.route('/api/availability/<int:coach_id>/<int:court_id>/<string:date>')
 def get_coach_availability(coach_id, court_id, date):
@@ -420,8 +629,7 @@ def profile(coach_id):
     coach = Coach.query.get_or_404(coach_id)
     
     # Get coach rating
-    avg_rating = db.session.query(func.avg(CoachRating.rating)).filter(CoachRating.coach_id == coach_id).scalar() or 0
-    rating_count = CoachRating.query.filter_by(coach_id=coach_id).count()
+    avg_rating, rating_count = CoachRatingSummary.get_for_coach(coach_id)
     
     # Get coach courts
     courts = Court.query.join(CoachCourt).filter(CoachCourt.coach_id == coach_id).all()
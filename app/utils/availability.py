@@ -0,0 +1,174 @@
+# app/utils/availability.py
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.booking import Availability
+
+def _minutes(t):
+    return t.hour * 60 + t.minute
+
+def load_existing_slots(coach_id, start_date, end_date):
+    """Load a coach's availability in a date range with one query.
+
+    Returns (intervals, taken): intervals maps (court_id, date) to a list of
+    (start_minutes, end_minutes) sorted by start, and taken is the set of
+    (date, start_time) keys already used by unique_coach_timeslot (on any court).
+    """
+    rows = db.session.query(
+        Availability.court_id,
+        Availability.date,
+        Availability.start_time,
+        Availability.end_time
+    ).filter(
+        Availability.coach_id == coach_id,
+        Availability.date >= start_date,
+        Availability.date <= end_date
+    ).all()
+
+    intervals = defaultdict(list)
+    taken = set()
+    for court_id, slot_date, start_time, end_time in rows:
+        intervals[(court_id, slot_date)].append((_minutes(start_time), _minutes(end_time)))
+        taken.add((slot_date, start_time))
+
+    for court_intervals in intervals.values():
+        court_intervals.sort()
+
+    return intervals, taken
+
+def sweep_overlaps(existing, candidates):
+    """Split candidate slots for one court and day into (accepted, overlapping).
+
+    existing is a start-sorted list of (start_minutes, end_minutes); candidates is a
+    list of (start_time, end_time). Candidates are swept in order of end time, keeping
+    the furthest end seen among intervals starting before the candidate ends, so a
+    candidate overlaps exactly when that end is after its start. Accepted candidates
+    block later ones, as if they had been inserted one at a time. Both returned lists
+    keep the candidates' original order.
+    """
+    order = sorted(
+        range(len(candidates)),
+        key=lambda i: (_minutes(candidates[i][1]), _minutes(candidates[i][0]))
+    )
+    rejected = set()
+    index = 0
+    max_end = -1
+    for i in order:
+        start, end = _minutes(candidates[i][0]), _minutes(candidates[i][1])
+        while index < len(existing) and existing[index][0] < end:
+            max_end = max(max_end, existing[index][1])
+            index += 1
+        if max_end > start:
+            rejected.add(i)
+        else:
+            max_end = max(max_end, end)
+
+    accepted = [slot for i, slot in enumerate(candidates) if i not in rejected]
+    overlapping = [slot for i, slot in enumerate(candidates) if i in rejected]
+    return accepted, overlapping
+
+def bulk_insert_availability(rows):
+    """Insert availability rows (dicts of column values) in a single executemany"""
+    if rows:
+        db.session.execute(db.insert(Availability), rows)
+    return len(rows)
+
+def slot_key(row):
+    """The unique_coach_timeslot key of an availability row (coach implied)"""
+    return row['date'], row['start_time']
+
+def describe_slot(row):
+    return {
+        'court_id': row['court_id'],
+        'date': row['date'].isoformat(),
+        'start_time': row['start_time'].strftime('%H:%M'),
+        'end_time': row['end_time'].strftime('%H:%M')
+    }
+
+def parse_availability_slots(coach_id, slots):
+    """Validate and parse raw slot dicts into availability rows.
+
+    Returns (rows, errors); every slot either becomes a row or produces one error
+    message, so nothing is written until the whole batch has been checked.
+    """
+    rows = []
+    errors = []
+    for slot_data in slots:
+        try:
+            date_obj = datetime.strptime(slot_data['date'], '%Y-%m-%d').date()
+            start_time = datetime.strptime(slot_data['start_time'], '%H:%M').time()
+            end_time = datetime.strptime(slot_data['end_time'], '%H:%M').time()
+            if start_time >= end_time:
+                raise ValueError('End time must be after start time')
+
+            rows.append({
+                'coach_id': coach_id,
+                'court_id': int(slot_data['court_id']),
+                'date': date_obj,
+                'start_time': start_time,
+                'end_time': end_time,
+                'is_booked': False,
+                'student_books_court': bool(slot_data.get('student_books_court', True))
+            })
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            if isinstance(slot_data, dict):
+                label = f"{slot_data.get('date')} {slot_data.get('start_time')}-{slot_data.get('end_time')}"
+            else:
+                label = repr(slot_data)
+            errors.append(f"Error creating slot {label}: {str(e)}")
+    return rows, errors
+
+def find_slot_conflicts(coach_id, rows):
+    """Return the rows that would violate unique_coach_timeslot, in one query.
+
+    A row conflicts if the coach already has availability starting at the same date
+    and time (on any court), or if an earlier row in the batch has the same key.
+    """
+    if not rows:
+        return []
+
+    dates = [row['date'] for row in rows]
+    _, taken = load_existing_slots(coach_id, min(dates), max(dates))
+
+    conflicts = []
+    for row in rows:
+        key = slot_key(row)
+        if key in taken:
+            conflicts.append(row)
+        else:
+            taken.add(key)
+    return conflicts
+
+def insert_availability_ignoring_conflicts(rows):
+    """Insert rows in one multi-row statement, skipping unique_coach_timeslot clashes.
+
+    Returns the set of (date, start_time) keys actually inserted. Only SQLite and
+    PostgreSQL support conflict-ignore here; other backends fall back to skipping
+    conflicts found by a prior check, which leaves a small race window.
+    """
+    if not rows:
+        return set()
+
+    table = Availability.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        stmt = sqlite.insert(table).on_conflict_do_nothing(
+            index_elements=['coach_id', 'date', 'start_time']
+        )
+    elif dialect == 'postgresql':
+        stmt = postgresql.insert(table).on_conflict_do_nothing(
+            index_elements=['coach_id', 'date', 'start_time']
+        )
+    else:
+        conflicting = {id(row) for row in find_slot_conflicts(rows[0]['coach_id'], rows)}
+        rows = [row for row in rows if id(row) not in conflicting]
+        bulk_insert_availability(rows)
+        return {slot_key(row) for row in rows}
+
+    created_at = datetime.utcnow()
+    result = db.session.execute(
+        stmt.returning(table.c.date, table.c.start_time),
+        [dict(row, created_at=created_at) for row in rows]
+    )
+    return {(slot_date, start_time) for slot_date, start_time in result}
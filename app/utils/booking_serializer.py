@@ -0,0 +1,145 @@
+# app/utils/booking_serializer.py
+from sqlalchemy.orm import joinedload, selectinload
+from app.models.coach import Coach
+from app.models.booking import Booking
+
+def _student(booking):
+    return {'student': {
+        'id': booking.student_id,
+        'first_name': booking.student.first_name,
+        'last_name': booking.student.last_name,
+        'email': booking.student.email
+    }}
+
+def _coach(booking):
+    return {'coach': {
+        'id': booking.coach_id,
+        'user': {
+            'first_name': booking.coach.user.first_name,
+            'last_name': booking.coach.user.last_name
+        }
+    }}
+
+def _court(booking):
+    return {'court': {
+        'id': booking.court_id,
+        'name': booking.court.name
+    }}
+
+def _payment_proofs(booking):
+    proofs = {proof.proof_type: proof.image_path for proof in booking.payment_proofs}
+    return {
+        'payment_proof': proofs.get('coaching'),
+        'court_booking_proof': proofs.get('court')
+    }
+
+def _session_log(booking):
+    """The full log, including the coach's private notes, for coach-facing lists"""
+    log = booking.session_log
+    if not log:
+        return {}
+    return {'session_log': {
+        'id': log.id,
+        'title': log.title,
+        'notes': log.notes,
+        'coach_notes': log.coach_notes,
+        'created_at': log.created_at.isoformat()
+    }}
+
+def _session_log_summary(booking):
+    """The log without the coach's private notes, for student-facing lists"""
+    log = booking.session_log
+    if not log:
+        return {}
+    return {'session_log': {
+        'id': log.id,
+        'title': log.title,
+        'notes': log.notes
+    }}
+
+def _optional_float(name):
+    def field(booking):
+        value = getattr(booking, name)
+        return {name: float(value) if value else None}
+    return field
+
+# name: (loader option or None, function returning the keys it adds)
+BOOKING_FIELDS = {
+    'id': (None, lambda booking: {'id': booking.id}),
+    'coach_id': (None, lambda booking: {'coach_id': booking.coach_id}),
+    'court_id': (None, lambda booking: {'court_id': booking.court_id}),
+    'date': (None, lambda booking: {'date': booking.date.isoformat()}),
+    'start_time': (None, lambda booking: {'start_time': booking.start_time.strftime('%H:%M:%S')}),
+    'end_time': (None, lambda booking: {'end_time': booking.end_time.strftime('%H:%M:%S')}),
+    'price': (None, lambda booking: {'price': float(booking.price)}),
+    'base_price': (None, lambda booking: {'base_price': float(booking.base_price)}),
+    'status': (None, lambda booking: {'status': booking.status}),
+    'venue_confirmed': (None, lambda booking: {'venue_confirmed': booking.venue_confirmed}),
+    'court_booking_responsibility': (None, lambda booking: {'court_booking_responsibility': booking.court_booking_responsibility}),
+    'discount_amount': (None, _optional_float('discount_amount')),
+    'discount_percentage': (None, _optional_float('discount_percentage')),
+    'student': (lambda: joinedload(Booking.student), _student),
+    'coach': (lambda: joinedload(Booking.coach).joinedload(Coach.user), _coach),
+    'court': (lambda: joinedload(Booking.court), _court),
+    'payment_proofs': (lambda: selectinload(Booking.payment_proofs), _payment_proofs),
+    'session_log': (lambda: selectinload(Booking.session_log), _session_log),
+    'session_log_summary': (lambda: selectinload(Booking.session_log), _session_log_summary)
+}
+
+class BookingSerializer:
+    """Turns bookings into API dicts for a declared set of fields.
+
+    Each relationship field declares how it is loaded: many-to-one rows are
+    joined into the booking query, collections and the session log are fetched
+    with one extra SELECT ... IN each. Serializing a list of any length through
+    query() therefore costs the same number of queries.
+    """
+    def __init__(self, *fields):
+        unknown = set(fields) - set(BOOKING_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown booking fields: {', '.join(sorted(unknown))}")
+        self.fields = fields
+
+    def extend(self, *fields):
+        """A serializer with these fields added"""
+        return BookingSerializer(*self.fields, *(field for field in fields if field not in self.fields))
+
+    def loader_options(self):
+        options = []
+        for field in self.fields:
+            loader = BOOKING_FIELDS[field][0]
+            if loader:
+                options.append(loader())
+        return options
+
+    def query(self, query=None):
+        """query (Booking.query by default) with the loading strategy these fields need"""
+        return (query if query is not None else Booking.query).options(*self.loader_options())
+
+    def dump(self, booking):
+        data = {}
+        for field in self.fields:
+            data.update(BOOKING_FIELDS[field][1](booking))
+        return data
+
+    def dump_many(self, bookings):
+        return [self.dump(booking) for booking in bookings]
+
+BOOKING_SCHEDULE_FIELDS = (
+    'id', 'date', 'start_time', 'end_time', 'price', 'status', 'court',
+    'venue_confirmed', 'court_booking_responsibility'
+)
+
+# Bookings as a coach sees them, with the student, payment proofs and session log
+coach_booking_serializer = BookingSerializer(
+    *BOOKING_SCHEDULE_FIELDS, 'student', 'payment_proofs', 'session_log'
+)
+# The coach calendar also shows which coach each booking is with (for academy managers)
+calendar_booking_serializer = coach_booking_serializer.extend('coach')
+# The short list on the coach dashboard
+dashboard_booking_serializer = BookingSerializer(*BOOKING_SCHEDULE_FIELDS, 'student')
+# Bookings as a student sees them, without the coach's private notes
+student_booking_serializer = BookingSerializer(
+    'id', 'coach_id', 'coach', 'court_id', 'court', 'date', 'start_time', 'end_time',
+    'price', 'base_price', 'status', 'discount_amount', 'discount_percentage', 'session_log_summary'
+)
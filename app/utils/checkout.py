@@ -0,0 +1,300 @@
+# app/utils/checkout.py
+from datetime import datetime
+from sqlalchemy import and_
+from app import db
+from app.models.coach import Coach
+from app.models.booking import Availability, Booking, AvailabilityReservation, BookingCheckout
+from app.models.booking_rollup import apply_booking_changes, coach_academies
+from app.models.package import BookingPackage, booking_package_association
+from app.models.pricing import PricingPlan
+from app.models.payment import PaymentProof
+from app.models.notification import Notification
+from app.utils.court_fees import CourtFeeTable, get_court_fee_tables
+
+class CheckoutError(Exception):
+    """Stops the checkout pipeline with a JSON error payload and status code"""
+    def __init__(self, payload, status=400):
+        super().__init__(payload.get('error'))
+        self.payload = payload
+        self.status = status
+
+# Idempotency
+
+def find_checkout(student_id, idempotency_key):
+    return BookingCheckout.query.filter_by(
+        student_id=student_id,
+        idempotency_key=idempotency_key
+    ).first()
+
+def claim_checkout(student_id, idempotency_key):
+    """Insert the idempotency row for this checkout.
+
+    Raises IntegrityError if the key was already claimed; a concurrent duplicate
+    blocks on the unique constraint until the first checkout commits or rolls back.
+    """
+    checkout = BookingCheckout(student_id=student_id, idempotency_key=idempotency_key)
+    db.session.add(checkout)
+    db.session.flush()
+    return checkout
+
+# Validate and bulk-lock
+
+def lock_reserved_slots(user_id, reservation_token, availability_ids):
+    """Lock every slot and check this user's reservations in one query.
+
+    Returns {availability_id: Availability}. Raises CheckoutError if any slot is
+    missing a live reservation under reservation_token, or is already booked.
+    """
+    rows = db.session.query(
+        Availability,
+        AvailabilityReservation.id
+    ).outerjoin(
+        AvailabilityReservation,
+        and_(
+            AvailabilityReservation.availability_id == Availability.id,
+            AvailabilityReservation.student_id == user_id,
+            AvailabilityReservation.reservation_token == reservation_token,
+            AvailabilityReservation.expires_at > datetime.utcnow()
+        )
+    ).filter(
+        Availability.id.in_(availability_ids)
+    ).with_for_update(of=Availability).all()
+
+    availabilities = {avail.id: avail for avail, _ in rows}
+    reserved = {avail.id for avail, reservation_id in rows if reservation_id is not None}
+
+    # Verify all slots are reserved by this user with valid reservations
+    if any(avail_id not in reserved for avail_id in availability_ids):
+        raise CheckoutError({
+            'error': 'Your reservation for one or more slots has expired. Please try again.',
+            'code': 'RESERVATION_EXPIRED'
+        })
+
+    unavailable = [avail_id for avail_id in availability_ids if availabilities[avail_id].is_booked]
+    if unavailable:
+        raise CheckoutError({
+            'error': 'One or more selected slots are no longer available',
+            'code': 'SLOT_UNAVAILABLE',
+            'availability_ids': unavailable
+        }, 409)
+
+    return availabilities
+
+def load_checkout_context(bookings_data, availabilities):
+    """Load coaches, packages, pricing plans and court fee tables for a checkout,
+    one query per kind however many slots it covers.
+
+    Coaches and courts come from the locked slots, not from the client's payload.
+    """
+    def ids(key):
+        return {item.get(key) for item in bookings_data if item.get(key)}
+
+    coach_ids = {avail.coach_id for avail in availabilities.values()}
+    court_ids = {avail.court_id for avail in availabilities.values()}
+    package_ids = ids('package_id')
+    plan_ids = ids('pricing_plan_id')
+
+    return {
+        'coaches': {c.id: c for c in Coach.query.filter(Coach.id.in_(coach_ids)).all()} if coach_ids else {},
+        'packages': {p.id: p for p in BookingPackage.query.filter(BookingPackage.id.in_(package_ids)).all()} if package_ids else {},
+        'plans': {p.id: p for p in PricingPlan.query.filter(PricingPlan.id.in_(plan_ids)).all()} if plan_ids else {},
+        'fee_tables': get_court_fee_tables(court_ids) if court_ids else {},
+        'academies': coach_academies(db.session.connection(), coach_ids)
+    }
+
+def check_package(package, user_id, total_slots):
+    """Validate the package applied to a checkout before anything is priced"""
+    if package.student_id != user_id:
+        raise CheckoutError({'error': 'This package does not belong to you'})
+
+    if package.status != 'active':
+        raise CheckoutError({'error': 'This package is not active yet. Please wait for approval.'})
+
+    sessions_remaining = package.total_sessions - package.sessions_booked
+    if sessions_remaining < total_slots:
+        raise CheckoutError({'error': f'Not enough sessions remaining in package. You have {sessions_remaining} sessions left, but are trying to book {total_slots} sessions.'})
+
+# Price
+
+_NO_COURT_FEES = CourtFeeTable([])
+
+def price_bookings(bookings_data, availabilities, context, user_id, has_coach_proof, has_court_proof):
+    """Build (booking row, package) pairs for every requested slot without touching the database.
+
+    Returns (priced, package_sessions_used); booking rows are dicts of Booking columns.
+    """
+    priced = []
+    package_sessions_used = 0
+    usable_coaches = {}
+
+    for booking_item in bookings_data:
+        availability_ids = booking_item.get('availability_ids', [])
+        package_id = booking_item.get('package_id')
+
+        package = None
+        if package_id:
+            package = context['packages'].get(package_id)
+
+            # Verify package belongs to this user and has sessions remaining
+            if not package or package.student_id != user_id or package.sessions_booked >= package.total_sessions:
+                raise CheckoutError({'error': 'Invalid package or insufficient sessions remaining'})
+
+        pricing_plan_id = booking_item.get('pricing_plan_id')
+        pricing_plan = context['plans'].get(pricing_plan_id) if pricing_plan_id else None
+
+        for avail_id in availability_ids:
+            availability = availabilities[avail_id]
+            coach_id = availability.coach_id
+            court_id = availability.court_id
+
+            coach = context['coaches'].get(coach_id)
+            if not coach:
+                raise CheckoutError({'error': f'Coach with ID {coach_id} not found'}, 404)
+            hourly_rate = coach.hourly_rate
+
+            # Verify package can be used with this coach
+            if package:
+                key = (package.id, coach_id)
+                if key not in usable_coaches:
+                    usable_coaches[key] = package.can_use_for_coach(coach_id)
+                if not usable_coaches[key]:
+                    raise CheckoutError({'error': 'This package cannot be used with this coach'})
+
+            # Calculate total price (coach fee + court fee); courts without fee bands cost nothing
+            fee_table = context['fee_tables'].get(court_id) or _NO_COURT_FEES
+            court_fee = fee_table.fee_for_slot(availability.start_time, availability.end_time)
+            base_price = hourly_rate + court_fee
+
+            # Apply discount if any
+            discount_percentage = None
+            discount_amount = None
+            price = base_price
+
+            if pricing_plan and pricing_plan.is_active:
+                if pricing_plan.percentage_discount:
+                    discount_percentage = pricing_plan.percentage_discount
+                    price = base_price - base_price * (discount_percentage / 100)
+                elif pricing_plan.fixed_discount:
+                    # Distribute fixed discount proportionally across all booked sessions
+                    discount_amount = pricing_plan.fixed_discount / len(availability_ids)
+                    price = base_price - discount_amount
+
+            # If using package, only the court is paid for
+            if package and package_sessions_used < (package.total_sessions - package.sessions_booked):
+                price = court_fee
+                package_sessions_used += 1
+
+            # No coaching payment needed if using package
+            coaching_payment_required = not package
+            coaching_payment_status = 'not_required'
+            if coaching_payment_required:
+                coaching_payment_status = 'uploaded' if has_coach_proof else 'pending'
+
+            priced.append(({
+                'student_id': user_id,
+                'coach_id': coach_id,
+                'court_id': court_id,
+                'availability_id': availability.id,
+                'date': availability.date,
+                'start_time': availability.start_time,
+                'end_time': availability.end_time,
+                'base_price': base_price,
+                'price': price,
+                'court_fee': court_fee,
+                'coach_fee': hourly_rate,
+                'status': 'upcoming',
+                'pricing_plan_id': pricing_plan_id,
+                'discount_type': pricing_plan.discount_type if pricing_plan else 'regular',
+                'academy_id': context['academies'].get(coach_id),
+                'discount_percentage': discount_percentage,
+                'discount_amount': discount_amount,
+                'court_payment_required': True,  # Court fee is always required
+                'court_payment_status': 'uploaded' if has_court_proof else 'pending',
+                'coaching_payment_required': coaching_payment_required,
+                'coaching_payment_status': coaching_payment_status,
+                'court_booking_responsibility': 'student'
+            }, package))
+
+    return priced, package_sessions_used
+
+# Insert, attach proofs and notify
+
+def insert_bookings(priced, availabilities, coach_proof_path=None, court_proof_path=None):
+    """Write all bookings, then their payment proofs and package links, one
+    multi-row INSERT per table, and mark the slots booked with a single UPDATE.
+
+    Sets 'id' on each booking row.
+    """
+    now = datetime.utcnow()
+    result = db.session.execute(
+        db.insert(Booking).returning(Booking.id, Booking.availability_id),
+        [dict(booking, created_at=now) for booking, _ in priced]
+    )
+    booking_ids = {availability_id: booking_id for booking_id, availability_id in result}
+    for booking, _ in priced:
+        booking['id'] = booking_ids[booking['availability_id']]
+
+    # Core inserts skip the Booking mapper events that keep the daily rollup in sync
+    apply_booking_changes(db.session.connection(), [(booking, 1) for booking, _ in priced])
+
+    proofs = []
+    for booking, _ in priced:
+        if coach_proof_path and booking['coaching_payment_required']:
+            proofs.append({
+                'booking_id': booking['id'],
+                'image_path': coach_proof_path,
+                'proof_type': 'coaching',
+                'status': 'pending',
+                'created_at': now
+            })
+
+        # Covers both direct court booking proof and court fee payment to coach
+        if court_proof_path:
+            proofs.append({
+                'booking_id': booking['id'],
+                'image_path': court_proof_path,
+                'proof_type': 'court',
+                'status': 'pending',
+                'created_at': now
+            })
+    if proofs:
+        db.session.execute(db.insert(PaymentProof), proofs)
+
+    package_links = [
+        {'package_id': package.id, 'booking_id': booking['id']}
+        for booking, package in priced if package
+    ]
+    if package_links:
+        db.session.execute(booking_package_association.insert(), package_links)
+
+    db.session.query(Availability).filter(
+        Availability.id.in_(list(availabilities))
+    ).update({Availability.is_booked: True}, synchronize_session='evaluate')
+
+def notify_coaches(priced, coaches):
+    """Add one notification per coach for the bookings just created"""
+    latest = {}
+    for booking, _ in priced:
+        latest[booking['coach_id']] = booking
+
+    for coach_id, booking in latest.items():
+        db.session.add(Notification(
+            user_id=coaches[coach_id].user_id,
+            title="New booking with payment proof",
+            message=f"New booking on {booking['date'].strftime('%Y-%m-%d')} with payment proof uploaded",
+            notification_type="booking",
+            related_id=booking['id']
+        ))
+
+def serialize_checkout_booking(booking, availability):
+    return {
+        'id': booking['id'],
+        'date': availability.date.isoformat(),
+        'start_time': availability.start_time.strftime('%I:%M %p'),
+        'end_time': availability.end_time.strftime('%I:%M %p'),
+        'coach_fee': booking['coach_fee'],
+        'court_fee': booking['court_fee'],
+        'base_price': booking['base_price'],
+        'price': booking['price'],
+        'student_books_court': availability.student_books_court
+    }
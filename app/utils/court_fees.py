@@ -0,0 +1,114 @@
+# app/utils/court_fees.py
+import threading
+from bisect import bisect_right
+from collections import namedtuple
+from app import db
+from app.models.court import Court
+from app.models.court_fee import CourtFee
+
+FeeBand = namedtuple('FeeBand', ['start_time', 'end_time', 'fee'])
+
+def _minutes(t):
+    return t.hour * 60 + t.minute + t.second / 60
+
+class CourtFeeTable:
+    """Sorted, non-overlapping fee bands for one court, searchable by time of day.
+
+    Band fees are charged per slot. Bands are inclusive of their end minute, matching
+    the admin overlap check which never lets two bands touch, so 08:00-11:59 and
+    12:00-15:59 leave no gap. Times outside every band are free.
+    """
+    def __init__(self, bands):
+        self.bands = sorted(bands, key=lambda band: band.start_time)
+        self._starts = [_minutes(band.start_time) for band in self.bands]
+        self._ends = [_minutes(band.end_time) + 1 for band in self.bands]
+
+    def fee_at(self, slot_time):
+        """Fee in effect at slot_time, or 0.0 if no band covers it"""
+        minute = _minutes(slot_time)
+        index = bisect_right(self._starts, minute) - 1
+        if index >= 0 and minute < self._ends[index]:
+            return self.bands[index].fee
+        return 0.0
+
+    def fee_for_slot(self, start_time, end_time=None):
+        """Court fee for a slot.
+
+        A slot inside one band pays that band's fee whatever its length, like the
+        coach's hourly rate. A slot crossing band edges pays each band's fee in
+        proportion to the share of the slot inside it; uncovered time is free.
+        Without a usable end time the fee at the start of the slot is returned.
+        """
+        if end_time is None or end_time <= start_time:
+            return self.fee_at(start_time)
+
+        start, end = _minutes(start_time), _minutes(end_time)
+        length = end - start
+        index = max(bisect_right(self._starts, start) - 1, 0)
+        total = 0.0
+        while index < len(self.bands) and self._starts[index] < end:
+            overlap = min(end, self._ends[index]) - max(start, self._starts[index])
+            if overlap > 0:
+                total += self.bands[index].fee * overlap / length
+            index += 1
+        return round(total, 2)
+
+class CourtFeeCache:
+    """Thread-safe per-process cache of CourtFeeTable keyed by court id.
+
+    Each lookup reads the courts' fees_version, which CourtFee changes bump
+    (app/models/court_fee.py), so an edit made in any process is
+    picked up by every other process on its next lookup.
+    """
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, court_ids):
+        """Return {court_id: CourtFeeTable}: one version query, plus one to load stale tables"""
+        court_ids = set(court_ids)
+        versions = {court_id: 0 for court_id in court_ids}
+        versions.update(db.session.query(Court.id, Court.fees_version).filter(Court.id.in_(court_ids)))
+
+        tables = {}
+        with self._lock:
+            for court_id, version in versions.items():
+                entry = self._tables.get(court_id)
+                if entry is not None and entry[0] == version:
+                    tables[court_id] = entry[1]
+
+        missing = [court_id for court_id in court_ids if court_id not in tables]
+        if missing:
+            bands = {court_id: [] for court_id in missing}
+            rows = db.session.query(
+                CourtFee.court_id,
+                CourtFee.start_time,
+                CourtFee.end_time,
+                CourtFee.fee
+            ).filter(CourtFee.court_id.in_(missing)).all()
+            for court_id, start_time, end_time, fee in rows:
+                bands[court_id].append(FeeBand(start_time, end_time, fee))
+
+            with self._lock:
+                for court_id, court_bands in bands.items():
+                    table = CourtFeeTable(court_bands)
+                    self._tables[court_id] = (versions[court_id], table)
+                    tables[court_id] = table
+
+        return tables
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+court_fee_cache = CourtFeeCache()
+
+def get_court_fee_table(court_id):
+    return court_fee_cache.get_many([court_id])[court_id]
+
+def get_court_fee_tables(court_ids):
+    return court_fee_cache.get_many(court_ids)
+
+def resolve_court_fee(court_id, start_time, end_time=None):
+    """Court fee for a slot at a court, see CourtFeeTable.fee_for_slot"""
+    return get_court_fee_table(court_id).fee_for_slot(start_time, end_time)
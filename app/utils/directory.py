@@ -0,0 +1,196 @@
+# app/utils/directory.py
+from collections import defaultdict
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import and_, or_
+from app import db
+from app.models.court import Court, CoachCourt
+from app.models.tag import Tag, CoachTag
+from app.models.academy import Academy, AcademyCoach, AcademyCoachRole
+
+def load_coach_courts(coach_ids, session=None):
+    """Return {coach_id: [court names]} for a set of coaches in one query"""
+    courts_by_coach = defaultdict(list)
+    if not coach_ids:
+        return courts_by_coach
+
+    session = session or db.session
+    rows = session.query(
+        CoachCourt.coach_id,
+        Court.name
+    ).join(
+        Court, Court.id == CoachCourt.court_id
+    ).filter(
+        CoachCourt.coach_id.in_(coach_ids)
+    ).order_by(CoachCourt.coach_id, Court.id).all()
+
+    for coach_id, court_name in rows:
+        courts_by_coach[coach_id].append(court_name)
+
+    return courts_by_coach
+
+def load_coach_tags(coach_ids, session=None):
+    """Return {coach_id: [{'id', 'name'}]} for a set of coaches in one query"""
+    tags_by_coach = defaultdict(list)
+    if not coach_ids:
+        return tags_by_coach
+
+    session = session or db.session
+    rows = session.query(
+        CoachTag.coach_id,
+        Tag.id,
+        Tag.name
+    ).join(
+        Tag, Tag.id == CoachTag.tag_id
+    ).filter(
+        CoachTag.coach_id.in_(coach_ids)
+    ).order_by(CoachTag.coach_id, CoachTag.id).all()
+
+    for coach_id, tag_id, tag_name in rows:
+        tags_by_coach[coach_id].append({
+            'id': tag_id,
+            'name': tag_name
+        })
+
+    return tags_by_coach
+
+def load_academy_affiliations(coach_ids, academy_id=-1, session=None):
+    """Return {coach_id: [affiliation dicts]} for active academy links in one query.
+
+    When academy_id is given, only affiliations with that academy are returned.
+    """
+    affiliations_by_coach = defaultdict(list)
+    if not coach_ids:
+        return affiliations_by_coach
+
+    session = session or db.session
+    query = session.query(
+        AcademyCoach.coach_id,
+        Academy.id,
+        Academy.name,
+        Academy.private_url_code,
+        AcademyCoachRole.name
+    ).join(
+        Academy, Academy.id == AcademyCoach.academy_id
+    ).outerjoin(
+        AcademyCoachRole, AcademyCoachRole.id == AcademyCoach.role_id
+    ).filter(
+        AcademyCoach.coach_id.in_(coach_ids),
+        AcademyCoach.is_active == True
+    )
+
+    if academy_id != -1:
+        query = query.filter(AcademyCoach.academy_id == academy_id)
+
+    for coach_id, a_id, a_name, url_code, role_name in query.order_by(AcademyCoach.coach_id, AcademyCoach.id).all():
+        affiliations_by_coach[coach_id].append({
+            'id': a_id,
+            'name': a_name,
+            'private_url_code': url_code,
+            'role': role_name or "Coach"
+        })
+
+    return affiliations_by_coach
+
+def load_directory_relations(coach_ids, academy_id=-1):
+    """Batch-load courts, tags and academy affiliations for a directory page.
+
+    Issues a fixed number of queries regardless of how many coaches are passed.
+    """
+    coach_ids = list(coach_ids)
+    return (
+        load_coach_courts(coach_ids),
+        load_coach_tags(coach_ids),
+        load_academy_affiliations(coach_ids, academy_id)
+    )
+
+
+# Keyset pagination
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+TOTAL_COUNT_CAP = 1000
+
+def _cursor_serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='coach-directory-cursor')
+
+def encode_cursor(sort_by, sort_direction, value, coach_id):
+    """Build an opaque, tamper-proof cursor pointing just after (value, coach_id)"""
+    return _cursor_serializer().dumps([sort_by, sort_direction, value, coach_id])
+
+def decode_cursor(cursor, sort_by, sort_direction):
+    """Return (value, coach_id) from a cursor, or raise ValueError if it is invalid
+    or was issued for a different sort order"""
+    try:
+        cursor_sort_by, cursor_direction, value, coach_id = _cursor_serializer().loads(cursor)
+    except (BadSignature, TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+    if cursor_sort_by != sort_by or cursor_direction != sort_direction:
+        raise ValueError('Cursor does not match the requested sort order')
+
+    return value, coach_id
+
+def keyset_filter(sort_key, id_column, position, sort_direction):
+    """Filter for rows strictly after position in (sort_key, id) order"""
+    value, last_id = position
+    if sort_direction == 'desc':
+        return or_(sort_key < value, and_(sort_key == value, id_column < last_id))
+    return or_(sort_key > value, and_(sort_key == value, id_column > last_id))
+
+def estimate_total(query, cap=TOTAL_COUNT_CAP):
+    """Count matching rows, stopping at cap.
+
+    Returns (count, is_estimate); is_estimate is True when there are at least cap rows.
+    """
+    capped = query.order_by(None).limit(cap).subquery()
+    count = db.session.query(db.func.count()).select_from(capped).scalar() or 0
+    return count, count >= cap
+
+
+# Facet buckets - (min, max) ranges are min-inclusive, max-exclusive; None is unbounded
+
+PRICE_BUCKETS = [(None, 50), (50, 75), (75, 100), (100, 150), (150, None)]
+DUPR_BUCKETS = [(None, 3.0), (3.0, 3.5), (3.5, 4.0), (4.0, 4.5), (4.5, 5.0), (5.0, None)]
+RATING_THRESHOLDS = [4.5, 4.0, 3.0, 2.0, 1.0]  # Cumulative "x and up" bands, like min_rating
+
+def _range_condition(column, low, high):
+    conditions = []
+    if low is not None:
+        conditions.append(column >= low)
+    if high is not None:
+        conditions.append(column < high)
+    return and_(*conditions)
+
+def count_range_buckets(query, column, buckets):
+    """Count rows of query per (min, max) bucket of column in a single query"""
+    row = query.with_entities(*[
+        db.func.sum(db.case((_range_condition(column, low, high), 1), else_=0))
+        for low, high in buckets
+    ]).one()
+    return [
+        {'min': low, 'max': high, 'count': int(count or 0)}
+        for (low, high), count in zip(buckets, row)
+    ]
+
+def count_threshold_buckets(query, column, thresholds):
+    """Count rows of query with column >= each threshold in a single query"""
+    row = query.with_entities(*[
+        db.func.sum(db.case((column >= threshold, 1), else_=0))
+        for threshold in thresholds
+    ]).one()
+    return [
+        {'min': threshold, 'count': int(count or 0)}
+        for threshold, count in zip(thresholds, row)
+    ]
+
+def count_grouped(query, id_column, name_column):
+    """Group query by (id, name) and return [{'id', 'name', 'count'}], most common first"""
+    count = db.func.count()
+    rows = query.with_entities(id_column, name_column, count).group_by(
+        id_column, name_column
+    ).order_by(count.desc(), name_column).all()
+    return [
+        {'id': row_id, 'name': name, 'count': row_count}
+        for row_id, name, row_count in rows
+    ]
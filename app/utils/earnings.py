@@ -0,0 +1,141 @@
+# app/utils/earnings.py
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+from sqlalchemy import extract, func
+from app import db
+from app.models.user import User
+from app.models.coach import Coach
+from app.models.court import Court
+from app.models.booking_rollup import BookingDailyRollup
+
+DISCOUNT_TYPES = ['first_time', 'package', 'seasonal', 'custom']
+
+CourtEarnings = namedtuple('CourtEarnings', ['name', 'earnings'])
+CoachEarnings = namedtuple('CoachEarnings', ['coach_id', 'first_name', 'last_name', 'sessions', 'earnings'])
+
+def month_starts(count, today=None):
+    """First day of each of the last count calendar months, oldest first, ending with today's month"""
+    today = today or datetime.utcnow().date()
+    index = today.year * 12 + today.month - 1
+    return [date(i // 12, i % 12 + 1, 1) for i in range(index - count + 1, index + 1)]
+
+def previous_month(month_start):
+    """First day of the calendar month before month_start"""
+    return month_starts(2, month_start)[0]
+
+class EarningsReport:
+    """Earnings from completed bookings, aggregated in two grouped queries over
+    the daily rollup (BookingDailyRollup) rather than the bookings themselves.
+
+    The first groups by calendar month and discount type (totals, monthly series
+    and breakdown), the second by court and coach. Everything else is summed
+    from those rows in Python.
+    """
+    def __init__(self, coach_ids=None, start_date=None, end_date=None, by_court_and_coach=True):
+        self.by_month = defaultdict(float)
+        self.by_type = defaultdict(lambda: {'sessions': 0, 'amount': 0.0})
+        self.courts = {}
+        self.coaches = {}
+
+        rollup = BookingDailyRollup
+        filters = []
+        if coach_ids is not None:
+            filters.append(rollup.coach_id.in_(list(coach_ids)))
+        if start_date:
+            filters.append(rollup.date >= start_date)
+        if end_date:
+            filters.append(rollup.date <= end_date)
+
+        year = extract('year', rollup.date)
+        month = extract('month', rollup.date)
+        rows = db.session.query(
+            year, month, rollup.discount_type,
+            func.sum(rollup.sessions), func.sum(rollup.gross)
+        ).filter(*filters).group_by(year, month, rollup.discount_type)
+
+        for row_year, row_month, row_type, sessions, amount in rows:
+            amount = float(amount or 0)
+            self.by_month[(int(row_year), int(row_month))] += amount
+            self.by_type[row_type]['sessions'] += int(sessions or 0)
+            self.by_type[row_type]['amount'] += amount
+        self.total = sum(self.by_month.values())
+        self.sessions = sum(totals['sessions'] for totals in self.by_type.values())
+
+        if not by_court_and_coach:
+            return
+
+        rows = db.session.query(
+            rollup.court_id, Court.name,
+            rollup.coach_id, User.first_name, User.last_name,
+            func.sum(rollup.sessions), func.sum(rollup.gross)
+        ).outerjoin(
+            Court, rollup.court_id == Court.id
+        ).outerjoin(
+            Coach, rollup.coach_id == Coach.id
+        ).outerjoin(
+            User, Coach.user_id == User.id
+        ).filter(*filters).group_by(
+            rollup.court_id, Court.name, rollup.coach_id, User.first_name, User.last_name
+        )
+
+        for court_id, court_name, coach_id, first_name, last_name, sessions, amount in rows:
+            sessions, amount = int(sessions or 0), float(amount or 0)
+            if court_name is not None:
+                court = self.courts.get(court_id) or CourtEarnings(court_name, 0.0)
+                self.courts[court_id] = court._replace(earnings=court.earnings + amount)
+            if first_name is not None:
+                coach = self.coaches.get(coach_id) or CoachEarnings(coach_id, first_name, last_name, 0, 0.0)
+                self.coaches[coach_id] = coach._replace(
+                    sessions=coach.sessions + sessions,
+                    earnings=coach.earnings + amount
+                )
+
+    def month(self, month_start):
+        """Earnings in the calendar month starting at month_start"""
+        return self.by_month.get((month_start.year, month_start.month), 0.0)
+
+    def monthly(self, count=12, today=None):
+        """Earnings for each of the last count calendar months, keyed 'Month YYYY', oldest first"""
+        return {start.strftime('%B %Y'): self.month(start) for start in month_starts(count, today)}
+
+    def monthly_average(self, count=12, today=None):
+        """Total earnings divided by the number of the last count months that had any"""
+        active_months = sum(1 for amount in self.monthly(count, today).values() if amount > 0)
+        return self.total / active_months if active_months else 0.0
+
+    def by_court(self):
+        """{court name: earnings} for courts with earnings (same-named courts are combined)"""
+        earnings = defaultdict(float)
+        for court in self.courts.values():
+            earnings[court.name] += court.earnings
+        return {name: amount for name, amount in earnings.items() if amount > 0}
+
+    def by_coach(self):
+        """{'First Last': earnings} for coaches with earnings"""
+        return {
+            f"{coach.first_name} {coach.last_name}": coach.earnings
+            for coach in self.coaches.values() if coach.earnings > 0
+        }
+
+    def breakdown(self, include_empty=False):
+        """{type: {'sessions', 'amount'}} for regular sessions and each discount type.
+
+        Regular is always included; discount types without sessions only with include_empty.
+        """
+        breakdown = {'regular': dict(self.by_type['regular'])}
+        for discount_type in DISCOUNT_TYPES:
+            if include_empty or self.by_type[discount_type]['sessions'] > 0:
+                breakdown[discount_type] = dict(self.by_type[discount_type])
+        return breakdown
+
+    def summary(self, months=12, today=None):
+        """The earnings payload shared by the coach and academy dashboards"""
+        this_month = month_starts(1, today)[0]
+        return {
+            'total': self.total,
+            'this_month': self.month(this_month),
+            'last_month': self.month(previous_month(this_month)),
+            'monthly': self.monthly(months, today),
+            'by_court': self.by_court(),
+            'breakdown': self.breakdown()
+        }
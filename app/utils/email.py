@@ -1,154 +1,94 @@
 # app/utils/email.py
-from flask import current_app, render_template
-from flask_mail import Message
-from app import mail
-from threading import Thread
-
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
+from collections import defaultdict
+from flask import current_app
+from app.utils.email_outbox import queue_email, queue_emails
+from app.utils.email_render import load_booking_contexts, render_email, render_batch
 
 def send_email(subject, recipients, text_body, html_body):
-    msg = Message(subject, sender=current_app.config['MAIL_DEFAULT_SENDER'], recipients=recipients)
-    msg.body = text_body
-    msg.html = html_body
-    
-    # Send email asynchronously
-    Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
+    """Queue an email in the outbox as part of the current transaction.
+
+    It is delivered by the outbox workers once the caller commits, and dropped
+    with everything else if the transaction rolls back.
+    """
+    queue_email(subject, recipients, text_body, html_body,
+                sender=current_app.config['MAIL_DEFAULT_SENDER'])
+
+def send_booking_email(template, booking, subject, recipient, **extra):
+    """Render email/<template> for one booking and queue it for the student or the coach"""
+    context = load_booking_contexts([booking.id]).get(booking.id)
+    if context is None:
+        return
+    text_body, html_body = render_email(template, booking=context, **extra)
+    send_email(subject, [getattr(context, f'{recipient}_email')], text_body, html_body)
+
+def send_booking_emails(template, booking_ids, subject, recipient, **extra):
+    """Render and queue one email per booking for bulk sends.
+
+    All bookings are loaded with one query, rendered in one pass over the
+    compiled templates and written to the outbox with one INSERT.
+    """
+    contexts = list(load_booking_contexts(booking_ids).values())
+    rendered = render_batch(template, [dict(extra, booking=context) for context in contexts])
+    return queue_emails([{
+        'subject': subject,
+        'recipients': [getattr(context, f'{recipient}_email')],
+        'text_body': text_body,
+        'html_body': html_body
+    } for context, (text_body, html_body) in zip(contexts, rendered)])
+
+def send_booking_digest(booking_ids, recipient='coach', subject="Your Bookings - Pickleball Connect"):
+    """Queue one digest per student or coach listing all of their given bookings"""
+    by_recipient = defaultdict(list)
+    for context in load_booking_contexts(booking_ids).values():
+        by_recipient[getattr(context, f'{recipient}_email')].append(context)
+
+    names = {email: getattr(bookings[0], f'{recipient}_first_name') for email, bookings in by_recipient.items()}
+    rendered = render_batch('booking_digest', [
+        {'name': names[email], 'bookings': bookings, 'recipient': recipient}
+        for email, bookings in by_recipient.items()
+    ])
+    return queue_emails([{
+        'subject': subject,
+        'recipients': [email],
+        'text_body': text_body,
+        'html_body': html_body
+    } for email, (text_body, html_body) in zip(by_recipient, rendered)])
 
 def send_booking_confirmation(booking):
     """Send booking confirmation email to student"""
-    student = booking.student
-    coach = booking.coach.user
-    
-    subject = f"Booking Confirmation - Pickleball Connect"
-    recipients = [student.email]
-    
-    text_body = render_template('email/booking_confirmation.txt', 
-                               booking=booking,
-                               student=student,
-                               coach=coach)
-    html_body = render_template('email/booking_confirmation.html', 
-                               booking=booking,
-                               student=student,
-                               coach=coach)
-    
-    send_email(subject, recipients, text_body, html_body)
+    send_booking_email('booking_confirmation', booking,
+                       "Booking Confirmation - Pickleball Connect", 'student')
 
 def send_coach_booking_notification(booking):
     """Notify coach about new booking"""
-    student = booking.student
-    coach = booking.coach.user
-    
-    subject = f"New Booking - Pickleball Connect"
-    recipients = [coach.email]
-    
-    text_body = render_template('email/coach_booking_notification.txt', 
-                               booking=booking,
-                               student=student,
-                               coach=coach)
-    html_body = render_template('email/coach_booking_notification.html', 
-                               booking=booking,
-                               student=student,
-                               coach=coach)
-    
-    send_email(subject, recipients, text_body, html_body)
+    send_booking_email('coach_booking_notification', booking,
+                       "New Booking - Pickleball Connect", 'coach')
 
 def send_coach_payment_proof_notification(booking, proof_type):
     """Notify coach about payment proof upload"""
-    student = booking.student
-    coach = booking.coach.user
-    
-    subject = f"Payment Proof Uploaded - Pickleball Connect"
-    recipients = [coach.email]
-    
-    text_body = render_template('email/payment_proof_notification.txt', 
-                               booking=booking,
-                               student=student,
-                               coach=coach,
-                               proof_type=proof_type)
-    html_body = render_template('email/payment_proof_notification.html', 
-                               booking=booking,
-                               student=student,
-                               coach=coach,
-                               proof_type=proof_type)
-    
-    send_email(subject, recipients, text_body, html_body)
+    send_booking_email('payment_proof_notification', booking,
+                       "Payment Proof Uploaded - Pickleball Connect", 'coach',
+                       proof_type=proof_type)
 
 def send_student_payment_status_notification(booking, proof_type, status, notes):
     """Notify student about payment proof status update"""
-    student = booking.student
-    coach = booking.coach.user
-    
-    subject = f"Payment Proof {status.capitalize()} - Pickleball Connect"
-    recipients = [student.email]
-    
-    text_body = render_template('email/payment_status_notification.txt', 
-                               booking=booking,
-                               student=student,
-                               coach=coach,
-                               proof_type=proof_type,
-                               status=status,
-                               notes=notes)
-    html_body = render_template('email/payment_status_notification.html', 
-                               booking=booking,
-                               student=student,
-                               coach=coach,
-                               proof_type=proof_type,
-                               status=status,
-                               notes=notes)
-    
-    send_email(subject, recipients, text_body, html_body)
+    send_booking_email('payment_status_notification', booking,
+                       f"Payment Proof {status.capitalize()} - Pickleball Connect", 'student',
+                       proof_type=proof_type, status=status, notes=notes)
 
 def send_booking_cancelled_notification(booking, cancelled_by, reason=''):
     """Notify about booking cancellation"""
-    student = booking.student
-    coach = booking.coach.user
-    
     # Determine recipient based on who cancelled
     if cancelled_by == 'coach':
-        subject = f"Your Booking has been Cancelled - Pickleball Connect"
-        recipients = [student.email]
+        subject, recipient = "Your Booking has been Cancelled - Pickleball Connect", 'student'
     else:  # cancelled_by == 'student'
-        subject = f"Booking Cancellation - Pickleball Connect"
-        recipients = [coach.email]
-    
-    text_body = render_template('email/booking_cancelled.txt', 
-                               booking=booking,
-                               student=student,
-                               coach=coach,
-                               cancelled_by=cancelled_by,
-                               reason=reason)
-    html_body = render_template('email/booking_cancelled.html', 
-                               booking=booking,
-                               student=student,
-                               coach=coach,
-                               cancelled_by=cancelled_by,
-                               reason=reason)
-    
-    send_email(subject, recipients, text_body, html_body)
+        subject, recipient = "Booking Cancellation - Pickleball Connect", 'coach'
+
+    send_booking_email('booking_cancelled', booking, subject, recipient,
+                       cancelled_by=cancelled_by, reason=reason)
 
 def send_booking_rescheduled_notification(booking, old_date, old_time, old_court):
     """Notify student about rescheduled booking"""
-    student = booking.student
-    coach = booking.coach.user
-    
-    subject = f"Your Booking has been Rescheduled - Pickleball Connect"
-    recipients = [student.email]
-    
-    text_body = render_template('email/booking_rescheduled.txt', 
-                               booking=booking,
-                               student=student,
-                               coach=coach,
-                               old_date=old_date,
-                               old_time=old_time,
-                               old_court=old_court)
-    html_body = render_template('email/booking_rescheduled.html', 
-                               booking=booking,
-                               student=student,
-                               coach=coach,
-                               old_date=old_date,
-                               old_time=old_time,
-                               old_court=old_court)
-    
-    send_email(subject, recipients, text_body, html_body)
\ No newline at end of file
+    send_booking_email('booking_rescheduled', booking,
+                       "Your Booking has been Rescheduled - Pickleball Connect", 'student',
+                       old_date=old_date, old_time=old_time, old_court=old_court)
@@ -0,0 +1,244 @@
+# app/utils/email_outbox.py
+import random
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message, BadHeaderError
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+from app import db, mail
+from app.models.email_outbox import EmailOutbox
+
+MAX_ATTEMPTS = 6
+BASE_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 60 * 60
+# A claim this old belongs to a worker that died mid-batch
+STALE_CLAIM = timedelta(minutes=10)
+
+_wake = threading.Event()
+_stop = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+def queue_email(subject, recipients, text_body, html_body, sender=None):
+    """Add an email to the outbox in the current transaction.
+
+    Nothing is sent unless the caller commits; the workers are woken on commit.
+    """
+    email = EmailOutbox(
+        subject=subject,
+        sender=sender or current_app.config['MAIL_DEFAULT_SENDER'],
+        recipients=list(recipients),
+        text_body=text_body,
+        html_body=html_body,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(email)
+    db.session.info['email_queued'] = True
+    return email
+
+def queue_emails(emails, sender=None):
+    """Add many emails to the outbox with one INSERT in the current transaction.
+
+    emails are dicts with subject, recipients, text_body and html_body.
+    """
+    if not emails:
+        return 0
+    now = datetime.utcnow()
+    sender = sender or current_app.config['MAIL_DEFAULT_SENDER']
+    db.session.execute(db.insert(EmailOutbox), [{
+        'subject': email['subject'],
+        'sender': sender,
+        'recipients': list(email['recipients']),
+        'text_body': email['text_body'],
+        'html_body': email['html_body'],
+        'status': 'pending',
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now
+    } for email in emails])
+    db.session.info['email_queued'] = True
+    return len(emails)
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop('email_queued', False):
+        _wake.set()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_queued(session):
+    session.info.pop('email_queued', None)
+
+def backoff(attempts):
+    """Delay before the next attempt: exponential from 30s, capped at an hour, with jitter"""
+    delay = min(BASE_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+def is_permanent_failure(error):
+    """Whether retrying can never deliver the message (rejected address, malformed message)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False  # Fixed by configuration, not by the message
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return isinstance(error, (BadHeaderError, AssertionError, ValueError))
+
+def claim_batch(limit):
+    """Mark up to limit due emails as being sent by the caller and return them"""
+    now = datetime.utcnow()
+    due = or_(
+        and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == 'sending', EmailOutbox.claimed_at < now - STALE_CLAIM)
+    )
+    due_ids = [email_id for (email_id,) in db.session.query(EmailOutbox.id).filter(due).order_by(
+        EmailOutbox.next_attempt_at,
+        EmailOutbox.id
+    ).limit(limit)]
+    if not due_ids:
+        return []
+
+    # Conditional update, so two workers never claim the same row
+    token = str(uuid.uuid4())
+    EmailOutbox.query.filter(EmailOutbox.id.in_(due_ids), due).update({
+        EmailOutbox.status: 'sending',
+        EmailOutbox.claim_token: token,
+        EmailOutbox.claimed_at: now
+    }, synchronize_session=False)
+    db.session.commit()
+
+    return EmailOutbox.query.filter_by(claim_token=token).order_by(EmailOutbox.id).all()
+
+class SMTPSession:
+    """One SMTP connection kept open across messages and batches.
+
+    Reopened when the server drops it and closed after idle_timeout seconds
+    without sending, before the server would time it out.
+    """
+    def __init__(self, idle_timeout=60):
+        self.idle_timeout = idle_timeout
+        self.connection = None
+        self.last_used = 0
+
+    def _open(self):
+        self.connection = mail.connect()
+        self.connection.__enter__()  # Opens the socket; closed in close(), not per message
+
+    def send(self, message):
+        if self.connection is None:
+            self._open()
+        try:
+            self.connection.send(message)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._open()
+            self.connection.send(message)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.connection = None
+
+    def close_if_idle(self):
+        if self.connection is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            self.close()
+
+def deliver_batch(batch, smtp):
+    """Send claimed emails over smtp and record the outcome of each. Returns the number sent."""
+    sent = 0
+    for email in batch:
+        message = Message(
+            email.subject,
+            sender=email.sender,
+            recipients=email.recipients,
+            body=email.text_body,
+            html=email.html_body
+        )
+        email.attempts += 1
+        email.claim_token = None
+        try:
+            smtp.send(message)
+        except Exception as e:
+            email.last_error = str(e)[:1000]
+            if is_permanent_failure(e) or email.attempts >= MAX_ATTEMPTS:
+                email.status = 'failed'
+            else:
+                email.status = 'pending'
+                email.next_attempt_at = datetime.utcnow() + backoff(email.attempts)
+            if not isinstance(e, smtplib.SMTPResponseException):
+                smtp.close()  # The connection itself is suspect
+            continue
+        email.status = 'sent'
+        email.sent_at = datetime.utcnow()
+        sent += 1
+    db.session.commit()
+    return sent
+
+def drain_outbox(smtp=None):
+    """Send every due email now on the calling thread. Returns (sent, failed or retried)."""
+    owns_session = smtp is None
+    smtp = smtp or SMTPSession()
+    sent = attempted = 0
+    try:
+        while True:
+            batch = claim_batch(current_app.config['EMAIL_BATCH_SIZE'])
+            if not batch:
+                break
+            attempted += len(batch)
+            sent += deliver_batch(batch, smtp)
+    finally:
+        if owns_session:
+            smtp.close()
+    return sent, attempted - sent
+
+class EmailWorker(threading.Thread):
+    """Drains the outbox in batches, keeping its own SMTP connection open between them"""
+    def __init__(self, app, name):
+        super().__init__(name=name, daemon=True)
+        self.app = app
+        self.smtp = SMTPSession(app.config['EMAIL_SMTP_IDLE_SECONDS'])
+
+    def run(self):
+        poll_seconds = self.app.config['EMAIL_POLL_SECONDS']
+        while not _stop.is_set():
+            claimed = 0
+            try:
+                with self.app.app_context():
+                    batch = claim_batch(self.app.config['EMAIL_BATCH_SIZE'])
+                    claimed = len(batch)
+                    if batch:
+                        deliver_batch(batch, self.smtp)
+            except Exception as e:
+                self.app.logger.warning(f"Email worker {self.name} failed: {str(e)}")
+            if not claimed:
+                self.smtp.close_if_idle()
+                _wake.wait(poll_seconds)
+                _wake.clear()
+        self.smtp.close()
+
+def start_email_workers(app):
+    """Start the fixed-size pool of outbox workers (EMAIL_WORKERS threads) once per process"""
+    if _workers:
+        return
+    with _workers_lock:
+        if _workers:
+            return
+        _stop.clear()
+        for index in range(app.config['EMAIL_WORKERS']):
+            worker = EmailWorker(app, f'email-worker-{index}')
+            worker.start()
+            _workers.append(worker)
+
+def stop_email_workers(timeout=None):
+    _stop.set()
+    _wake.set()
+    for worker in _workers:
+        worker.join(timeout)
+    _workers.clear()
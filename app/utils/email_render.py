@@ -0,0 +1,93 @@
+# app/utils/email_render.py
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy.orm import aliased
+from app import db
+from app.models.user import User
+from app.models.coach import Coach
+from app.models.court import Court
+from app.models.booking import Booking
+
+# Everything an email needs about a booking, formatted once, so templates never touch the ORM
+BookingEmailContext = namedtuple('BookingEmailContext', [
+    'booking_id', 'date', 'start_time', 'end_time', 'status',
+    'price', 'coach_fee', 'court_fee',
+    'court_name', 'court_address',
+    'student_first_name', 'student_name', 'student_email',
+    'coach_first_name', 'coach_name', 'coach_email'
+])
+
+def load_booking_contexts(booking_ids):
+    """Load email contexts for many bookings in one query, keyed by booking id (in input order)"""
+    booking_ids = list(dict.fromkeys(booking_ids))
+    if not booking_ids:
+        return {}
+
+    Student = aliased(User)
+    CoachUser = aliased(User)
+    rows = db.session.query(
+        Booking.id, Booking.date, Booking.start_time, Booking.end_time, Booking.status,
+        Booking.price, Booking.coach_fee, Booking.court_fee,
+        Court.name, Court.address, Court.city,
+        Student.first_name, Student.last_name, Student.email,
+        CoachUser.first_name, CoachUser.last_name, CoachUser.email
+    ).join(
+        Student, Booking.student_id == Student.id
+    ).join(
+        Coach, Booking.coach_id == Coach.id
+    ).join(
+        CoachUser, Coach.user_id == CoachUser.id
+    ).join(
+        Court, Booking.court_id == Court.id
+    ).filter(
+        Booking.id.in_(booking_ids)
+    ).all()
+
+    contexts = {}
+    for (booking_id, date, start_time, end_time, status, price, coach_fee, court_fee,
+         court_name, court_address, court_city,
+         student_first, student_last, student_email,
+         coach_first, coach_last, coach_email) in rows:
+        contexts[booking_id] = BookingEmailContext(
+            booking_id=booking_id,
+            date=date.strftime('%A, %B %d, %Y'),
+            start_time=start_time.strftime('%I:%M %p'),
+            end_time=end_time.strftime('%I:%M %p'),
+            status=status,
+            price=f"{price:.2f}",
+            coach_fee=f"{coach_fee:.2f}",
+            court_fee=f"{court_fee:.2f}",
+            court_name=court_name,
+            court_address=', '.join(part for part in (court_address, court_city) if part),
+            student_first_name=student_first,
+            student_name=f"{student_first} {student_last}",
+            student_email=student_email,
+            coach_first_name=coach_first,
+            coach_name=f"{coach_first} {coach_last}",
+            coach_email=coach_email
+        )
+    return {booking_id: contexts[booking_id] for booking_id in booking_ids if booking_id in contexts}
+
+def get_email_templates(name):
+    """Return the compiled (text, html) templates for email/<name>.
+
+    Compiled once per app and kept, so rendering skips the loader and
+    auto-reload checks that render_template goes through on every call.
+    """
+    cache = current_app.extensions.setdefault('email_templates', {})
+    templates = cache.get(name)
+    if templates is None:
+        env = current_app.jinja_env
+        templates = (env.get_template(f'email/{name}.txt'), env.get_template(f'email/{name}.html'))
+        cache[name] = templates
+    return templates
+
+def render_email(name, **context):
+    """Render the text and HTML bodies of one email"""
+    text_template, html_template = get_email_templates(name)
+    return text_template.render(context), html_template.render(context)
+
+def render_batch(name, contexts):
+    """Render one email per context dict in a single pass over the same compiled templates"""
+    text_template, html_template = get_email_templates(name)
+    return [(text_template.render(context), html_template.render(context)) for context in contexts]
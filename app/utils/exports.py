@@ -0,0 +1,148 @@
+# app/utils/exports.py
+import csv
+import io
+import json
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.user import User
+from app.models.coach import Coach
+from app.models.court import Court
+from app.models.booking import Booking
+from app.models.booking_rollup import BookingDailyRollup
+
+# Rows fetched from the database (and written to the response) per batch
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+BOOKING_EXPORT_FIELDS = [
+    'booking_id', 'date', 'start_time', 'end_time', 'status',
+    'coach_id', 'coach_name', 'student_id', 'student_name', 'student_email',
+    'court_id', 'court_name',
+    'base_price', 'price', 'coach_fee', 'court_fee', 'discount_type', 'discount_amount',
+    'coaching_payment_status', 'court_payment_status', 'session_log_title'
+]
+
+EARNINGS_EXPORT_FIELDS = [
+    'date', 'coach_id', 'coach_name', 'court_id', 'court_name', 'discount_type',
+    'sessions', 'gross', 'coach_fees', 'court_fees', 'discounts'
+]
+
+def booking_export_rows(coach_ids, start_date=None, end_date=None):
+    """Yield one dict per booking of the given coaches, oldest first.
+
+    Related rows are joined into the same query and fetched EXPORT_BATCH_SIZE
+    bookings at a time, so memory use does not grow with the export.
+    """
+    query = Booking.query.options(
+        joinedload(Booking.student),
+        joinedload(Booking.coach).joinedload(Coach.user),
+        joinedload(Booking.court),
+        joinedload(Booking.session_log)
+    ).filter(Booking.coach_id.in_(list(coach_ids)))
+    if start_date:
+        query = query.filter(Booking.date >= start_date)
+    if end_date:
+        query = query.filter(Booking.date <= end_date)
+
+    for booking in query.order_by(Booking.date, Booking.start_time, Booking.id).yield_per(EXPORT_BATCH_SIZE):
+        coach_user = booking.coach.user
+        yield {
+            'booking_id': booking.id,
+            'date': booking.date.isoformat(),
+            'start_time': booking.start_time.strftime('%H:%M:%S'),
+            'end_time': booking.end_time.strftime('%H:%M:%S'),
+            'status': booking.status,
+            'coach_id': booking.coach_id,
+            'coach_name': f"{coach_user.first_name} {coach_user.last_name}",
+            'student_id': booking.student_id,
+            'student_name': f"{booking.student.first_name} {booking.student.last_name}",
+            'student_email': booking.student.email,
+            'court_id': booking.court_id,
+            'court_name': booking.court.name,
+            'base_price': booking.base_price,
+            'price': booking.price,
+            'coach_fee': booking.coach_fee,
+            'court_fee': booking.court_fee,
+            'discount_type': booking.discount_type or 'regular',
+            'discount_amount': booking.discount_amount or 0.0,
+            'coaching_payment_status': booking.coaching_payment_status,
+            'court_payment_status': booking.court_payment_status,
+            'session_log_title': booking.session_log.title if booking.session_log else None
+        }
+
+def earnings_export_rows(coach_ids, start_date=None, end_date=None):
+    """Yield one dict per day, coach, court and discount type with completed-session earnings"""
+    rollup = BookingDailyRollup
+    query = db.session.query(
+        rollup.date, rollup.coach_id, User.first_name, User.last_name,
+        rollup.court_id, Court.name, rollup.discount_type,
+        db.func.sum(rollup.sessions), db.func.sum(rollup.gross),
+        db.func.sum(rollup.coach_fees), db.func.sum(rollup.court_fees), db.func.sum(rollup.discounts)
+    ).join(
+        Coach, rollup.coach_id == Coach.id
+    ).join(
+        User, Coach.user_id == User.id
+    ).join(
+        Court, rollup.court_id == Court.id
+    ).filter(
+        rollup.coach_id.in_(list(coach_ids))
+    )
+    if start_date:
+        query = query.filter(rollup.date >= start_date)
+    if end_date:
+        query = query.filter(rollup.date <= end_date)
+
+    query = query.group_by(
+        rollup.date, rollup.coach_id, User.first_name, User.last_name,
+        rollup.court_id, Court.name, rollup.discount_type
+    ).having(db.func.sum(rollup.sessions) > 0).order_by(rollup.date, rollup.coach_id, rollup.court_id)
+
+    for (day, coach_id, first_name, last_name, court_id, court_name, discount_type,
+         sessions, gross, coach_fees, court_fees, discounts) in query.yield_per(EXPORT_BATCH_SIZE):
+        yield {
+            'date': day.isoformat(),
+            'coach_id': coach_id,
+            'coach_name': f"{first_name} {last_name}",
+            'court_id': court_id,
+            'court_name': court_name,
+            'discount_type': discount_type,
+            'sessions': int(sessions),
+            'gross': round(float(gross or 0), 2),
+            'coach_fees': round(float(coach_fees or 0), 2),
+            'court_fees': round(float(court_fees or 0), 2),
+            'discounts': round(float(discounts or 0), 2)
+        }
+
+def iter_csv(rows, fields):
+    """Encode rows as CSV with a header line, yielding a chunk per EXPORT_BATCH_SIZE rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_ndjson(rows):
+    """Encode rows as newline-delimited JSON, yielding a chunk per EXPORT_BATCH_SIZE rows"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def encode_export(rows, fields, export_format):
+    """Chunks of rows in export_format ('csv' or 'ndjson')"""
+    if export_format == 'csv':
+        return iter_csv(rows, fields)
+    return iter_ndjson(rows)
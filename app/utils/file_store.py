@@ -0,0 +1,232 @@
+# app/utils/file_store.py
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.stored_file import StoredFile
+from app.models.image import ImageVariant
+from app.models.user import User
+from app.models.coach import Coach, CoachImage
+from app.models.academy import Academy
+from app.models.payment import PaymentProof
+
+# Unreferenced blobs and leftover staging files are kept this long before collection,
+# so uploads whose records are still being written are never removed
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+# '<sha256>.<ext>' blobs plus their '<sha256>_<variant>.<ext>' derivatives
+_BLOB_NAME = re.compile(r'^([0-9a-f]{64})(?:_[a-z]+)?\.[a-z0-9]+$')
+_SHARD_NAME = re.compile(r'^[0-9a-f]{2}$')
+
+def blob_path(path):
+    """Path of a stored file relative to UPLOAD_FOLDER (checkout proofs are saved with an 'uploads/' prefix)"""
+    path = path.replace('\\', '/')
+    return path[len('uploads/'):] if path.startswith('uploads/') else path
+
+def blob_etag(filename):
+    """Strong ETag for a content-addressed file or one of its derivatives, None for other uploads.
+
+    Their names are derived from the SHA-256 of the content, so the name itself
+    identifies the bytes and never has to be recomputed.
+    """
+    name = os.path.basename(filename)
+    return name if _BLOB_NAME.match(name) else None
+
+def stream_to_temp(file, directory, chunk_size):
+    """Copy an upload into a temp file chunk by chunk, hashing it on the way.
+
+    Returns (temp_path, sha256 hex digest, size in bytes).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+def stage_upload(file, category, extension, references=1):
+    """Stream an upload into the staging area and register references to its blob.
+
+    Returns (relative_path, temp_path). The caller moves the staged copy into place
+    with place_blob(), which drops it if identical content is already stored.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    staging_dir = os.path.join(upload_folder, 'tmp')
+    os.makedirs(staging_dir, exist_ok=True)
+
+    temp_path, digest, size = stream_to_temp(file, staging_dir, current_app.config['UPLOAD_CHUNK_SIZE'])
+    relative_path = f"{category}/{digest[:2]}/{digest}.{extension}"
+    register_blob(relative_path, digest, size, references)
+    return relative_path, temp_path
+
+def place_blob(temp_path, final_path):
+    """Move a staged upload into place. Returns False if the content was already stored."""
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+        return False
+    os.replace(temp_path, final_path)
+    return True
+
+def register_blob(path, digest, size, references=1):
+    """Record a stored file if it is new and add references to it"""
+    table = StoredFile.__table__
+    values = {'path': path, 'digest': digest, 'size': size, 'ref_count': 0, 'created_at': datetime.utcnow()}
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        db.session.execute(sqlite.insert(table).values(values).on_conflict_do_nothing(index_elements=['path']))
+    elif dialect == 'postgresql':
+        db.session.execute(postgresql.insert(table).values(values).on_conflict_do_nothing(index_elements=['path']))
+    elif not StoredFile.query.filter_by(path=path).first():
+        db.session.execute(db.insert(StoredFile).values(values))
+    acquire_file(path, references)
+
+def acquire_file(path, count=1):
+    """Add references to a stored file. Returns False if the path is not in the store."""
+    if not path or not count:
+        return False
+    updated = StoredFile.query.filter_by(path=blob_path(path)).update({
+        StoredFile.ref_count: StoredFile.ref_count + count,
+        StoredFile.released_at: None
+    }, synchronize_session=False)
+    return updated > 0
+
+def release_file(path, count=1):
+    """Drop references to a stored file; the garbage collector removes it once
+    nothing references it. Returns False if the path is not in the store."""
+    if not path:
+        return False
+    path = blob_path(path)
+    updated = StoredFile.query.filter_by(path=path).update({
+        StoredFile.ref_count: StoredFile.ref_count - count
+    }, synchronize_session=False)
+    if updated:
+        StoredFile.query.filter(
+            StoredFile.path == path,
+            StoredFile.ref_count <= 0
+        ).update({StoredFile.released_at: datetime.utcnow()}, synchronize_session=False)
+    return updated > 0
+
+def count_references(paths):
+    """Count the records that actually point at each of the given stored paths.
+
+    Checked by the garbage collector before anything is removed, so drifted
+    reference counts can only delay collection, never remove a file in use.
+    """
+    paths = list(paths)
+    candidates = paths + [f"uploads/{path}" for path in paths]
+    references = Counter()
+
+    for column in (User.profile_picture, CoachImage.image_path, Academy.logo_path, PaymentProof.image_path):
+        for (value,) in db.session.query(column).filter(column.in_(candidates)):
+            references[blob_path(value)] += 1
+
+    wanted = set(paths)
+    for (payment_info,) in db.session.query(Coach.payment_info).filter(Coach.payment_info.isnot(None)):
+        qr_code = payment_info.get('qr_code_url') if isinstance(payment_info, dict) else None
+        if qr_code and blob_path(qr_code) in wanted:
+            references[blob_path(qr_code)] += 1
+
+    return references
+
+def _remove_blob_files(upload_folder, path, digest):
+    """Remove a deleted blob's file and the derivatives sharing its digest (variants, thumbnails)"""
+    # Registered again since the delete committed: the file is back in use
+    if StoredFile.query.filter_by(path=path).first():
+        return
+    full_path = os.path.join(upload_folder, path)
+    if os.path.exists(full_path):
+        os.remove(full_path)
+
+    # The same bytes uploaded under another extension share the derivatives
+    root = os.path.splitext(path)[0]
+    if StoredFile.query.filter(StoredFile.path.startswith(f"{root}.")).first():
+        return
+    directory = os.path.dirname(full_path)
+    prefix = f"{digest}_"
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.startswith(prefix):
+                os.remove(os.path.join(directory, name))
+
+def collect_garbage(grace_period=GC_GRACE_PERIOD):
+    """Remove unreferenced blobs, orphaned blob files and stale staging files.
+
+    Returns (blobs removed, orphaned files removed).
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    cutoff = datetime.utcnow() - grace_period
+
+    candidates = StoredFile.query.filter(
+        StoredFile.ref_count <= 0,
+        db.func.coalesce(StoredFile.released_at, StoredFile.created_at) < cutoff
+    ).all()
+
+    deleted = []
+    if candidates:
+        references = count_references(blob.path for blob in candidates)
+        for blob in candidates:
+            if references[blob.path]:
+                # Still in use: repair the count instead of removing it
+                blob.ref_count = references[blob.path]
+                blob.released_at = None
+                continue
+            # A reference taken since the candidates were loaded keeps the row
+            result = db.session.execute(db.delete(StoredFile).where(
+                StoredFile.id == blob.id,
+                StoredFile.ref_count <= 0
+            ).execution_options(synchronize_session=False))
+            if result.rowcount:
+                ImageVariant.query.filter_by(source_path=blob.path).delete(synchronize_session=False)
+                deleted.append((blob.path, blob.digest))
+        db.session.commit()
+
+    # Files are only removed once their rows are gone for good
+    for path, digest in deleted:
+        _remove_blob_files(upload_folder, path, digest)
+    removed = len(deleted)
+
+    # Files left behind by uploads whose transaction rolled back
+    stored = {os.path.splitext(path)[0] for (path,) in db.session.query(StoredFile.path)}
+    oldest = time.time() - grace_period.total_seconds()
+    orphans = 0
+    for category in os.listdir(upload_folder) if os.path.isdir(upload_folder) else []:
+        category_dir = os.path.join(upload_folder, category)
+        if not os.path.isdir(category_dir):
+            continue
+        for shard in os.listdir(category_dir):
+            shard_dir = os.path.join(category_dir, shard)
+            if not _SHARD_NAME.match(shard) or not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                match = _BLOB_NAME.match(name)
+                full_path = os.path.join(shard_dir, name)
+                if match and f"{category}/{shard}/{match.group(1)}" not in stored and os.path.getmtime(full_path) < oldest:
+                    os.remove(full_path)
+                    orphans += 1
+
+    staging_dir = os.path.join(upload_folder, 'tmp')
+    if os.path.isdir(staging_dir):
+        for name in os.listdir(staging_dir):
+            full_path = os.path.join(staging_dir, name)
+            if name.endswith('.part') and os.path.getmtime(full_path) < oldest:
+                os.remove(full_path)
+                orphans += 1
+
+    return removed, orphans
@@ -1,20 +1,8 @@
 # app/utils/file_utils.py
 import os
-import uuid
-from werkzeug.utils import secure_filename
 from flask import current_app
-from PIL import Image
-
-def resize_image(file_path, max_size=(800, 800)):
-    """Resize an image to be within max dimensions while preserving aspect ratio"""
-    try:
-        img = Image.open(file_path)
-        img.thumbnail(max_size, Image.LANCZOS)
-        img.save(file_path, optimize=True, quality=85)
-        return True
-    except Exception as e:
-        print(f"Error resizing image: {str(e)}")
-        return False
+from app.utils.images import process_image, delete_variants
+from app.utils.file_store import stage_upload, place_blob, release_file
 
 def allowed_file(filename):
     """Check if the file extension is allowed"""
@@ -32,31 +20,36 @@ def save_showcase_image(file, coach_id):
     return save_uploaded_file(file, current_app.config['SHOWCASE_IMAGES_FOLDER'], prefix=f"coach_{coach_id}")
 
 def save_uploaded_file(file, directory, prefix=''):
-    """Save an uploaded file and return the filename"""
+    """Save an uploaded image in the content-addressed store and return its path.
+
+    Identical uploads share one file named by its SHA-256, so prefix no longer
+    affects the name. The returned path counts as one reference to the file.
+    """
     if file and allowed_file(file.filename):
-        # Create a unique filename
-        filename = f"{prefix}_{uuid.uuid4()}_{secure_filename(file.filename)}"
-        upload_path = os.path.join(directory, filename).replace('\\', '/')
-        
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(upload_path), exist_ok=True)
-        
-        # Save the file
-        file.save(upload_path)
+        extension = file.filename.rsplit('.', 1)[1].lower()
+        relative_path, temp_path = stage_upload(file, os.path.basename(directory), extension)
 
-        # Resize image
-        resize_image(upload_path)
+        # Thumb, card and full variants are rendered by the image workers
+        if place_blob(temp_path, os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)):
+            process_image(relative_path)
         
         # Return the relative path for storing in the database
-        return os.path.join(os.path.basename(directory), filename)
+        return relative_path
     
     return None
 
 def delete_file(file_path):
-    """Delete a file from the filesystem"""
+    """Drop a reference to an uploaded file.
+
+    Stored files are removed by the garbage collector once nothing references
+    them; files saved before the store existed are deleted right away.
+    """
     if file_path:
+        if release_file(file_path):
+            return True
+        delete_variants(file_path)
         full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], file_path)
         if os.path.exists(full_path):
             os.remove(full_path)
             return True
-    return False
\ No newline at end of file
+    return False
@@ -0,0 +1,185 @@
+# app/utils/geo.py
+import csv
+import math
+from datetime import datetime
+from app import db
+from app.models.court import Court, CoachCourt
+from app.models.booking import Availability
+
+EARTH_RADIUS_KM = 6371.0
+
+# Courts are bucketed into GRID_DEGREES x GRID_DEGREES cells (~11 km at the equator).
+# A radius search looks up the cells covering its bounding box, then filters by exact distance.
+GRID_DEGREES = 0.1
+MAX_GRID_CELLS = 400  # Beyond this a plain bounding-box filter is cheaper than a huge IN list
+LONGITUDE_CELLS = round(360 / GRID_DEGREES)  # Longitude cell indices wrap around at +/-180
+
+DEFAULT_RADIUS_KM = 10.0
+MAX_RADIUS_KM = 500.0
+
+LATITUDE_COLUMNS = ('latitude', 'lat')
+LONGITUDE_COLUMNS = ('longitude', 'lon', 'lng')
+ZIP_COLUMNS = ('zip_code', 'zip', 'postal_code', 'postcode')
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def _cell_index(value):
+    return int(math.floor(value / GRID_DEGREES))
+
+def _longitude_cell(index):
+    """Wrap a longitude cell index into the range used for longitudes in [-180, 180)"""
+    half = LONGITUDE_CELLS // 2
+    return (index + half) % LONGITUDE_CELLS - half
+
+def grid_cell(latitude, longitude):
+    """Return the grid bucket key for a point"""
+    return f"{_cell_index(latitude)}:{_longitude_cell(_cell_index(longitude))}"
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return (min_lat, max_lat, min_lon, max_lon) enclosing a radius around a point"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6:
+        lon_delta = 180.0
+    else:
+        lon_delta = min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return (max(-90.0, latitude - lat_delta), min(90.0, latitude + lat_delta),
+            longitude - lon_delta, longitude + lon_delta)
+
+def cells_for_radius(latitude, longitude, radius_km):
+    """Return the grid cells covering a radius, or None if there would be too many"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    lat_range = range(_cell_index(min_lat), _cell_index(max_lat) + 1)
+    lon_start = _cell_index(min_lon)
+    lon_range = range(lon_start, min(_cell_index(max_lon), lon_start + LONGITUDE_CELLS - 1) + 1)
+    if len(lat_range) * len(lon_range) > MAX_GRID_CELLS:
+        return None
+    # A box crossing the antimeridian continues on the other side (cell -1801 is cell 1799)
+    return [f"{i}:{_longitude_cell(j)}" for i in lat_range for j in lon_range]
+
+def find_courts_near(latitude, longitude, radius_km):
+    """Return [(court_id, distance_km)] within radius_km of a point, nearest first"""
+    query = db.session.query(Court.id, Court.latitude, Court.longitude).filter(
+        Court.latitude.isnot(None),
+        Court.longitude.isnot(None)
+    )
+
+    cells = cells_for_radius(latitude, longitude, radius_km)
+    if cells is not None:
+        query = query.filter(Court.grid_cell.in_(cells))
+    else:
+        min_lat, max_lat, _, _ = bounding_box(latitude, longitude, radius_km)
+        query = query.filter(Court.latitude.between(min_lat, max_lat))
+
+    nearby = []
+    for court_id, court_lat, court_lon in query:
+        distance = haversine_km(latitude, longitude, court_lat, court_lon)
+        if distance <= radius_km:
+            nearby.append((court_id, distance))
+
+    nearby.sort(key=lambda item: item[1])
+    return nearby
+
+def find_coaches_near(latitude, longitude, radius_km, available_only=True, date_from=None, date_to=None):
+    """Return {coach_id: {'distance_km', 'court_ids'}} for coaches linked to nearby courts.
+
+    With available_only, only coaches with open availability at one of those courts
+    (between date_from and date_to, default from today) are returned.
+    """
+    nearby = find_courts_near(latitude, longitude, radius_km)
+    if not nearby:
+        return {}
+
+    distances = dict(nearby)
+
+    if available_only:
+        query = db.session.query(Availability.coach_id, Availability.court_id).filter(
+            Availability.court_id.in_(distances.keys()),
+            Availability.is_booked == False,
+            Availability.date >= (date_from or datetime.utcnow().date())
+        )
+        if date_to:
+            query = query.filter(Availability.date <= date_to)
+        links = query.distinct().all()
+    else:
+        links = db.session.query(CoachCourt.coach_id, CoachCourt.court_id).filter(
+            CoachCourt.court_id.in_(distances.keys())
+        ).all()
+
+    coaches = {}
+    for coach_id, court_id in links:
+        entry = coaches.setdefault(coach_id, {'distance_km': distances[court_id], 'court_ids': []})
+        entry['court_ids'].append(court_id)
+        entry['distance_km'] = min(entry['distance_km'], distances[court_id])
+
+    return coaches
+
+def _pick(row, names):
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ''):
+            return value.strip()
+    return None
+
+def import_court_coordinates(csv_path, overwrite=False):
+    """Geocode courts from a local CSV or gazetteer file.
+
+    The file needs a header with latitude/longitude columns (lat, lon/lng also accepted)
+    and at least one key column. Rows are matched in order of precision: court_id,
+    then zip_code (zip/postal_code), then city+state. Courts that already have
+    coordinates are left alone unless overwrite is set.
+
+    Returns (updated, unmatched) counts.
+    """
+    by_court_id, by_zip, by_city = {}, {}, {}
+
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        for raw in reader:
+            row = {(key or '').strip().lower(): value for key, value in raw.items()}
+            try:
+                latitude = float(_pick(row, LATITUDE_COLUMNS))
+                longitude = float(_pick(row, LONGITUDE_COLUMNS))
+            except (TypeError, ValueError):
+                continue
+
+            point = (latitude, longitude)
+            court_id = _pick(row, ('court_id',))
+            zip_code = _pick(row, ZIP_COLUMNS)
+            city = _pick(row, ('city',))
+            state = _pick(row, ('state',))
+
+            if court_id and court_id.isdigit():
+                by_court_id[int(court_id)] = point
+            if zip_code:
+                by_zip.setdefault(zip_code.upper(), point)
+            if city:
+                by_city.setdefault((city.lower(), (state or '').lower()), point)
+
+    query = Court.query
+    if not overwrite:
+        query = query.filter(db.or_(Court.latitude.is_(None), Court.longitude.is_(None)))
+
+    updated = unmatched = 0
+    for court in query.all():
+        point = by_court_id.get(court.id)
+        if point is None and court.zip_code:
+            point = by_zip.get(court.zip_code.strip().upper())
+        if point is None and court.city:
+            city_key = court.city.strip().lower()
+            point = by_city.get((city_key, (court.state or '').strip().lower())) or by_city.get((city_key, ''))
+
+        if point is None:
+            unmatched += 1
+            continue
+
+        court.set_coordinates(*point)
+        updated += 1
+
+    db.session.commit()
+    return updated, unmatched
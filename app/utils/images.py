@@ -0,0 +1,139 @@
+# app/utils/images.py
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from PIL import Image, ImageOps
+from app import db
+from app.models.image import ImageVariant
+
+# Bounding boxes, largest first so each variant is downscaled from the previous one
+IMAGE_VARIANTS = (
+    ('full', (1600, 1600)),
+    ('card', (480, 480)),
+    ('thumb', (160, 160)),
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+def variant_path(source_path, variant, fmt):
+    """Stored path of one variant of an uploaded image"""
+    root, _ = os.path.splitext(source_path)
+    return f"{root}_{variant}.{fmt}"
+
+def _save(img, full_path, fmt):
+    if fmt == 'webp':
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+        img.save(full_path, 'WEBP', quality=80, method=4)
+    elif fmt in ('jpg', 'jpeg'):
+        img.convert('RGB').save(full_path, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        img.save(full_path, optimize=True)
+
+def render_variants(upload_folder, source_path):
+    """Write every variant of an uploaded image in WebP and in its original format.
+
+    Runs in a worker process, so it only touches the filesystem. Returns the
+    ImageVariant rows to record, as dicts.
+    """
+    original_format = os.path.splitext(source_path)[1].lstrip('.').lower()
+    formats = ['webp'] if original_format == 'webp' else ['webp', original_format]
+
+    rows = []
+    with Image.open(os.path.join(upload_folder, source_path)) as img:
+        # Let the JPEG decoder downscale by a power of two before anything is resized
+        img.draft('RGB', IMAGE_VARIANTS[0][1])
+        current = ImageOps.exif_transpose(img)
+        if current is img:
+            current = img.copy()
+
+        for variant, size in IMAGE_VARIANTS:
+            current.thumbnail(size, Image.LANCZOS)
+            for fmt in formats:
+                path = variant_path(source_path, variant, fmt)
+                _save(current, os.path.join(upload_folder, path), fmt)
+                rows.append({
+                    'source_path': source_path,
+                    'variant': variant,
+                    'format': fmt,
+                    'path': path,
+                    'width': current.width,
+                    'height': current.height
+                })
+    return rows
+
+def record_variants(source_path, rows):
+    """Replace the recorded variants of an image"""
+    ImageVariant.query.filter_by(source_path=source_path).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(db.insert(ImageVariant), rows)
+
+def _finish(app, source_path, future):
+    with app.app_context():
+        try:
+            record_variants(source_path, future.result())
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning(f"Could not create variants of {source_path}: {str(e)}")
+
+def process_image(source_path):
+    """Queue variant generation for an image saved under UPLOAD_FOLDER.
+
+    Variants are rendered in the image worker pool (IMAGE_WORKERS processes,
+    0 = inline) and recorded once they exist; until then lookups fall back to
+    the original.
+    """
+    app = current_app._get_current_object()
+    upload_folder = app.config['UPLOAD_FOLDER']
+    workers = app.config['IMAGE_WORKERS']
+    if workers:
+        future = _get_pool(workers).submit(render_variants, upload_folder, source_path)
+        future.add_done_callback(lambda f: _finish(app, source_path, f))
+    else:
+        try:
+            record_variants(source_path, render_variants(upload_folder, source_path))
+        except Exception as e:
+            app.logger.warning(f"Could not create variants of {source_path}: {str(e)}")
+
+def delete_variants(source_path):
+    """Remove the variant files and rows of an image (the caller commits)"""
+    variants = ImageVariant.query.filter_by(source_path=source_path).all()
+    for variant in variants:
+        full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], variant.path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+    if variants:
+        ImageVariant.query.filter_by(source_path=source_path).delete(synchronize_session=False)
+
+def load_image_variants(source_paths, fmt='webp'):
+    """Return {source_path: {variant: path}} for many images in one query.
+
+    Images whose variants are not ready yet are missing from the result.
+    """
+    source_paths = {path for path in source_paths if path}
+    if not source_paths:
+        return {}
+
+    rows = db.session.query(
+        ImageVariant.source_path,
+        ImageVariant.variant,
+        ImageVariant.path
+    ).filter(
+        ImageVariant.source_path.in_(source_paths),
+        ImageVariant.format == fmt
+    ).all()
+
+    variants = {}
+    for source_path, variant, path in rows:
+        variants.setdefault(source_path, {})[variant] = path
+    return variants
@@ -0,0 +1,150 @@
+# app/utils/profile_cache.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import db
+from app.models.coach import Coach, CoachImage, CoachProfileVersion
+from app.models.user import User
+from app.models.court import Court, CoachCourt
+from app.models.academy import Academy, AcademyCoach, AcademyCoachRole
+from app.models.rating import CoachRating
+
+PROFILE_CACHE_SIZE = 1024
+# User columns shown on a coach's public profile; other changes (passwords, logins) keep the version
+PROFILE_USER_COLUMNS = ('first_name', 'last_name', 'dupr_rating', 'location', 'profile_picture', 'is_coach')
+
+class ProfileCache:
+    """Small thread-safe LRU of rendered profile payloads keyed by coach id.
+
+    Entries carry the version they were built from, so a bumped version is a miss,
+    and a digest of the payload for its ETag.
+    """
+    def __init__(self, max_size=PROFILE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, coach_id, version):
+        """Return (payload, digest) cached for this version, or None"""
+        with self._lock:
+            entry = self._entries.get(coach_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(coach_id)
+            return entry[1:]
+
+    def set(self, coach_id, version, payload):
+        """Cache payload for this version and return (payload, digest)"""
+        digest = profile_digest(payload)
+        with self._lock:
+            self._entries[coach_id] = (version, payload, digest)
+            self._entries.move_to_end(coach_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return payload, digest
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+profile_cache = ProfileCache()
+
+def get_profile_version(coach_id):
+    """Return the current profile version for a coach (0 if never bumped)"""
+    version = db.session.query(CoachProfileVersion.version).filter(
+        CoachProfileVersion.coach_id == coach_id
+    ).scalar()
+    return version or 0
+
+def profile_digest(payload):
+    """Short hash of a profile payload"""
+    serialized = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(serialized).hexdigest()[:12]
+
+def profile_etag(coach_id, version, digest):
+    # The digest keeps ETags honest if versions ever restart (e.g. the table is reset)
+    return f"coach-{coach_id}-v{version}-{digest}"
+
+def bump_profile_versions(coach_ids, connection):
+    """Increment the profile version of each coach (creating rows as needed)"""
+    coach_ids = sorted(set(coach_ids))
+    if not coach_ids:
+        return
+
+    table = CoachProfileVersion.__table__
+    now = datetime.utcnow()
+    rows = [{'coach_id': coach_id, 'version': 1, 'updated_at': now} for coach_id in coach_ids]
+    increments = {'version': table.c.version + 1, 'updated_at': now}
+
+    # One upsert, so transactions creating the same coach's row concurrently both succeed
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        connection.execute(sqlite.insert(table).values(rows).on_conflict_do_update(
+            index_elements=['coach_id'], set_=increments))
+    elif dialect == 'postgresql':
+        connection.execute(postgresql.insert(table).values(rows).on_conflict_do_update(
+            index_elements=['coach_id'], set_=increments))
+    else:
+        connection.execute(table.update().where(table.c.coach_id.in_(coach_ids)).values(increments))
+        existing = {row[0] for row in connection.execute(
+            db.select(table.c.coach_id).where(table.c.coach_id.in_(coach_ids))
+        )}
+        missing = [row for row in rows if row['coach_id'] not in existing]
+        if missing:
+            connection.execute(table.insert(), missing)
+
+def _profile_user_changed(user):
+    state = inspect(user)
+    return any(state.attrs[column].history.has_changes() for column in PROFILE_USER_COLUMNS)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_profile_changes(session, flush_context):
+    """Record which coach profiles were touched by this flush"""
+    pending = session.info.setdefault('profile_pending', defaultdict(set))
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj in session.dirty and not _profile_user_changed(obj):
+            continue
+        if isinstance(obj, Coach):
+            pending['coaches'].add(obj.id)
+        elif isinstance(obj, (CoachImage, CoachCourt, AcademyCoach, CoachRating)):
+            pending['coaches'].add(obj.coach_id)
+        elif isinstance(obj, User):
+            if obj.is_coach:
+                pending['users'].add(obj.id)
+        elif isinstance(obj, Court):
+            pending['courts'].add(obj.id)
+        elif isinstance(obj, Academy):
+            pending['academies'].add(obj.id)
+        elif isinstance(obj, AcademyCoachRole):
+            # Role names are shown in each coach's academy affiliations
+            pending['roles'].add(obj.id)
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_profile_changes(session, flush_context):
+    """Bump profile versions inside the same transaction as the change"""
+    pending = session.info.pop('profile_pending', None)
+    if not pending:
+        return
+
+    coach_ids = set(pending['coaches'])
+    if pending['users']:
+        coach_ids.update(coach_id for coach_id, in session.query(Coach.id).filter(
+            Coach.user_id.in_(pending['users'])))
+    if pending['courts']:
+        coach_ids.update(coach_id for coach_id, in session.query(CoachCourt.coach_id).filter(
+            CoachCourt.court_id.in_(pending['courts'])))
+    if pending['academies']:
+        coach_ids.update(coach_id for coach_id, in session.query(AcademyCoach.coach_id).filter(
+            AcademyCoach.academy_id.in_(pending['academies'])))
+    if pending['roles']:
+        coach_ids.update(coach_id for coach_id, in session.query(AcademyCoach.coach_id).filter(
+            AcademyCoach.role_id.in_(pending['roles'])))
+
+    coach_ids.discard(None)
+    bump_profile_versions(coach_ids, session.connection())
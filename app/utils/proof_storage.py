@@ -0,0 +1,76 @@
+# app/utils/proof_storage.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from PIL import Image
+from app.utils.file_store import stage_upload, place_blob
+
+PROOF_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
+PROOF_THUMBNAIL_SIZE = (320, 320)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='proof-upload')
+        return _executor
+
+def proof_extension(filename):
+    if filename and '.' in filename:
+        return filename.rsplit('.', 1)[1].lower()
+    return None
+
+def finalize_proof(temp_path, final_path, logger):
+    """Move a staged upload into place, verify it and write a thumbnail.
+
+    Runs in the worker pool, so failures are logged rather than raised.
+    """
+    try:
+        place_blob(temp_path, final_path)
+
+        if final_path.endswith('.pdf'):
+            with open(final_path, 'rb') as f:
+                if f.read(5) != b'%PDF-':
+                    logger.warning(f"Uploaded proof {final_path} is not a valid PDF")
+            return
+
+        with Image.open(final_path) as img:
+            img.verify()
+
+        root, _ = os.path.splitext(final_path)
+        thumbnail = f"{root}_thumb.jpg"
+        if not os.path.exists(thumbnail):
+            with Image.open(final_path) as img:
+                img.draft('RGB', PROOF_THUMBNAIL_SIZE)  # Fast JPEG downscale while decoding
+                thumb = img.convert('RGB')
+                thumb.thumbnail(PROOF_THUMBNAIL_SIZE)
+                thumb.save(thumbnail, 'JPEG', quality=80, optimize=True)
+    except Exception as e:
+        logger.warning(f"Could not finalize uploaded proof {final_path}: {str(e)}")
+
+def store_proof(file, category, references=1):
+    """Stream an uploaded proof into the file store and hand its finalization to the worker pool.
+
+    references is the number of PaymentProof rows about to point at the file.
+    Returns the content-addressed path relative to UPLOAD_FOLDER
+    ('<category>/<ab>/<sha256>.<ext>'), or None if the file type is not accepted.
+    The file appears at that path once a worker has moved it into place.
+    """
+    extension = proof_extension(file.filename)
+    if extension not in PROOF_EXTENSIONS:
+        return None
+
+    relative_path, temp_path = stage_upload(file, category, extension, references)
+    final_path = os.path.join(current_app.config['UPLOAD_FOLDER'], relative_path)
+
+    workers = current_app.config['UPLOAD_WORKERS']
+    if workers:
+        _get_executor(workers).submit(finalize_proof, temp_path, final_path, current_app.logger)
+    else:
+        finalize_proof(temp_path, final_path, current_app.logger)
+
+    return relative_path
@@ -0,0 +1,135 @@
+# app/utils/query_stats.py
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_recorders = threading.local()
+_installed = False
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s)\s*,?)+\)')
+_WHITESPACE = re.compile(r'\s+')
+
+def fingerprint(statement):
+    """The statement with literals, parameters and IN lists collapsed, so the
+    same query issued with different values has the same fingerprint"""
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _PLACEHOLDER_LIST.sub('(?)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+class QueryStats:
+    """Queries run during a request (or a query_budget block): count, time and repeats"""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """(fingerprint, times) for statements run at least threshold times, most repeated first"""
+        return [(statement, times) for statement, times in self.fingerprints.most_common() if times >= threshold]
+
+    def server_timing(self):
+        """Server-Timing header value for the database time"""
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+    def describe(self, limit=3):
+        lines = [f"{self.count} queries in {self.duration * 1000:.1f}ms"]
+        for statement, times in self.fingerprints.most_common(limit):
+            lines.append(f"  {times}x {statement[:200]}")
+        return '\n'.join(lines)
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget when a block runs more queries than it declared"""
+
+def _active_recorders():
+    recorders = list(getattr(_recorders, 'stack', ()))
+    if has_app_context():
+        stats = g.get('query_stats')
+        if stats is not None:
+            recorders.append(stats)
+    return recorders
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start'].pop()
+    recorders = _active_recorders()
+    if recorders:
+        duration = time.perf_counter() - started
+        for stats in recorders:
+            stats.record(statement, duration)
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute, so drop its start time here
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start'):
+        connection.info['query_start'].pop()
+
+def install_query_listeners():
+    """Time every statement on every engine (once per process)"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _installed = True
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail with QueryBudgetExceeded if the block runs more than max_queries statements.
+
+    Counts every statement on the calling thread, including requests made
+    through the Flask test client. Yields the QueryStats being recorded.
+    """
+    install_query_listeners()
+    stats = QueryStats()
+    stack = _recorders.__dict__.setdefault('stack', [])
+    stack.append(stats)
+    try:
+        yield stats
+    finally:
+        stack.remove(stats)
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(f"Query budget of {max_queries} exceeded: {stats.describe()}")
+
+def init_query_stats(app):
+    """Record query counts and time per request when QUERY_STATS_ENABLED is set.
+
+    Adds a Server-Timing header to every response and logs a warning when a
+    statement repeats QUERY_REPEAT_THRESHOLD times in one request (an N+1).
+    """
+    if not app.config.get('QUERY_STATS_ENABLED'):
+        return
+    install_query_listeners()
+    threshold = app.config.get('QUERY_REPEAT_THRESHOLD', 10)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+        response.headers.add('Server-Timing', stats.server_timing())
+        for statement, times in stats.repeated(threshold):
+            app.logger.warning(
+                f"Possible N+1 in {request.endpoint}: statement ran {times} times "
+                f"({stats.count} queries in total): {statement[:300]}"
+            )
+        return response
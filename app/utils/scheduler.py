@@ -2,6 +2,7 @@
 from datetime import datetime
 from app import db
 from app.models.booking import AvailabilityReservation
+from app.utils.file_store import collect_garbage
 
 def cleanup_expired_reservations():
     """Delete expired reservations"""
@@ -15,13 +16,39 @@ def cleanup_expired_reservations():
         db.session.rollback()
         print(f"Error cleaning up reservations: {str(e)}")
 
+def collect_unreferenced_uploads():
+    """Remove uploaded files that no record references any more"""
+    try:
+        removed, orphans = collect_garbage()
+        if removed or orphans:
+            print(f"Upload GC: Removed {removed} unreferenced files and {orphans} orphaned files at {datetime.utcnow()}")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error collecting unreferenced uploads: {str(e)}")
+
+def _with_app_context(scheduler, func):
+    def run():
+        with scheduler.app.app_context():
+            func()
+    return run
+
 def init_scheduler_jobs(scheduler):
     """Initialize scheduled jobs"""
-    # Run cleanup every 5 minutes
+    # Run cleanup every 5 minutes; expired holds already stop counting because
+    # every hold lookup filters on expires_at, so this only removes their rows
     scheduler.add_job(
         id='cleanup_expired_reservations',
-        func=cleanup_expired_reservations,
+        func=_with_app_context(scheduler, cleanup_expired_reservations),
         trigger='interval',
         minutes=5,
         replace_existing=True
-    )
\ No newline at end of file
+    )
+
+    # Remove uploads nothing references any more
+    scheduler.add_job(
+        id='collect_unreferenced_uploads',
+        func=_with_app_context(scheduler, collect_unreferenced_uploads),
+        trigger='interval',
+        hours=1,
+        replace_existing=True
+    )
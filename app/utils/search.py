@@ -0,0 +1,368 @@
+# app/utils/search.py
+import re
+from collections import defaultdict
+from flask import current_app
+from sqlalchemy import event, text, bindparam, Float, Integer
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models.coach import Coach
+from app.models.user import User
+from app.models.court import Court, CoachCourt
+from app.models.tag import Tag, CoachTag
+from app.models.academy import Academy, AcademyCoach, academy_tag
+from app.utils.directory import load_coach_tags, load_academy_affiliations
+
+REINDEX_BATCH_SIZE = 500
+
+# Field order matters: it is the column order of the SQLite FTS5 tables and
+# of the bm25() weights below.
+COACH_FIELDS = ('name', 'tags', 'specialties', 'courts', 'academies', 'location', 'biography')
+COACH_WEIGHTS = (10.0, 4.0, 4.0, 2.0, 2.0, 2.0, 1.0)
+ACADEMY_FIELDS = ('name', 'tags', 'description')
+ACADEMY_WEIGHTS = (10.0, 4.0, 1.0)
+
+# Postgres tsvector weight classes for the same fields
+COACH_PG_WEIGHTS = {'name': 'A', 'tags': 'B', 'specialties': 'B', 'courts': 'C',
+                    'academies': 'C', 'location': 'C', 'biography': 'D'}
+ACADEMY_PG_WEIGHTS = {'name': 'A', 'tags': 'B', 'description': 'D'}
+
+# Engines whose search tables have been checked, mapped to backend name (or None if unavailable)
+_backends = {}
+
+def _search_terms(search_query):
+    """Split free text into lower-cased word tokens safe to embed in a MATCH/tsquery"""
+    return re.findall(r'\w+', (search_query or '').lower())
+
+def _get_backend(session, create=False):
+    """Return 'sqlite', 'postgresql' or None for the session's database.
+
+    The index tables are only created when create=True (search and rebuild paths);
+    flush hooks never issue DDL and simply skip indexing until the index exists.
+    """
+    bind = session.get_bind()
+    engine = getattr(bind, 'engine', bind)
+    key = id(engine)
+    if key in _backends:
+        return _backends[key]
+
+    dialect = engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        _backends[key] = None
+        return None
+
+    if _tables_exist(session.connection(), dialect):
+        _backends[key] = dialect
+        return dialect
+
+    if not create:
+        return None
+
+    try:
+        ensure_search_index(engine)
+    except OperationalError as e:
+        # e.g. SQLite built without FTS5
+        current_app.logger.warning(f"Full-text search unavailable, falling back to LIKE: {str(e)}")
+        _backends[key] = None
+        return None
+
+    _backends[key] = dialect
+    return dialect
+
+def _tables_exist(conn, dialect):
+    if dialect == 'sqlite':
+        return conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'coach_search'"
+        )).first() is not None
+    return conn.execute(text("SELECT to_regclass('coach_search')")).scalar() is not None
+
+def ensure_search_index(engine):
+    """Create the search tables if missing and populate them when newly created"""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if _tables_exist(conn, dialect):
+            return False
+
+        if dialect == 'sqlite':
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE coach_search USING fts5("
+                + ', '.join(COACH_FIELDS)
+                + ", tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            ))
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE academy_search USING fts5("
+                + ', '.join(ACADEMY_FIELDS)
+                + ", tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            ))
+        else:
+            conn.execute(text(
+                "CREATE TABLE coach_search (coach_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX ix_coach_search_document ON coach_search USING GIN (document)"
+            ))
+            conn.execute(text(
+                "CREATE TABLE academy_search (academy_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX ix_academy_search_document ON academy_search USING GIN (document)"
+            ))
+
+        # Populate from existing rows on the same connection/transaction
+        session = Session(bind=conn)
+        try:
+            _index_all(session, conn, dialect)
+        finally:
+            session.close()
+    return True
+
+def _pg_document_sql(fields, weights):
+    """Build a weighted to_tsvector expression over bound parameters named after fields"""
+    parts = [f"setweight(to_tsvector('simple', :{field}), '{weights[field]}')" for field in fields]
+    return ' || '.join(parts)
+
+# Document builders
+
+def _coach_documents(session, coach_ids):
+    """Return {coach_id: {field: text}} for the given coaches in a fixed number of queries"""
+    rows = session.query(
+        Coach.id,
+        User.first_name,
+        User.last_name,
+        User.location,
+        Coach.biography,
+        Coach.specialties
+    ).join(
+        User, Coach.user_id == User.id
+    ).filter(
+        Coach.id.in_(coach_ids)
+    ).all()
+
+    court_rows = session.query(
+        CoachCourt.coach_id,
+        Court.name,
+        Court.city
+    ).join(
+        Court, Court.id == CoachCourt.court_id
+    ).filter(
+        CoachCourt.coach_id.in_(coach_ids)
+    ).all()
+
+    courts_by_coach = defaultdict(list)
+    for coach_id, court_name, city in court_rows:
+        courts_by_coach[coach_id].append(' '.join(filter(None, [court_name, city])))
+
+    tags_by_coach = load_coach_tags(coach_ids, session=session)
+    affiliations_by_coach = load_academy_affiliations(coach_ids, session=session)
+
+    documents = {}
+    for coach_id, first_name, last_name, location, biography, specialties in rows:
+        documents[coach_id] = {
+            'name': f"{first_name} {last_name}",
+            'tags': ' '.join(tag['name'] for tag in tags_by_coach.get(coach_id, [])),
+            'specialties': specialties or '',
+            'courts': ' '.join(courts_by_coach.get(coach_id, [])),
+            'academies': ' '.join(a['name'] for a in affiliations_by_coach.get(coach_id, [])),
+            'location': location or '',
+            'biography': biography or ''
+        }
+    return documents
+
+def _academy_documents(session, academy_ids):
+    """Return {academy_id: {field: text}} for the given academies"""
+    rows = session.query(
+        Academy.id,
+        Academy.name,
+        Academy.description
+    ).filter(
+        Academy.id.in_(academy_ids)
+    ).all()
+
+    tag_rows = session.query(
+        academy_tag.c.academy_id,
+        Tag.name
+    ).join(
+        Tag, Tag.id == academy_tag.c.tag_id
+    ).filter(
+        academy_tag.c.academy_id.in_(academy_ids)
+    ).all()
+
+    tags_by_academy = defaultdict(list)
+    for academy_id, tag_name in tag_rows:
+        tags_by_academy[academy_id].append(tag_name)
+
+    documents = {}
+    for academy_id, name, description in rows:
+        documents[academy_id] = {
+            'name': name or '',
+            'tags': ' '.join(tags_by_academy.get(academy_id, [])),
+            'description': description or ''
+        }
+    return documents
+
+def _write_documents(conn, backend, table, key_column, fields, pg_weights, ids, documents):
+    """Replace the index rows for ids with documents (ids missing from documents are removed)"""
+    if backend == 'sqlite':
+        key_column = 'rowid'
+    conn.execute(
+        text(f"DELETE FROM {table} WHERE {key_column} IN :ids").bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(ids)}
+    )
+    if backend == 'sqlite':
+        if documents:
+            conn.execute(
+                text(f"INSERT INTO {table} (rowid, {', '.join(fields)}) "
+                     f"VALUES (:id, {', '.join(':' + f for f in fields)})"),
+                [dict(document, id=doc_id) for doc_id, document in documents.items()]
+            )
+    else:
+        if documents:
+            conn.execute(
+                text(f"INSERT INTO {table} ({key_column}, document) "
+                     f"VALUES (:id, {_pg_document_sql(fields, pg_weights)})"),
+                [dict(document, id=doc_id) for doc_id, document in documents.items()]
+            )
+
+def _reindex(session, conn, backend, coach_ids=(), academy_ids=()):
+    coach_ids = sorted(set(coach_ids))
+    academy_ids = sorted(set(academy_ids))
+
+    for start in range(0, len(coach_ids), REINDEX_BATCH_SIZE):
+        batch = coach_ids[start:start + REINDEX_BATCH_SIZE]
+        _write_documents(conn, backend, 'coach_search', 'coach_id', COACH_FIELDS,
+                         COACH_PG_WEIGHTS, batch, _coach_documents(session, batch))
+
+    for start in range(0, len(academy_ids), REINDEX_BATCH_SIZE):
+        batch = academy_ids[start:start + REINDEX_BATCH_SIZE]
+        _write_documents(conn, backend, 'academy_search', 'academy_id', ACADEMY_FIELDS,
+                         ACADEMY_PG_WEIGHTS, batch, _academy_documents(session, batch))
+
+def _index_all(session, conn, backend):
+    conn.execute(text("DELETE FROM coach_search"))
+    conn.execute(text("DELETE FROM academy_search"))
+    coach_ids = [coach_id for coach_id, in session.query(Coach.id)]
+    academy_ids = [academy_id for academy_id, in session.query(Academy.id)]
+    _reindex(session, conn, backend, coach_ids, academy_ids)
+    return len(coach_ids), len(academy_ids)
+
+def reindex_coaches(coach_ids, session=None):
+    """Refresh the search documents for the given coaches"""
+    session = session or db.session
+    backend = _get_backend(session)
+    if backend:
+        _reindex(session, session.connection(), backend, coach_ids=coach_ids)
+
+def reindex_academies(academy_ids, session=None):
+    """Refresh the search documents for the given academies"""
+    session = session or db.session
+    backend = _get_backend(session)
+    if backend:
+        _reindex(session, session.connection(), backend, academy_ids=academy_ids)
+
+def rebuild_search_index():
+    """Rebuild the coach and academy search indexes from scratch"""
+    backend = _get_backend(db.session, create=True)
+    if not backend:
+        return None
+
+    counts = _index_all(db.session, db.session.connection(), backend)
+    db.session.commit()
+    return counts
+
+# Queries
+
+def _search_matches(table, key_column, weights, search_query):
+    backend = _get_backend(db.session, create=True)
+    if backend is None:
+        return None
+
+    terms = _search_terms(search_query)
+    if not terms:
+        # Nothing searchable in the text (e.g. only punctuation) matches nothing
+        id_column = 'rowid' if backend == 'sqlite' else key_column
+        sql, params = f"SELECT {id_column} AS {key_column}, 0.0 AS search_rank FROM {table} WHERE 1 = 0", {}
+    elif backend == 'sqlite':
+        # LIMIT -1 (no limit) stops SQLite flattening the subquery into the joining
+        # query, where bm25() can no longer see the MATCH it ranks
+        sql = (f"SELECT rowid AS {key_column}, bm25({table}, {', '.join(str(w) for w in weights)}) AS search_rank "
+               f"FROM {table} WHERE {table} MATCH :{table}_match LIMIT -1")
+        params = {f'{table}_match': ' '.join(f'"{term}"*' for term in terms)}
+    else:
+        # ts_rank is higher for better matches; negate it so both backends sort ascending
+        sql = (f"SELECT {key_column}, -ts_rank(document, query) AS search_rank "
+               f"FROM {table}, to_tsquery('simple', :{table}_tsquery) AS query WHERE document @@ query")
+        params = {f'{table}_tsquery': ' & '.join(f'{term}:*' for term in terms)}
+
+    return text(sql).bindparams(**params).columns(
+        **{key_column: Integer, 'search_rank': Float}
+    ).subquery(f'{table}_matches')
+
+def coach_search_matches(search_query):
+    """Subquery of (coach_id, search_rank) for every coach matching search_query.
+
+    Lower search_rank is a better match. Join it to Coach.id so other filters,
+    sorting and pagination run over the whole match set in the database.
+    Returns None when no full-text backend is available so callers can fall back to LIKE.
+    """
+    return _search_matches('coach_search', 'coach_id', COACH_WEIGHTS, search_query)
+
+def academy_search_matches(search_query):
+    """Subquery of (academy_id, search_rank) for matching academies (None if unavailable)"""
+    return _search_matches('academy_search', 'academy_id', ACADEMY_WEIGHTS, search_query)
+
+# Incremental index maintenance
+
+def _attribute_changed(obj, *names):
+    state = db.inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in names)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_search_changes(session, flush_context):
+    """Record which coaches/academies were touched by this flush"""
+    pending = session.info.setdefault('search_pending', defaultdict(set))
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Coach):
+            pending['coaches'].add(obj.id)
+        elif isinstance(obj, (CoachTag, CoachCourt, AcademyCoach)):
+            pending['coaches'].add(obj.coach_id)
+        elif isinstance(obj, User):
+            if obj.is_coach and _attribute_changed(obj, 'first_name', 'last_name', 'location'):
+                pending['users'].add(obj.id)
+        elif isinstance(obj, Tag):
+            if _attribute_changed(obj, 'name'):
+                pending['tags'].add(obj.id)
+        elif isinstance(obj, Court):
+            if _attribute_changed(obj, 'name', 'city'):
+                pending['courts'].add(obj.id)
+        elif isinstance(obj, Academy):
+            pending['academies'].add(obj.id)
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_search_changes(session, flush_context):
+    """Reindex touched documents inside the same transaction as the change"""
+    pending = session.info.pop('search_pending', None)
+    if not pending or _get_backend(session) is None:
+        return
+
+    coach_ids = set(pending['coaches'])
+    academy_ids = set(pending['academies'])
+
+    if pending['users']:
+        coach_ids.update(coach_id for coach_id, in session.query(Coach.id).filter(
+            Coach.user_id.in_(pending['users'])))
+    if pending['tags']:
+        coach_ids.update(coach_id for coach_id, in session.query(CoachTag.coach_id).filter(
+            CoachTag.tag_id.in_(pending['tags'])))
+        academy_ids.update(academy_id for academy_id, in session.query(academy_tag.c.academy_id).filter(
+            academy_tag.c.tag_id.in_(pending['tags'])))
+    if pending['courts']:
+        coach_ids.update(coach_id for coach_id, in session.query(CoachCourt.coach_id).filter(
+            CoachCourt.court_id.in_(pending['courts'])))
+    if pending['academies']:
+        coach_ids.update(coach_id for coach_id, in session.query(AcademyCoach.coach_id).filter(
+            AcademyCoach.academy_id.in_(pending['academies'])))
+
+    coach_ids.discard(None)
+    academy_ids.discard(None)
+    _reindex(session, session.connection(), _get_backend(session), coach_ids, academy_ids)
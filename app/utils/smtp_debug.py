@@ -0,0 +1,104 @@
+# app/utils/smtp_debug.py
+import socketserver
+import threading
+from collections import namedtuple
+from email import message_from_bytes, policy
+
+ReceivedEmail = namedtuple('ReceivedEmail', ['sender', 'recipients', 'message', 'connection_id'])
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP and QUIT"""
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            connection_id = server.connections
+
+        sender, recipients = None, []
+        self.reply('220 localhost debugging SMTP server')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip().split()[0].strip('<>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip().split()[0].strip('<>')
+                if recipient in server.reject:
+                    self.reply('550 No such user')
+                elif recipient in server.defer:
+                    self.reply('451 Try again later')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                email = ReceivedEmail(
+                    sender, recipients,
+                    message_from_bytes(b''.join(data), policy=policy.default),
+                    connection_id
+                )
+                with server.lock:
+                    server.messages.append(email)
+                if server.echo:
+                    print(f"---------- Message from {sender} to {', '.join(recipients)} ----------")
+                    print(email.message.as_string())
+                sender, recipients = None, []
+                self.reply('250 OK: queued')
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    """Local SMTP stand-in that accepts every message and keeps it in memory.
+
+    Point MAIL_SERVER/MAIL_PORT at it (with MAIL_USE_TLS off) to see what the
+    outbox workers send. Addresses in reject are refused with a 550 and those
+    in defer with a 451, and connections counts the SMTP sessions opened, to
+    check connection reuse.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 1025), echo=False, reject=(), defer=()):
+        super().__init__(address, _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.reject = set(reject)
+        self.defer = set(defer)
+        self.echo = echo
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve on a background thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
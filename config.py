@@ -15,8 +15,20 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static/uploads')
     PROFILE_PICS_FOLDER = os.path.join(UPLOAD_FOLDER, 'profile_pics')
     SHOWCASE_IMAGES_FOLDER = os.path.join(UPLOAD_FOLDER, 'showcase_images')
+    PROFILE_PICS_DIR = PROFILE_PICS_FOLDER
+    SHOWCASE_IMAGES_DIR = SHOWCASE_IMAGES_FOLDER
+    PAYMENT_QR_DIR = os.path.join(UPLOAD_FOLDER, 'payment_qr')
+    ACADEMY_LOGOS_DIR = os.path.join(UPLOAD_FOLDER, 'academy_logos')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload size
+    UPLOAD_CHUNK_SIZE = 64 * 1024  # Payment proofs are streamed to disk in chunks of this size
+    UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 2))  # 0 finalizes proofs on the request thread
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))  # Processes rendering image variants, 0 renders inline
+
+    # Hand upload bytes to the front server: X-Sendfile (Apache, lighttpd) or an
+    # nginx internal location aliased to UPLOAD_FOLDER, e.g. '/protected-uploads'
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'false').lower() in ['true', 'on', '1']
+    UPLOADS_ACCEL_REDIRECT_PREFIX = os.environ.get('UPLOADS_ACCEL_REDIRECT_PREFIX')
 
    # Email configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.example.com')
@@ -25,6 +37,17 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@pickleballconnect.com')
+
+    # Email outbox delivery
+    EMAIL_WORKERS = int(os.environ.get('EMAIL_WORKERS', 2))  # Each keeps one SMTP connection open
+    EMAIL_BATCH_SIZE = 20
+    EMAIL_POLL_SECONDS = 5
+    EMAIL_SMTP_IDLE_SECONDS = 60
+
+    # Per-request query count and DB time in a Server-Timing header, with a warning
+    # logged when one statement repeats this many times in a request (an N+1)
+    QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'false').lower() in ['true', 'on', '1']
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 10))
     
     # Payment proof upload directory
     PAYMENT_PROOFS_DIR = os.path.join(UPLOAD_FOLDER, '/payment_proofs')
\ No newline at end of file
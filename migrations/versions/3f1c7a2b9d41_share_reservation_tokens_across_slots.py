@@ -0,0 +1,56 @@
+"""share reservation tokens across the slots of one checkout
+
+Revision ID: 3f1c7a2b9d41
+Revises:
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c7a2b9d41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _reservation_table(token_unique):
+    """availability_reservation as it is before (token_unique) or after this revision"""
+    return sa.Table(
+        'availability_reservation', sa.MetaData(),
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('availability_id', sa.Integer(), sa.ForeignKey('availability.id'), nullable=False),
+        sa.Column('student_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('reservation_token', sa.String(length=64), nullable=False, unique=token_unique),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('availability_id', name='unique_availability_reservation')
+    )
+
+
+def upgrade():
+    # One reservation token now covers every slot held by a checkout. SQLite created the
+    # token's UNIQUE constraint without a name, so the table is rebuilt without it there
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('availability_reservation', recreate='always',
+                                  copy_from=_reservation_table(token_unique=False)) as batch_op:
+            batch_op.create_index('ix_availability_reservation_reservation_token', ['reservation_token'], unique=False)
+    else:
+        op.drop_constraint('availability_reservation_reservation_token_key', 'availability_reservation', type_='unique')
+        op.create_index('ix_availability_reservation_reservation_token', 'availability_reservation',
+                        ['reservation_token'], unique=False)
+
+
+def downgrade():
+    # Holds sharing a token cannot satisfy the old constraint; they expire within minutes anyway
+    op.execute(sa.text('DELETE FROM availability_reservation'))
+    op.drop_index('ix_availability_reservation_reservation_token', table_name='availability_reservation')
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('availability_reservation', recreate='always',
+                                  copy_from=_reservation_table(token_unique=True)):
+            pass
+    else:
+        op.create_unique_constraint('availability_reservation_reservation_token_key',
+                                    'availability_reservation', ['reservation_token'])
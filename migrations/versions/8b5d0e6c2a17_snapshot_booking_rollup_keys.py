@@ -0,0 +1,76 @@
+"""snapshot discount type and academy on bookings and key the rollup on them
+
+Revision ID: 8b5d0e6c2a17
+Revises: 3f1c7a2b9d41
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b5d0e6c2a17'
+down_revision = '3f1c7a2b9d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('booking', sa.Column('discount_type', sa.String(length=20), nullable=True))
+    op.add_column('booking', sa.Column('academy_id', sa.Integer(), nullable=True))
+
+    # Existing bookings take their plan's current type and their coach's current academy
+    op.execute(sa.text("""
+        UPDATE booking SET discount_type = COALESCE(
+            (SELECT pricing_plan.discount_type FROM pricing_plan WHERE pricing_plan.id = booking.pricing_plan_id),
+            'regular'
+        )
+    """))
+    op.execute(sa.text("""
+        UPDATE booking SET academy_id = (
+            SELECT MIN(academy_coach.academy_id) FROM academy_coach
+            WHERE academy_coach.coach_id = booking.coach_id AND academy_coach.is_active = :active
+        )
+    """).bindparams(active=True))
+
+    # The rollup only holds derived totals, so it is rebuilt with the new key
+    op.execute(sa.text('DROP TABLE IF EXISTS booking_daily_rollup'))
+    op.create_table(
+        'booking_daily_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('coach_id', sa.Integer(), nullable=False),
+        sa.Column('court_id', sa.Integer(), nullable=False),
+        sa.Column('academy_id', sa.Integer(), nullable=False),
+        sa.Column('discount_type', sa.String(length=20), nullable=False),
+        sa.Column('sessions', sa.Integer(), nullable=False),
+        sa.Column('gross', sa.Float(), nullable=False),
+        sa.Column('coach_fees', sa.Float(), nullable=False),
+        sa.Column('court_fees', sa.Float(), nullable=False),
+        sa.Column('discounts', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['coach_id'], ['coach.id']),
+        sa.ForeignKeyConstraint(['court_id'], ['court.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('date', 'coach_id', 'court_id', 'academy_id', 'discount_type', name='unique_booking_rollup_key')
+    )
+    op.create_index('ix_booking_rollup_coach_date', 'booking_daily_rollup', ['coach_id', 'date'], unique=False)
+    op.execute(sa.text("""
+        INSERT INTO booking_daily_rollup
+            (date, coach_id, court_id, academy_id, discount_type,
+             sessions, gross, coach_fees, court_fees, discounts, updated_at)
+        SELECT date, coach_id, court_id, COALESCE(academy_id, 0), discount_type,
+               COUNT(id), SUM(price), SUM(coach_fee), SUM(court_fee), SUM(COALESCE(discount_amount, 0)),
+               CURRENT_TIMESTAMP
+        FROM booking
+        WHERE status = 'completed'
+        GROUP BY date, coach_id, court_id, COALESCE(academy_id, 0), discount_type
+    """))
+
+
+def downgrade():
+    # The rollup keeps this shape; run 'flask rollup rebuild' with the previous code to refill it
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.drop_column('academy_id')
+        batch_op.drop_column('discount_type')
@@ -7,7 +7,8 @@ from app.models.coach import Coach, CoachImage
 from app.models.court import Court, CoachCourt
 from app.models.booking import Booking, Availability
 from app.models.session_log import SessionLog
-from app.models.rating import CoachRating
+from app.models.rating import CoachRating, CoachRatingSummary
+from app.models.booking_rollup import BookingDailyRollup
 from app.models.pricing import PricingPlan
 from app.models.package import BookingPackage, booking_package_association
 from app.models.court_fee import CourtFee 
@@ -1411,6 +1412,11 @@ def seed_database():
         #         with open(filepath, 'w') as f:
         #             f.write('Placeholder for showcase image')
         
+        # The bulk deletes above skip the mapper events that keep these tables in step
+        print("Rebuilding rating summaries and booking rollup...")
+        CoachRatingSummary.rebuild()
+        BookingDailyRollup.rebuild()
+        
         print("Database seeded successfully!")
 
 if __name__ == "__main__":
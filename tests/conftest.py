@@ -0,0 +1,76 @@
+# tests/conftest.py
+import pytest
+from flask import g
+from config import Config
+from app import create_app, db as _db
+from app.models.user import User
+from app.models.coach import Coach
+from app.utils.search import rebuild_search_index
+from app.utils.query_stats import query_budget
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SCHEDULER_API_ENABLED = False
+    EMAIL_WORKERS = 0
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    TestConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path_factory.mktemp('db') / 'test.db')
+    return create_app(TestConfig)
+
+@pytest.fixture
+def db(app):
+    """A fresh app context and set of tables for each test"""
+    with app.app_context():
+        _db.create_all()
+        # The full-text tables live outside the models' metadata, so drop_all leaves them
+        rebuild_search_index()
+        yield _db
+        _db.session.remove()
+        _db.drop_all()
+
+@pytest.fixture
+def make_coach(db):
+    """Create a coach (and their user) with the given coach attributes"""
+    created = []
+
+    def make(first_name=None, **attrs):
+        number = len(created) + 1
+        user = User(
+            first_name=first_name or f'Coach{number}',
+            last_name='Test',
+            email=f'coach{number}@example.com',
+            is_coach=True
+        )
+        db.session.add(user)
+        db.session.flush()
+        attrs.setdefault('hourly_rate', 50 + number)
+        coach = Coach(user_id=user.id, **attrs)
+        db.session.add(coach)
+        db.session.flush()
+        created.append(coach)
+        return coach
+
+    return make
+
+@pytest.fixture
+def login(client):
+    """Call login(user) to sign the test client in as user"""
+    def sign_in(user):
+        # Requests share the test's app context, so forget any user already loaded
+        g.pop('_login_user', None)
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+    return sign_in
+
+@pytest.fixture
+def assert_query_budget():
+    """query_budget as a fixture:
+
+        def test_coach_bookings(client, assert_query_budget):
+            with assert_query_budget(5):
+                client.get('/api/coach/bookings/upcoming')
+    """
+    return query_budget
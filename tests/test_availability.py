@@ -0,0 +1,33 @@
+# tests/test_availability.py
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app.models.court import Court
+from app.models.booking import Availability
+
+@pytest.fixture
+def coach(db, make_coach, login):
+    coach = make_coach()
+    court = Court(name='Court')
+    db.session.add(court)
+    db.session.commit()
+    login(coach.user)
+    return coach
+
+def _slots(court_id):
+    return [{'court_id': court_id, 'date': '2030-01-07', 'start_time': f'{hour:02d}:00', 'end_time': f'{hour + 1:02d}:00'}
+            for hour in (9, 10)]
+
+def test_bulk_availability_creates_slots(client, coach):
+    court_id = Court.query.one().id
+    response = client.post('/api/coach/availability/add-bulk', json={'slots': _slots(court_id)})
+    assert response.status_code == 200
+    assert response.get_json()['created_count'] == 2
+    assert Availability.query.filter_by(coach_id=coach.id).count() == 2
+
+def test_bulk_availability_race_returns_409(client, coach, monkeypatch):
+    def concurrent_insert(rows):
+        raise IntegrityError('INSERT INTO availability', {}, Exception('UNIQUE constraint failed'))
+    monkeypatch.setattr('app.routes.api.bulk_insert_availability', concurrent_insert)
+
+    response = client.post('/api/coach/availability/add-bulk', json={'slots': _slots(Court.query.one().id)})
+    assert response.status_code == 409
@@ -0,0 +1,63 @@
+# tests/test_booking_rollup.py
+from datetime import date, time
+from app.models.user import User
+from app.models.court import Court
+from app.models.pricing import PricingPlan
+from app.models.academy import Academy, AcademyCoach
+from app.models.booking import Availability, Booking
+from app.models.booking_rollup import BookingDailyRollup
+
+def _rollup(db):
+    return {
+        (row.academy_id, row.discount_type): (row.sessions, row.gross)
+        for row in BookingDailyRollup.query.order_by(BookingDailyRollup.id)
+    }
+
+def test_removal_hits_the_row_its_addition_created(db, make_coach):
+    coach = make_coach()
+    court = Court(name='Court')
+    student = User(first_name='Student', last_name='Test', email='student@example.com')
+    plan = PricingPlan(coach_id=coach.id, name='Ten pack', discount_type='package')
+    academies = [Academy(name='First', private_url_code='first'), Academy(name='Second', private_url_code='second')]
+    db.session.add_all([court, student, plan] + academies)
+    db.session.flush()
+    membership = AcademyCoach(coach_id=coach.id, academy_id=academies[0].id)
+    db.session.add(membership)
+    db.session.flush()
+    first, second = academies[0].id, academies[1].id
+
+    bookings = []
+    for hour in (9, 10):
+        slot = Availability(coach_id=coach.id, court_id=court.id, date=date(2030, 1, 7),
+                            start_time=time(hour), end_time=time(hour + 1))
+        db.session.add(slot)
+        db.session.flush()
+        bookings.append(Booking(
+            student_id=student.id, coach_id=coach.id, court_id=court.id, availability_id=slot.id,
+            date=slot.date, start_time=slot.start_time, end_time=slot.end_time,
+            base_price=60.0, price=50.0, coach_fee=40.0, court_fee=10.0, status='completed',
+            pricing_plan_id=plan.id
+        ))
+    db.session.add_all(bookings)
+    db.session.commit()
+    assert (bookings[0].discount_type, bookings[0].academy_id) == ('package', first)
+    assert _rollup(db) == {(first, 'package'): (2, 100.0)}
+
+    # Neither the plan's type nor the coach's academy moves existing bookings
+    plan.discount_type = 'seasonal'
+    membership.is_active = False
+    db.session.add(AcademyCoach(coach_id=coach.id, academy_id=second))
+    db.session.commit()
+
+    bookings[0].status = 'cancelled'
+    db.session.commit()
+    assert _rollup(db) == {(first, 'package'): (1, 50.0)}
+
+    BookingDailyRollup.rebuild()
+    assert _rollup(db) == {(first, 'package'): (1, 50.0)}
+
+    # Attaching a different plan re-records the type
+    bookings[1].pricing_plan_id = None
+    db.session.commit()
+    assert bookings[1].discount_type == 'regular'
+    assert _rollup(db) == {(first, 'package'): (0, 0.0), (first, 'regular'): (1, 50.0)}
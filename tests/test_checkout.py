@@ -0,0 +1,150 @@
+# tests/test_checkout.py
+import io
+import json
+from datetime import date, time
+import pytest
+from app.models.user import User
+from app.models.court import Court
+from app.models.court_fee import CourtFee
+from app.models.booking import Availability, Booking, BookingCheckout
+from app.models.package import BookingPackage
+from app.models.pricing import PricingPlan
+
+@pytest.fixture
+def checkout_setup(app, db, make_coach, tmp_path, monkeypatch):
+    """A coach with three slots at one court (with a $20 morning fee band) and a student"""
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    coach = make_coach(hourly_rate=50.0)
+    court = Court(name='Court')
+    student = User(first_name='Student', last_name='Test', email='student@example.com')
+    db.session.add_all([court, student])
+    db.session.flush()
+    db.session.add(CourtFee(court_id=court.id, start_time=time(8), end_time=time(11, 59), fee=20.0))
+    slots = [
+        Availability(coach_id=coach.id, court_id=court.id, date=date(2030, 1, 7),
+                     start_time=time(hour), end_time=time(hour + 1))
+        for hour in (9, 10, 11)
+    ]
+    db.session.add_all(slots)
+    db.session.commit()
+    return {'coach': coach, 'court': court, 'student': student, 'slot_ids': [slot.id for slot in slots]}
+
+def reserve(client, slot_ids):
+    response = client.post('/booking/api/reserve-slots', json={'availability_ids': slot_ids})
+    assert response.status_code == 200
+    return response.get_json()['reservation_token']
+
+def checkout(client, token, items, idempotency_key=None, proofs=True):
+    data = {'reservation_token': token, 'bookings': json.dumps(items)}
+    if proofs:
+        data['coach_payment_proof'] = (io.BytesIO(b'%PDF-1.4 coach'), 'coach.pdf')
+        data['court_booking_proof'] = (io.BytesIO(b'%PDF-1.4 court'), 'court.pdf')
+    headers = {'Idempotency-Key': idempotency_key} if idempotency_key else {}
+    return client.post('/booking/api/bookings/create-with-proofs', data=data, headers=headers,
+                       content_type='multipart/form-data')
+
+def test_duplicate_availability_ids_are_rejected(client, login, checkout_setup):
+    slot_ids = checkout_setup['slot_ids']
+    login(checkout_setup['student'])
+    token = reserve(client, slot_ids[:2])
+
+    for items in ([{'availability_ids': [slot_ids[0], slot_ids[0]]}],
+                  [{'availability_ids': [slot_ids[0]]}, {'availability_ids': [slot_ids[0], slot_ids[1]]}]):
+        response = checkout(client, token, items)
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Each availability slot can only be booked once'}
+    assert Booking.query.count() == 0
+
+def test_coach_and_court_come_from_the_slots(client, login, checkout_setup):
+    slot_ids = checkout_setup['slot_ids']
+    login(checkout_setup['student'])
+    token = reserve(client, slot_ids[:2])
+
+    # No court_id or coach_id in the payload: the locked slots say where the bookings are
+    response = checkout(client, token, [{'availability_ids': slot_ids[:2]}])
+    assert response.status_code == 200
+    assert [(b['coach_fee'], b['court_fee'], b['price']) for b in response.get_json()['bookings']] == [(50.0, 20.0, 70.0)] * 2
+    assert {(b.coach_id, b.court_id) for b in Booking.query} == {(checkout_setup['coach'].id, checkout_setup['court'].id)}
+
+def test_unexpected_errors_are_not_echoed(client, login, checkout_setup, monkeypatch):
+    from app.routes import bookings
+    slot_ids = checkout_setup['slot_ids']
+    login(checkout_setup['student'])
+    token = reserve(client, slot_ids[:1])
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('INSERT INTO booking secret parameters')
+    monkeypatch.setattr(bookings, 'insert_bookings', broken)
+
+    response = checkout(client, token, [{'availability_ids': slot_ids[:1]}])
+    assert response.status_code == 500
+    assert 'INSERT' not in response.get_data(as_text=True)
+
+def test_retried_checkout_replays_the_first_response(client, login, checkout_setup):
+    slot_ids = checkout_setup['slot_ids']
+    login(checkout_setup['student'])
+    token = reserve(client, slot_ids[:2])
+    items = [{'availability_ids': slot_ids[:2]}]
+
+    first = checkout(client, token, items, idempotency_key='retry-me')
+    assert first.status_code == 200
+    retry = checkout(client, token, items, idempotency_key='retry-me')
+    assert retry.status_code == 200
+    assert retry.get_json() == first.get_json()
+    assert Booking.query.count() == 2
+
+def test_checkout_already_in_progress(client, db, login, checkout_setup):
+    slot_ids = checkout_setup['slot_ids']
+    login(checkout_setup['student'])
+    token = reserve(client, slot_ids[:1])
+    # Claimed by a request that has not finished yet
+    db.session.add(BookingCheckout(student_id=checkout_setup['student'].id, idempotency_key='in-flight'))
+    db.session.commit()
+
+    response = checkout(client, token, [{'availability_ids': slot_ids[:1]}], idempotency_key='in-flight')
+    assert response.status_code == 409
+    assert response.get_json()['code'] == 'CHECKOUT_IN_PROGRESS'
+    assert Booking.query.count() == 0
+
+def test_unreserved_and_booked_slots(client, db, login, checkout_setup):
+    slot_ids = checkout_setup['slot_ids']
+    login(checkout_setup['student'])
+    token = reserve(client, slot_ids[:1])
+
+    response = checkout(client, token, [{'availability_ids': slot_ids[:2]}])
+    assert response.get_json()['code'] == 'RESERVATION_EXPIRED'
+
+    db.session.get(Availability, slot_ids[0]).is_booked = True
+    db.session.commit()
+    response = checkout(client, token, [{'availability_ids': slot_ids[:1]}])
+    assert response.status_code == 409
+    assert response.get_json()['code'] == 'SLOT_UNAVAILABLE'
+    assert response.get_json()['availability_ids'] == slot_ids[:1]
+    assert Booking.query.count() == 0
+
+def test_package_covers_coaching(client, db, login, checkout_setup):
+    coach, student, slot_ids = checkout_setup['coach'], checkout_setup['student'], checkout_setup['slot_ids']
+    plan = PricingPlan(coach_id=coach.id, name='Five pack', discount_type='package', sessions_required=5)
+    db.session.add(plan)
+    db.session.flush()
+    package = BookingPackage(
+        student_id=student.id, coach_id=coach.id, pricing_plan_id=plan.id, total_sessions=5,
+        sessions_booked=3, total_price=200.0, original_price=250.0, status='active'
+    )
+    db.session.add(package)
+    db.session.commit()
+    login(student)
+
+    token = reserve(client, slot_ids)
+    response = checkout(client, token, [{'availability_ids': slot_ids, 'package_id': package.id}])
+    assert 'Not enough sessions remaining' in response.get_json()['error']
+
+    token = reserve(client, slot_ids[:2])
+    response = checkout(client, token, [{'availability_ids': slot_ids[:2], 'package_id': package.id}])
+    assert response.status_code == 200
+    # Only the court is paid for; the package covers the coaching
+    assert [booking['price'] for booking in response.get_json()['bookings']] == [20.0, 20.0]
+    db.session.refresh(package)
+    assert package.sessions_booked == 5
+    assert {b.coaching_payment_required for b in Booking.query} == {False}
+    assert len(package.bookings) == 2
@@ -0,0 +1,50 @@
+# tests/test_coach_bookings.py
+from datetime import date, time, timedelta
+from app.models.user import User
+from app.models.court import Court
+from app.models.booking import Availability, Booking
+from app.models.payment import PaymentProof
+from app.models.session_log import SessionLog
+
+def _add_bookings(db, coach, court, count, start_day):
+    for i in range(count):
+        student = User(first_name='Student', last_name=str(i), email=f'student{start_day.toordinal()}-{i}@example.com')
+        slot = Availability(coach_id=coach.id, court_id=court.id, date=start_day + timedelta(days=i),
+                            start_time=time(9), end_time=time(10), is_booked=True)
+        db.session.add_all([student, slot])
+        db.session.flush()
+        booking = Booking(
+            student_id=student.id, coach_id=coach.id, court_id=court.id, availability_id=slot.id,
+            date=slot.date, start_time=slot.start_time, end_time=slot.end_time,
+            base_price=60.0, price=60.0, coach_fee=50.0, court_fee=10.0
+        )
+        db.session.add(booking)
+        db.session.flush()
+        db.session.add_all([
+            PaymentProof(booking_id=booking.id, image_path='proof.png', proof_type='coaching'),
+            PaymentProof(booking_id=booking.id, image_path='court.png', proof_type='court'),
+            SessionLog(booking_id=booking.id, coach_id=coach.id, student_id=student.id, notes='Plan')
+        ])
+    db.session.commit()
+
+def test_upcoming_bookings_within_query_budget(client, db, make_coach, login, assert_query_budget):
+    coach = make_coach()
+    court = Court(name='Court')
+    db.session.add(court)
+    db.session.flush()
+    _add_bookings(db, coach, court, 2, date.today() + timedelta(days=1))
+    login(coach.user)
+
+    with assert_query_budget(4) as few:
+        response = client.get('/api/coach/bookings/upcoming')
+    assert len(response.get_json()) == 2
+
+    _add_bookings(db, coach, court, 10, date.today() + timedelta(days=10))
+    login(coach.user)
+    with assert_query_budget(4) as many:
+        response = client.get('/api/coach/bookings/upcoming')
+    bookings = response.get_json()
+    assert len(bookings) == 12
+    assert many.count == few.count
+    assert bookings[0]['payment_proof'] == 'proof.png'
+    assert bookings[0]['court_booking_proof'] == 'court.png'
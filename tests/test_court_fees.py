@@ -0,0 +1,55 @@
+# tests/test_court_fees.py
+from datetime import time
+from app.models.court import Court
+from app.models.court_fee import CourtFee
+from app.utils.court_fees import CourtFeeCache, CourtFeeTable, FeeBand
+from app.utils.query_stats import query_budget
+
+def _table():
+    return CourtFeeTable([
+        FeeBand(time(8, 0), time(11, 59), 10.0),
+        FeeBand(time(12, 0), time(15, 59), 20.0),
+        FeeBand(time(18, 0), time(21, 59), 30.0)
+    ])
+
+def test_slot_inside_one_band_pays_the_flat_fee():
+    table = _table()
+    assert table.fee_for_slot(time(9, 0), time(10, 0)) == 10.0
+    assert table.fee_for_slot(time(9, 0), time(9, 30)) == 10.0
+    assert table.fee_for_slot(time(11, 0), time(12, 0)) == 10.0
+    assert table.fee_for_slot(time(12, 0), time(13, 0)) == 20.0
+
+def test_slot_crossing_a_band_edge_is_split():
+    assert _table().fee_for_slot(time(11, 30), time(12, 30)) == 15.0
+
+def test_uncovered_time_is_free():
+    table = _table()
+    assert table.fee_for_slot(time(16, 0), time(17, 0)) == 0.0
+    assert table.fee_for_slot(time(17, 30), time(18, 30)) == 15.0
+    assert table.fee_at(time(23, 0)) == 0.0
+
+def test_cache_sees_changes_made_by_other_processes(db):
+    court = Court(name='Court')
+    db.session.add(court)
+    db.session.flush()
+    fee = CourtFee(court_id=court.id, start_time=time(8, 0), end_time=time(11, 59), fee=10.0)
+    db.session.add(fee)
+    db.session.commit()
+
+    # Another worker's cache, which none of the edits below go through
+    cache = CourtFeeCache()
+    assert cache.get_many([court.id])[court.id].fee_for_slot(time(9, 0), time(10, 0)) == 10.0
+    with query_budget(1):
+        cache.get_many([court.id])
+
+    fee.fee = 12.0
+    db.session.commit()
+    assert cache.get_many([court.id])[court.id].fee_for_slot(time(9, 0), time(10, 0)) == 12.0
+
+    db.session.add(CourtFee(court_id=court.id, start_time=time(18, 0), end_time=time(21, 59), fee=30.0))
+    db.session.commit()
+    assert cache.get_many([court.id])[court.id].fee_at(time(20, 0)) == 30.0
+
+    db.session.delete(fee)
+    db.session.commit()
+    assert cache.get_many([court.id])[court.id].fee_at(time(9, 0)) == 0.0
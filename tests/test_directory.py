@@ -0,0 +1,62 @@
+# tests/test_directory.py
+import pytest
+from app.models.court import Court, CoachCourt
+from app.models.tag import Tag, CoachTag
+from app.models.academy import Academy, AcademyCoach, AcademyCoachRole
+from app.utils.directory import load_directory_relations
+from app.utils.query_stats import query_budget
+
+@pytest.fixture
+def add_directory_coaches(db, make_coach):
+    """Add coaches with two courts, two tags and an academy affiliation each"""
+    courts = [Court(name='North'), Court(name='South')]
+    tags = [Tag(name='drills'), Tag(name='strategy')]
+    academy = Academy(name='Academy', private_url_code='academy')
+    role = AcademyCoachRole(name='Head Coach', ordering=1)
+    db.session.add_all(courts + tags + [academy, role])
+    db.session.flush()
+
+    def add(count):
+        coaches = []
+        for i in range(count):
+            coach = make_coach(years_experience=i)
+            for court in courts:
+                db.session.add(CoachCourt(coach_id=coach.id, court_id=court.id))
+            for tag in tags:
+                db.session.add(CoachTag(coach_id=coach.id, tag_id=tag.id))
+            db.session.add(AcademyCoach(
+                coach_id=coach.id, academy_id=academy.id, role_id=role.id if i % 2 else None
+            ))
+            coaches.append(coach)
+        db.session.commit()
+        return coaches
+
+    return add
+
+def test_load_directory_relations_is_three_queries(add_directory_coaches):
+    coach_ids = [coach.id for coach in add_directory_coaches(10)]
+
+    with query_budget(3) as stats:
+        courts, tags, affiliations = load_directory_relations(coach_ids)
+
+    assert stats.count == 3
+    assert courts[coach_ids[0]] == ['North', 'South']
+    assert [tag['name'] for tag in tags[coach_ids[0]]] == ['drills', 'strategy']
+    assert affiliations[coach_ids[0]][0]['role'] == 'Coach'
+    assert affiliations[coach_ids[1]][0]['role'] == 'Head Coach'
+
+def test_get_coaches_query_count_does_not_grow_with_coaches(client, add_directory_coaches):
+    add_directory_coaches(3)
+    with query_budget(50) as few:
+        response = client.get('/public/api/coaches')
+    assert len(response.get_json()['coaches']) == 3
+
+    add_directory_coaches(20)
+    with query_budget(50) as many:
+        response = client.get('/public/api/coaches')
+    coaches = response.get_json()['coaches']
+    assert len(coaches) == 23
+
+    assert many.count == few.count
+    assert coaches[0]['courts'] == ['North', 'South']
+    assert coaches[0]['academy_affiliations'][0]['name'] == 'Academy'
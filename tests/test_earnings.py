@@ -0,0 +1,136 @@
+# tests/test_earnings.py
+import calendar
+from datetime import time
+import pytest
+from app.models.user import User
+from app.models.court import Court
+from app.models.booking import Availability, Booking
+from app.routes import admin as admin_routes
+from app.utils.earnings import EarningsReport, month_starts, previous_month
+
+THIS_MONTH = month_starts(1)[0]
+LAST_MONTH = previous_month(THIS_MONTH)
+
+@pytest.fixture
+def earnings_setup(db, make_coach):
+    """Ann has 60 + 80 (first_time) this month and 50 last month on Center Court,
+    Ben 40 this month on Side Court; upcoming and cancelled bookings never count"""
+    ann, ben = make_coach('Ann'), make_coach('Ben')
+    center, side = Court(name='Center Court'), Court(name='Side Court')
+    student = User(first_name='Sam', last_name='Student', email='sam@example.com')
+    db.session.add_all([center, side, student])
+    db.session.flush()
+
+    def book(coach, court, day, hour, price, status='completed', discount_type=None):
+        slot = Availability(coach_id=coach.id, court_id=court.id, date=day,
+                            start_time=time(hour), end_time=time(hour + 1), is_booked=True)
+        db.session.add(slot)
+        db.session.flush()
+        db.session.add(Booking(
+            student_id=student.id, coach_id=coach.id, court_id=court.id, availability_id=slot.id,
+            date=day, start_time=slot.start_time, end_time=slot.end_time, status=status,
+            base_price=price, price=price, coach_fee=price - 10.0, court_fee=10.0,
+            discount_type=discount_type
+        ))
+
+    book(ann, center, THIS_MONTH, 8, 60.0)
+    book(ann, center, THIS_MONTH, 9, 80.0, discount_type='first_time')
+    book(ann, center, LAST_MONTH, 8, 50.0)
+    book(ann, center, THIS_MONTH, 10, 999.0, status='upcoming')
+    book(ann, side, THIS_MONTH, 11, 999.0, status='cancelled')
+    book(ben, side, THIS_MONTH, 8, 40.0)
+    db.session.commit()
+    return {'ann': ann.id, 'ben': ben.id, 'ann_user': ann.user_id}
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """(template name, context) of every page the admin views render"""
+    pages = []
+
+    def render_template(name, **context):
+        pages.append((name, context))
+        return ''
+
+    monkeypatch.setattr(admin_routes, 'render_template', render_template)
+    return pages
+
+def test_report_aggregates_in_two_queries(earnings_setup, assert_query_budget):
+    ann, ben = earnings_setup['ann'], earnings_setup['ben']
+
+    with assert_query_budget(2):
+        report = EarningsReport([ann, ben])
+
+    assert report.total == 230.0
+    assert report.sessions == 4
+    assert report.month(THIS_MONTH) == 180.0
+    assert report.month(LAST_MONTH) == 50.0
+    assert report.by_court() == {'Center Court': 190.0, 'Side Court': 40.0}
+    assert report.by_coach() == {'Ann Test': 190.0, 'Ben Test': 40.0}
+    assert report.coaches[ann].sessions == 3
+    assert report.breakdown() == {
+        'regular': {'sessions': 3, 'amount': 150.0},
+        'first_time': {'sessions': 1, 'amount': 80.0}
+    }
+    assert report.breakdown(include_empty=True)['package'] == {'sessions': 0, 'amount': 0.0}
+
+def test_report_filters(earnings_setup, assert_query_budget):
+    ann = earnings_setup['ann']
+
+    with assert_query_budget(1):
+        totals_only = EarningsReport([ann], by_court_and_coach=False)
+    assert totals_only.total == 190.0
+    assert totals_only.coaches == {}
+
+    assert EarningsReport([ann], start_date=THIS_MONTH).total == 140.0
+    assert EarningsReport(end_date=LAST_MONTH).total == 50.0
+    assert EarningsReport([]).total == 0.0
+
+def test_coach_earnings_endpoint(client, db, earnings_setup, login, assert_query_budget):
+    login(db.session.get(User, earnings_setup['ann_user']))
+
+    # The signed-in user, their coach and the report's two queries
+    with assert_query_budget(4):
+        response = client.get('/api/coach/earnings/3')
+
+    assert response.status_code == 200
+    earnings = response.get_json()
+    assert earnings['total'] == 190.0
+    assert earnings['this_month'] == 140.0
+    assert earnings['last_month'] == 50.0
+    assert earnings['monthly'] == {
+        start.strftime('%B %Y'): amount
+        for start, amount in zip(month_starts(3), (0.0, 50.0, 140.0))
+    }
+    assert earnings['by_court'] == {'Center Court': 190.0}
+    assert earnings['breakdown'] == {
+        'regular': {'sessions': 2, 'amount': 110.0},
+        'first_time': {'sessions': 1, 'amount': 80.0}
+    }
+
+    # Anything but a number of months shows the last twelve
+    assert len(client.get('/api/coach/earnings/year').get_json()['monthly']) == 12
+
+def test_admin_dashboard_revenue(client, db, earnings_setup, login, rendered):
+    admin = User(first_name='Ada', last_name='Admin', email='ada@example.com', is_admin=True)
+    db.session.add(admin)
+    db.session.commit()
+    login(admin)
+
+    assert client.get('/admin/dashboard').status_code == 200
+    name, context = rendered.pop()
+    assert name == 'dashboard/admin/index.html'
+    assert context['total_revenue'] == 230.0
+    assert context['monthly_revenue'][calendar.month_name[THIS_MONTH.month]] == 180.0
+    if LAST_MONTH.year == THIS_MONTH.year:
+        assert context['monthly_revenue'][calendar.month_name[LAST_MONTH.month]] == 50.0
+
+    assert client.get('/admin/earnings').status_code == 200
+    name, context = rendered.pop()
+    assert name == 'dashboard/admin/earnings.html'
+    assert context['total_earnings'] == 230.0
+    assert context['this_month_earnings'] == 180.0
+    assert context['last_month_earnings'] == 50.0
+    assert sorted(context['court_earnings']) == [('Center Court', 190.0), ('Side Court', 40.0)]
+    assert sorted((coach.first_name, coach.sessions, coach.earnings) for coach in context['coach_earnings']) == [
+        ('Ann', 3, 190.0), ('Ben', 1, 40.0)
+    ]
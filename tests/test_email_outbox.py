@@ -0,0 +1,129 @@
+# tests/test_email_outbox.py
+import smtplib
+from datetime import datetime, timedelta
+import pytest
+from flask_mail import BadHeaderError
+from app.models.email_outbox import EmailOutbox
+from app.utils.email_outbox import (
+    MAX_ATTEMPTS, STALE_CLAIM, queue_email, queue_emails, claim_batch, drain_outbox, is_permanent_failure
+)
+from app.utils.smtp_debug import DebugSMTPServer
+
+@pytest.fixture
+def smtp_server(app, monkeypatch):
+    """A DebugSMTPServer on a free port that Flask-Mail sends to"""
+    server = DebugSMTPServer(('127.0.0.1', 0), reject={'gone@example.com'}, defer={'busy@example.com'}).start()
+    state = app.extensions['mail']
+    monkeypatch.setattr(state, 'server', '127.0.0.1')
+    monkeypatch.setattr(state, 'port', server.port)
+    monkeypatch.setattr(state, 'use_tls', False)
+    monkeypatch.setattr(state, 'use_ssl', False)
+    monkeypatch.setattr(state, 'username', None)
+    monkeypatch.setattr(state, 'suppress', False)
+    yield server
+    server.stop()
+
+def _queue(db, *recipients):
+    emails = [queue_email(f'Hello {recipient}', [recipient], 'Text body', '<p>HTML body</p>') for recipient in recipients]
+    db.session.commit()
+    return emails
+
+def test_queued_emails_are_sent_over_one_connection(db, smtp_server):
+    queue_emails([
+        {'subject': f'Booking {number}', 'recipients': [f'student{number}@example.com'],
+         'text_body': f'Booking {number} confirmed', 'html_body': f'<p>Booking {number} confirmed</p>'}
+        for number in range(3)
+    ])
+    db.session.commit()
+
+    assert drain_outbox() == (3, 0)
+
+    assert [email.recipients for email in smtp_server.messages] == [
+        ['student0@example.com'], ['student1@example.com'], ['student2@example.com']
+    ]
+    assert smtp_server.messages[0].message['Subject'] == 'Booking 0'
+    assert smtp_server.connections == 1
+    assert {(email.status, email.attempts) for email in EmailOutbox.query} == {('sent', 1)}
+    assert EmailOutbox.query.filter(EmailOutbox.sent_at.is_(None)).count() == 0
+
+def test_rolled_back_emails_are_never_sent(db, smtp_server):
+    queue_email('Never', ['student@example.com'], 'Text', '<p>HTML</p>')
+    db.session.rollback()
+
+    assert drain_outbox() == (0, 0)
+    assert smtp_server.messages == []
+
+def test_claim_batch_takes_due_and_stale_rows_only(db):
+    now = datetime.utcnow()
+    due, future, stale, claimed = (EmailOutbox(
+        subject=name, sender='noreply@example.com', recipients=['student@example.com'],
+        status=status, next_attempt_at=next_attempt_at, claimed_at=claimed_at
+    ) for name, status, next_attempt_at, claimed_at in (
+        ('due', 'pending', now - timedelta(seconds=1), None),
+        ('future', 'pending', now + timedelta(minutes=5), None),
+        ('stale', 'sending', now - timedelta(hours=1), now - STALE_CLAIM - timedelta(minutes=1)),
+        ('claimed', 'sending', now - timedelta(hours=1), now - timedelta(minutes=1))
+    ))
+    db.session.add_all([due, future, stale, claimed])
+    db.session.commit()
+
+    batch = claim_batch(10)
+
+    assert sorted(email.subject for email in batch) == ['due', 'stale']
+    assert len({email.claim_token for email in batch}) == 1
+    assert {email.status for email in batch} == {'sending'}
+    # Claimed rows are no longer due for the next worker
+    assert claim_batch(10) == []
+
+def test_temporary_failures_are_retried_with_backoff(db, smtp_server):
+    email, = _queue(db, 'busy@example.com')
+
+    before = datetime.utcnow()
+    assert drain_outbox() == (0, 1)
+
+    db.session.refresh(email)
+    assert email.status == 'pending'
+    assert email.attempts == 1
+    assert email.claim_token is None
+    assert '451' in email.last_error
+    # First retry after 30 seconds, give or take the 20% jitter
+    assert before + timedelta(seconds=24) <= email.next_attempt_at <= datetime.utcnow() + timedelta(seconds=36)
+    assert smtp_server.messages == []
+
+    # Not due yet, so draining again sends nothing
+    assert drain_outbox() == (0, 0)
+
+def test_temporary_failures_give_up_after_max_attempts(db, smtp_server):
+    email, = _queue(db, 'busy@example.com')
+    email.attempts = MAX_ATTEMPTS - 1
+    db.session.commit()
+
+    assert drain_outbox() == (0, 1)
+
+    db.session.refresh(email)
+    assert (email.status, email.attempts) == ('failed', MAX_ATTEMPTS)
+
+def test_rejected_recipients_fail_permanently(db, smtp_server):
+    rejected, delivered = _queue(db, 'gone@example.com', 'student@example.com')
+
+    assert drain_outbox() == (1, 1)
+
+    db.session.refresh(rejected)
+    db.session.refresh(delivered)
+    assert (rejected.status, rejected.attempts) == ('failed', 1)
+    assert '550' in rejected.last_error
+    assert delivered.status == 'sent'
+    assert [email.recipients for email in smtp_server.messages] == [['student@example.com']]
+
+def test_is_permanent_failure():
+    assert is_permanent_failure(smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'No such user')}))
+    assert not is_permanent_failure(smtplib.SMTPRecipientsRefused({
+        'a@example.com': (550, b'No such user'),
+        'b@example.com': (451, b'Try again later')
+    }))
+    assert is_permanent_failure(smtplib.SMTPDataError(554, b'Message rejected'))
+    assert not is_permanent_failure(smtplib.SMTPDataError(421, b'Service not available'))
+    assert not is_permanent_failure(smtplib.SMTPAuthenticationError(535, b'Bad credentials'))
+    assert not is_permanent_failure(smtplib.SMTPServerDisconnected('Connection unexpectedly closed'))
+    assert not is_permanent_failure(ConnectionRefusedError())
+    assert is_permanent_failure(BadHeaderError('Bad header'))
@@ -0,0 +1,128 @@
+# tests/test_email_render.py
+from datetime import date, time
+import pytest
+from app.models.user import User
+from app.models.court import Court
+from app.models.booking import Availability, Booking
+from app.models.email_outbox import EmailOutbox
+from app.utils.email import send_booking_confirmation, send_booking_emails, send_booking_digest
+from app.utils.email_render import BookingEmailContext, load_booking_contexts, get_email_templates, render_email
+
+@pytest.fixture
+def email_templates(app, monkeypatch):
+    """An empty compiled-template cache for the test"""
+    cache = {}
+    monkeypatch.setitem(app.extensions, 'email_templates', cache)
+    return cache
+
+def _add_bookings(db, coach, count, first=0):
+    court = Court(name='Center Court', address='1 Main St', city='Springfield')
+    db.session.add(court)
+    db.session.flush()
+    bookings = []
+    for i in range(first, first + count):
+        student = User(first_name=f'Student{i}', last_name='Test', email=f'student{i}@example.com')
+        slot = Availability(coach_id=coach.id, court_id=court.id, date=date(2030, 1, 7 + i),
+                            start_time=time(9), end_time=time(10), is_booked=True)
+        db.session.add_all([student, slot])
+        db.session.flush()
+        booking = Booking(
+            student_id=student.id, coach_id=coach.id, court_id=court.id, availability_id=slot.id,
+            date=slot.date, start_time=slot.start_time, end_time=slot.end_time,
+            base_price=60.0, price=60.0, coach_fee=50.0, court_fee=10.0
+        )
+        db.session.add(booking)
+        bookings.append(booking)
+    db.session.commit()
+    return [booking.id for booking in bookings]
+
+def test_load_booking_contexts(db, make_coach, assert_query_budget):
+    booking_ids = _add_bookings(db, make_coach('Ann'), 2)
+
+    with assert_query_budget(1):
+        contexts = load_booking_contexts([booking_ids[1], 12345, booking_ids[0], booking_ids[1]])
+
+    assert list(contexts) == [booking_ids[1], booking_ids[0]]
+    assert contexts[booking_ids[0]] == BookingEmailContext(
+        booking_id=booking_ids[0],
+        date='Monday, January 07, 2030',
+        start_time='09:00 AM',
+        end_time='10:00 AM',
+        status='upcoming',
+        price='60.00',
+        coach_fee='50.00',
+        court_fee='10.00',
+        court_name='Center Court',
+        court_address='1 Main St, Springfield',
+        student_first_name='Student0',
+        student_name='Student0 Test',
+        student_email='student0@example.com',
+        coach_first_name='Ann',
+        coach_name='Ann Test',
+        coach_email='coach1@example.com'
+    )
+
+def test_booking_email_renders_from_one_query(db, make_coach, email_templates, assert_query_budget):
+    booking_id, = _add_bookings(db, make_coach('Ann'), 1)
+    booking = db.session.get(Booking, booking_id)
+
+    # The preloaded context is the only read; the outbox row is written on commit
+    with assert_query_budget(1):
+        send_booking_confirmation(booking)
+    db.session.commit()
+
+    email = EmailOutbox.query.one()
+    assert email.recipients == ['student0@example.com']
+    assert email.subject == 'Booking Confirmation - Pickleball Connect'
+    assert 'Hi Student0,' in email.text_body
+    assert 'Your session with Ann Test is booked.' in email.text_body
+    assert 'Date: Monday, January 07, 2030' in email.text_body
+    assert 'Court: Center Court, 1 Main St, Springfield' in email.text_body
+    assert 'Ann Test' in email.html_body
+    assert 'booking_confirmation' in email_templates
+
+def test_bulk_emails_cost_the_same_queries_for_any_count(db, make_coach, email_templates, assert_query_budget):
+    coach = make_coach('Ann')
+    few_ids = _add_bookings(db, coach, 1)
+    many_ids = _add_bookings(db, coach, 8, first=1)
+
+    with assert_query_budget(2) as few:
+        assert send_booking_emails('booking_confirmation', few_ids, 'Booking Confirmation', 'student') == 1
+    with assert_query_budget(2) as many:
+        assert send_booking_emails('booking_confirmation', many_ids, 'Booking Confirmation', 'student') == 8
+    assert many.count == few.count
+    db.session.commit()
+
+    assert EmailOutbox.query.count() == 9
+
+def test_booking_digest_groups_by_recipient(db, make_coach, email_templates, assert_query_budget):
+    booking_ids = _add_bookings(db, make_coach('Ann'), 3)
+
+    with assert_query_budget(2):
+        assert send_booking_digest(booking_ids) == 1
+    db.session.commit()
+
+    email = EmailOutbox.query.one()
+    assert email.recipients == ['coach1@example.com']
+    assert 'Hi Ann,' in email.text_body
+    assert 'You have 3 bookings:' in email.text_body
+    assert 'with Student2 Test ($60.00)' in email.text_body
+
+def test_templates_are_compiled_once(app, db, email_templates, monkeypatch):
+    templates = get_email_templates('booking_confirmation')
+    assert get_email_templates('booking_confirmation') is templates
+
+    loaded = []
+    get_template = app.jinja_env.get_template
+
+    def recording_get_template(name, *args, **kwargs):
+        loaded.append(name)
+        return get_template(name, *args, **kwargs)
+
+    monkeypatch.setattr(app.jinja_env, 'get_template', recording_get_template)
+    context = BookingEmailContext(*(['x'] * len(BookingEmailContext._fields)))
+    text_body, html_body = render_email('booking_confirmation', booking=context)
+    assert text_body.startswith('Hi x,')
+    # Only the included partials go back to the environment
+    assert 'email/booking_confirmation.txt' not in loaded
+    assert 'email/booking_confirmation.html' not in loaded
@@ -0,0 +1,185 @@
+# tests/test_exports.py
+import csv
+import io
+import json
+from datetime import date, time
+import pytest
+from app.models.user import User
+from app.models.court import Court
+from app.models.academy import Academy, AcademyCoach, AcademyManager
+from app.models.booking import Availability, Booking
+from app.models.session_log import SessionLog
+from app.utils.exports import BOOKING_EXPORT_FIELDS, EARNINGS_EXPORT_FIELDS, booking_export_rows
+
+@pytest.fixture
+def export_setup(db, make_coach):
+    """Two coaches of one academy, with bookings on the 1st, 2nd and 5th of March 2030"""
+    coach, other_coach = make_coach('Ann'), make_coach('Ben')
+    court = Court(name='Center Court')
+    student = User(first_name='Sam', last_name='Student', email='sam@example.com')
+    db.session.add_all([court, student])
+    db.session.flush()
+
+    def book(booking_coach, day, status='completed', price=60.0):
+        slot = Availability(coach_id=booking_coach.id, court_id=court.id, date=date(2030, 3, day),
+                            start_time=time(9), end_time=time(10), is_booked=True)
+        db.session.add(slot)
+        db.session.flush()
+        booking = Booking(
+            student_id=student.id, coach_id=booking_coach.id, court_id=court.id, availability_id=slot.id,
+            date=slot.date, start_time=slot.start_time, end_time=slot.end_time, status=status,
+            base_price=price, price=price, coach_fee=price - 10.0, court_fee=10.0
+        )
+        db.session.add(booking)
+        db.session.flush()
+        return booking
+
+    bookings = [book(coach, 1), book(coach, 2, price=80.0), book(coach, 5, status='upcoming'), book(other_coach, 2)]
+    db.session.add(SessionLog(booking_id=bookings[0].id, coach_id=coach.id, student_id=student.id, title='Dinking drills'))
+
+    academy = Academy(name='Academy', private_url_code='academy')
+    manager = User(first_name='Mia', last_name='Manager', email='mia@example.com', is_academy_manager=True)
+    db.session.add_all([academy, manager])
+    db.session.flush()
+    db.session.add_all([
+        AcademyCoach(academy_id=academy.id, coach_id=coach.id),
+        AcademyCoach(academy_id=academy.id, coach_id=other_coach.id),
+        AcademyManager(academy_id=academy.id, user_id=manager.id)
+    ])
+    db.session.commit()
+    return {'coach': coach, 'other_coach': other_coach, 'court': court, 'student': student,
+            'manager': manager, 'bookings': bookings}
+
+def _csv_rows(response):
+    reader = csv.DictReader(io.StringIO(response.get_data(as_text=True)))
+    return reader.fieldnames, list(reader)
+
+def _ndjson_rows(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_booking_export_rows(export_setup):
+    coach, bookings = export_setup['coach'], export_setup['bookings']
+
+    rows = list(booking_export_rows([coach.id]))
+
+    assert [row['booking_id'] for row in rows] == [booking.id for booking in bookings[:3]]
+    assert list(rows[0]) == BOOKING_EXPORT_FIELDS
+    assert rows[0] == {
+        'booking_id': bookings[0].id,
+        'date': '2030-03-01',
+        'start_time': '09:00:00',
+        'end_time': '10:00:00',
+        'status': 'completed',
+        'coach_id': coach.id,
+        'coach_name': 'Ann Test',
+        'student_id': export_setup['student'].id,
+        'student_name': 'Sam Student',
+        'student_email': 'sam@example.com',
+        'court_id': export_setup['court'].id,
+        'court_name': 'Center Court',
+        'base_price': 60.0,
+        'price': 60.0,
+        'coach_fee': 50.0,
+        'court_fee': 10.0,
+        'discount_type': 'regular',
+        'discount_amount': 0.0,
+        'coaching_payment_status': 'pending',
+        'court_payment_status': 'not_required',
+        'session_log_title': 'Dinking drills'
+    }
+    assert rows[1]['session_log_title'] is None
+
+    between = list(booking_export_rows([coach.id], date(2030, 3, 2), date(2030, 3, 4)))
+    assert [row['booking_id'] for row in between] == [bookings[1].id]
+
+def test_export_bookings_csv(client, export_setup, login):
+    login(export_setup['coach'].user)
+
+    response = client.get('/api/coach/bookings/export.csv?start_date=2030-03-02')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="bookings.csv"'
+    fields, rows = _csv_rows(response)
+    assert fields == BOOKING_EXPORT_FIELDS
+    assert [row['date'] for row in rows] == ['2030-03-02', '2030-03-05']
+    assert rows[0]['booking_id'] == str(export_setup['bookings'][1].id)
+    assert rows[0]['price'] == '80.0'
+    assert rows[0]['session_log_title'] == ''
+
+def test_export_bookings_ndjson(client, export_setup, login):
+    login(export_setup['coach'].user)
+
+    response = client.get('/api/coach/bookings/export.ndjson?end_date=2030-03-02')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="bookings.ndjson"'
+    rows = _ndjson_rows(response)
+    assert [row['booking_id'] for row in rows] == [booking.id for booking in export_setup['bookings'][:2]]
+    assert list(rows[0]) == BOOKING_EXPORT_FIELDS
+    assert rows[0]['session_log_title'] == 'Dinking drills'
+
+def test_export_earnings_csv(client, export_setup, login):
+    login(export_setup['coach'].user)
+
+    response = client.get('/api/coach/earnings/export.csv')
+
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename="earnings.csv"'
+    fields, rows = _csv_rows(response)
+    assert fields == EARNINGS_EXPORT_FIELDS
+    # Only completed sessions count
+    assert [(row['date'], row['sessions'], row['gross'], row['coach_fees'], row['court_fees']) for row in rows] == [
+        ('2030-03-01', '1', '60.0', '50.0', '10.0'),
+        ('2030-03-02', '1', '80.0', '70.0', '10.0')
+    ]
+    assert rows[0]['coach_name'] == 'Ann Test'
+    assert rows[0]['court_name'] == 'Center Court'
+    assert rows[0]['discount_type'] == 'regular'
+
+def test_export_earnings_ndjson_for_an_academy_manager(client, export_setup, login):
+    login(export_setup['manager'])
+
+    response = client.get('/api/coach/earnings/export.ndjson?start_date=2030-03-02&end_date=2030-03-02')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    rows = _ndjson_rows(response)
+    assert [(row['coach_name'], row['sessions'], row['gross']) for row in rows] == [
+        ('Ann Test', 1, 80.0),
+        ('Ben Test', 1, 60.0)
+    ]
+    assert list(rows[0]) == EARNINGS_EXPORT_FIELDS
+
+    response = client.get(f"/api/coach/earnings/export.ndjson?coach_id={export_setup['other_coach'].id}")
+    assert [row['coach_id'] for row in _ndjson_rows(response)] == [export_setup['other_coach'].id]
+
+def test_export_authorisation(client, db, export_setup, login):
+    assert client.get('/api/coach/bookings/export.csv').status_code in (302, 401)
+
+    login(export_setup['student'])
+    for url in ('/api/coach/bookings/export.csv', '/api/coach/earnings/export.ndjson'):
+        response = client.get(url)
+        assert response.status_code == 403
+        assert response.get_json() == {'error': 'Access denied'}
+
+    # Coaches only see their own bookings, whatever coach_id asks for
+    login(export_setup['other_coach'].user)
+    response = client.get(f"/api/coach/bookings/export.ndjson?coach_id={export_setup['coach'].id}")
+    assert [row['coach_id'] for row in _ndjson_rows(response)] == [export_setup['other_coach'].id]
+
+    outsider = User(first_name='Olly', last_name='Outsider', email='olly@example.com', is_academy_manager=True)
+    db.session.add(outsider)
+    db.session.commit()
+    login(outsider)
+    response = client.get(f"/api/coach/bookings/export.csv?coach_id={export_setup['coach'].id}")
+    assert response.status_code == 403
+
+def test_export_rejects_bad_formats_and_dates(client, export_setup, login):
+    login(export_setup['coach'].user)
+
+    assert client.get('/api/coach/bookings/export.xlsx').status_code == 400
+    response = client.get('/api/coach/earnings/export.csv?start_date=03/01/2030')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid date format. Use YYYY-MM-DD'}
@@ -0,0 +1,47 @@
+# tests/test_file_store.py
+import os
+from datetime import datetime, timedelta
+from collections import Counter
+import pytest
+from app.models.stored_file import StoredFile
+from app.utils import file_store
+from app.utils.file_store import register_blob, release_file, acquire_file, collect_garbage
+
+@pytest.fixture
+def upload_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    return tmp_path
+
+def _stored_blob(db, upload_folder, digest):
+    path = f"proofs/{digest[:2]}/{digest}.png"
+    full_path = upload_folder / path
+    full_path.parent.mkdir(parents=True, exist_ok=True)
+    full_path.write_bytes(b'data')
+    (full_path.parent / f"{digest}_thumb.png").write_bytes(b'thumb')
+    register_blob(path, digest, 4)
+    release_file(path)
+    StoredFile.query.filter_by(path=path).update({StoredFile.released_at: datetime.utcnow() - timedelta(days=1)})
+    db.session.commit()
+    return path, full_path
+
+def test_collect_garbage_removes_released_blobs(db, upload_folder):
+    path, full_path = _stored_blob(db, upload_folder, 'a' * 64)
+
+    assert collect_garbage() == (1, 0)
+    assert StoredFile.query.count() == 0
+    assert os.listdir(full_path.parent) == []
+
+def test_collect_garbage_keeps_blobs_referenced_before_the_delete(db, upload_folder, monkeypatch):
+    path, full_path = _stored_blob(db, upload_folder, 'b' * 64)
+
+    def count_references(paths):
+        # Another request takes a reference after the candidates were loaded
+        list(paths)
+        acquire_file(path)
+        return Counter()
+    monkeypatch.setattr(file_store, 'count_references', count_references)
+
+    assert collect_garbage() == (0, 0)
+    assert StoredFile.query.filter_by(path=path).one().ref_count == 1
+    assert full_path.exists()
+    assert len(os.listdir(full_path.parent)) == 2
@@ -0,0 +1,20 @@
+# tests/test_geo.py
+from app.models.court import Court
+from app.utils.geo import cells_for_radius, find_courts_near, grid_cell
+
+def test_cells_wrap_at_the_antimeridian():
+    cells = cells_for_radius(-17.0, 179.98, 10)
+    assert grid_cell(-17.0, -179.95) in cells
+    assert all(-1800 <= int(cell.split(':')[1]) < 1800 for cell in cells)
+    assert grid_cell(0.0, 180.0) == grid_cell(0.0, -180.0)
+
+def test_find_courts_near_across_the_antimeridian(db):
+    east = Court(name='Taveuni East')
+    east.set_coordinates(-16.99, -179.97)
+    west = Court(name='Taveuni West')
+    west.set_coordinates(-17.01, 179.97)
+    db.session.add_all([east, west])
+    db.session.commit()
+
+    assert {court_id for court_id, _ in find_courts_near(-17.0, 179.99, 10)} == {east.id, west.id}
+    assert {court_id for court_id, _ in find_courts_near(-17.0, -179.99, 10)} == {east.id, west.id}
@@ -0,0 +1,62 @@
+# tests/test_profile_cache.py
+import pytest
+from app.models.coach import CoachProfileVersion
+from app.models.academy import Academy, AcademyCoach, AcademyCoachRole
+from app.utils.profile_cache import profile_cache
+
+@pytest.fixture
+def coach(db, make_coach):
+    profile_cache.clear()
+    coach = make_coach()
+    academy = Academy(name='Academy', private_url_code='academy')
+    role = AcademyCoachRole(name='Coach')
+    db.session.add_all([academy, role])
+    db.session.flush()
+    db.session.add(AcademyCoach(coach_id=coach.id, academy_id=academy.id, role_id=role.id))
+    db.session.commit()
+    return coach
+
+def test_unchanged_profile_revalidates_with_304(client, coach):
+    response = client.get(f'/public/api/coach/{coach.id}')
+    etag = response.headers['ETag']
+
+    response = client.get(f'/public/api/coach/{coach.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+def test_role_rename_changes_the_etag(client, db, coach):
+    etag = client.get(f'/public/api/coach/{coach.id}').headers['ETag']
+
+    AcademyCoachRole.query.one().name = 'Head Coach'
+    db.session.commit()
+
+    response = client.get(f'/public/api/coach/{coach.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['academy_affiliations'][0]['role'] == 'Head Coach'
+
+def test_restarted_versions_do_not_revalidate_stale_profiles(client, db, coach):
+    etag = client.get(f'/public/api/coach/{coach.id}').headers['ETag']
+    stamp = db.session.get(CoachProfileVersion, coach.id)
+    version = stamp.version
+
+    coach.biography = 'Changed'
+    db.session.commit()
+    # Versions start over (e.g. the table was recreated) and reach the old number again
+    stamp.version = version
+    db.session.commit()
+    profile_cache.clear()
+
+    response = client.get(f'/public/api/coach/{coach.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['biography'] == 'Changed'
+
+def test_only_profile_user_columns_bump_the_version(db, coach):
+    version = db.session.get(CoachProfileVersion, coach.id).version
+
+    coach.user.password_hash = 'changed'
+    db.session.commit()
+    assert db.session.get(CoachProfileVersion, coach.id).version == version
+
+    coach.user.first_name = 'Renamed'
+    db.session.commit()
+    db.session.expire_all()
+    assert db.session.get(CoachProfileVersion, coach.id).version == version + 1
@@ -0,0 +1,32 @@
+# tests/test_query_stats.py
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.utils.query_stats import QueryBudgetExceeded, fingerprint, query_budget
+
+def test_fingerprint_collapses_values():
+    assert fingerprint("SELECT * FROM booking WHERE id IN (?, ?, ?) AND status = 'done'") == \
+        fingerprint("SELECT *  FROM booking WHERE id IN (?) AND status = 'upcoming'")
+
+def test_query_budget(db):
+    with query_budget(2) as stats:
+        db.session.execute(text('SELECT 1'))
+        db.session.execute(text('SELECT 2'))
+    assert stats.count == 2
+
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(1):
+            db.session.execute(text('SELECT 1'))
+            db.session.execute(text('SELECT 2'))
+
+def test_failed_statements_do_not_leak_start_times(db):
+    connection = db.session.connection()
+
+    with query_budget(10) as stats:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text('SELECT * FROM no_such_table'))
+        connection.execute(text('SELECT 1'))
+
+    assert connection.info['query_start'] == []
+    assert stats.count == 1
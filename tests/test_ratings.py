@@ -0,0 +1,31 @@
+# tests/test_ratings.py
+from app.models.user import User
+from app.models.rating import CoachRating, CoachRatingSummary
+
+def test_rating_summary_follows_ratings(db, make_coach):
+    coach = make_coach()
+    students = [User(first_name='Student', last_name=str(i), email=f'student{i}@example.com') for i in range(3)]
+    db.session.add_all(students)
+    db.session.flush()
+
+    # The first rating creates the summary row, later ones update it in place
+    ratings = [CoachRating(student_id=student.id, coach_id=coach.id, rating=rating)
+               for student, rating in zip(students, (5, 4, 2))]
+    for rating in ratings:
+        db.session.add(rating)
+        db.session.flush()
+    db.session.commit()
+
+    summary = db.session.get(CoachRatingSummary, coach.id)
+    assert (summary.rating_count, summary.rating_sum, summary.avg_rating) == (3, 11.0, 11.0 / 3)
+    assert summary.histogram == {1: 0, 2: 1, 3: 0, 4: 1, 5: 1}
+
+    ratings[2].rating = 3
+    db.session.delete(ratings[0])
+    db.session.commit()
+    db.session.refresh(summary)
+    assert (summary.rating_count, summary.avg_rating) == (2, 3.5)
+    assert summary.histogram == {1: 0, 2: 0, 3: 1, 4: 1, 5: 0}
+
+    CoachRatingSummary.rebuild()
+    assert CoachRatingSummary.get_for_coach(coach.id) == (3.5, 2)
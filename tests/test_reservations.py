@@ -0,0 +1,77 @@
+# tests/test_reservations.py
+import json
+from datetime import date, datetime, time, timedelta
+import pytest
+from app.models.user import User
+from app.models.court import Court
+from app.models.booking import Availability, AvailabilityReservation
+
+@pytest.fixture
+def slots(db, make_coach):
+    coach = make_coach()
+    court = Court(name='Court')
+    db.session.add(court)
+    db.session.flush()
+    slots = [
+        Availability(coach_id=coach.id, court_id=court.id, date=date(2030, 1, 7),
+                     start_time=time(hour, 0), end_time=time(hour + 1, 0))
+        for hour in (9, 10)
+    ]
+    db.session.add_all(slots)
+    db.session.commit()
+    return [slot.id for slot in slots]
+
+@pytest.fixture
+def students(db):
+    students = [User(first_name='Student', last_name=str(i), email=f'student{i}@example.com') for i in range(2)]
+    db.session.add_all(students)
+    db.session.commit()
+    return students
+
+def test_held_slot_conflicts_for_other_students(client, login, slots, students):
+    login(students[0])
+    assert client.post('/booking/api/reserve-slots', json={'availability_ids': slots}).status_code == 200
+    # Reserving again replaces the student's own holds
+    assert client.post('/booking/api/reserve-slots', json={'availability_ids': slots}).status_code == 200
+
+    login(students[1])
+    response = client.post('/booking/api/reserve-slots', json={'availability_ids': slots[1:]})
+    assert response.status_code == 409
+    assert response.get_json()['availability_id'] == slots[1]
+
+def test_expired_hold_does_not_block(client, db, login, slots, students):
+    db.session.add(AvailabilityReservation(
+        availability_id=slots[0], student_id=students[0].id, reservation_token='old',
+        expires_at=datetime.utcnow() - timedelta(seconds=1)
+    ))
+    db.session.commit()
+
+    login(students[1])
+    response = client.post('/booking/api/reserve-slots', json={'availability_ids': slots})
+    assert response.status_code == 200
+    holders = {row.availability_id: row.student_id for row in AvailabilityReservation.query}
+    assert holders == {slot_id: students[1].id for slot_id in slots}
+
+def test_availability_ids_posted_as_strings(client, login, slots, students):
+    login(students[0])
+    response = client.post('/booking/api/reserve-slots', json={'availability_ids': [str(slot_id) for slot_id in slots]})
+    assert response.status_code == 200
+    token = response.get_json()['reservation_token']
+
+    # The held slots are found again when checkout posts the ids as strings
+    response = client.post('/booking/api/bookings/create-with-proofs', data={
+        'reservation_token': token,
+        'bookings': json.dumps([{'availability_ids': [str(slot_id) for slot_id in slots]}])
+    })
+    assert response.get_json().get('code') != 'RESERVATION_EXPIRED'
+    assert response.get_json()['error'] == 'Coach payment proof is required for coaching fees'
+
+    for bad in (['abc'], [1.5], '12'):
+        response = client.post('/booking/api/reserve-slots', json={'availability_ids': bad})
+        assert response.status_code == 400
+        response = client.post('/booking/api/bookings/create-with-proofs', data={
+            'reservation_token': token,
+            'bookings': json.dumps([{'availability_ids': bad}])
+        })
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'availability_ids must be a list of integers'
@@ -0,0 +1,55 @@
+# tests/test_search.py
+from app.models.academy import Academy
+
+def _collect_pages(client, url):
+    coaches, cursor = [], None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        data = response.get_json()
+        coaches.extend(data['coaches'])
+        cursor = data['next_cursor']
+        if not cursor:
+            return coaches
+
+def test_coach_search_filters_and_pages_over_every_match(client, db, make_coach):
+    for i in range(30):
+        make_coach(first_name='Jordan', hourly_rate=40 + i, specialties='dinks')
+    make_coach(first_name='Casey', hourly_rate=60)
+    db.session.commit()
+
+    coaches = _collect_pages(client, '/public/api/coaches?query=jord&limit=7')
+    assert len(coaches) == 30
+    assert len({coach['id'] for coach in coaches}) == 30
+
+    response = client.get('/public/api/coaches?query=jordan&min_price=60&include_total=1')
+    data = response.get_json()
+    assert data['total']['count'] == 10
+    assert all(coach['hourly_rate'] >= 60 for coach in data['coaches'])
+
+    facets = client.get('/public/api/coaches/facets?query=jordan&min_price=60').get_json()
+    assert facets['total'] == 10
+    assert sum(bucket['count'] for bucket in facets['price']) == 30
+
+    response = client.get('/public/api/coaches?query=!!!')
+    assert response.get_json()['coaches'] == []
+
+def test_coach_search_sorts_by_relevance(client, db, make_coach):
+    make_coach(first_name='Alex', biography='Former tennis pro')
+    make_coach(first_name='Tennis', biography='Drills')
+    db.session.commit()
+
+    response = client.get('/public/api/coaches?query=tennis')
+    names = [coach['first_name'] for coach in response.get_json()['coaches']]
+    assert names == ['Tennis', 'Alex']
+
+def test_academy_search(client, db):
+    db.session.add_all([
+        Academy(name='Smash Academy', private_url_code='smash'),
+        Academy(name='Dink House', description='Home of the smash clinic', private_url_code='dink')
+    ])
+    db.session.commit()
+
+    response = client.get('/api/academies?query=smash')
+    names = [academy['name'] for academy in response.get_json()]
+    assert names == ['Smash Academy', 'Dink House']
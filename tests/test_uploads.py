@@ -0,0 +1,80 @@
+# tests/test_uploads.py
+import pytest
+
+DIGEST = 'c' * 64
+BLOB = f'proofs/{DIGEST[:2]}/{DIGEST}.png'
+
+@pytest.fixture
+def upload_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    (tmp_path / 'proofs' / DIGEST[:2]).mkdir(parents=True)
+    (tmp_path / BLOB).write_bytes(b'0123456789')
+    (tmp_path / 'logo.png').write_bytes(b'logo bytes')
+    return tmp_path
+
+def test_blobs_are_immutable_with_a_strong_etag(client, upload_folder):
+    response = client.get(f'/static/uploads/{BLOB}')
+
+    assert response.status_code == 200
+    assert response.data == b'0123456789'
+    assert response.headers['ETag'] == f'"{DIGEST}.png"'
+    assert response.headers['Cache-Control'] == 'max-age=31536000, public, immutable'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+    response = client.get(f'/static/uploads/{BLOB}', headers={'If-None-Match': f'"{DIGEST}.png"'})
+    assert response.status_code == 304
+    assert response.data == b''
+
+def test_other_uploads_are_cached_for_a_week(client, upload_folder):
+    response = client.get('/static/uploads/logo.png')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == f'max-age={60 * 60 * 24 * 7}, public'
+    etag = response.headers['ETag']
+    assert etag and etag != '"logo.png"'
+
+    assert client.get('/static/uploads/logo.png', headers={'If-None-Match': etag}).status_code == 304
+
+def test_byte_ranges(client, upload_folder):
+    response = client.get(f'/static/uploads/{BLOB}', headers={'Range': 'bytes=2-5'})
+
+    assert response.status_code == 206
+    assert response.data == b'2345'
+    assert response.headers['Content-Range'] == 'bytes 2-5/10'
+    assert response.headers['Cache-Control'] == 'max-age=31536000, public, immutable'
+
+def test_missing_and_escaping_paths_are_not_found(client, upload_folder):
+    assert client.get('/static/uploads/missing.png').status_code == 404
+    assert client.get('/static/uploads/../conftest.py').status_code == 404
+    assert client.get('/static/uploads/proofs').status_code == 404
+
+def test_x_sendfile_hands_the_file_to_the_front_server(app, client, upload_folder, monkeypatch):
+    monkeypatch.setitem(app.config, 'USE_X_SENDFILE', True)
+
+    response = client.get(f'/static/uploads/{BLOB}')
+
+    assert response.status_code == 200
+    assert response.headers['X-Sendfile'] == str(upload_folder / BLOB)
+    assert response.data == b''
+    assert response.headers['ETag'] == f'"{DIGEST}.png"'
+
+def test_accel_redirect_hands_the_file_to_nginx(app, client, upload_folder, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOADS_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
+
+    response = client.get(f'/static/uploads/{BLOB}')
+
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == f'/protected-uploads/{BLOB}'
+    assert response.mimetype == 'image/png'
+    assert response.data == b''
+    assert response.headers['ETag'] == f'"{DIGEST}.png"'
+    assert response.headers['Cache-Control'] == 'max-age=31536000, public, immutable'
+    assert response.headers['Last-Modified']
+
+    response = client.get(f'/static/uploads/{BLOB}', headers={'If-None-Match': f'"{DIGEST}.png"'})
+    assert response.status_code == 304
+    assert 'X-Accel-Redirect' in response.headers
+
+    response = client.get('/static/uploads/logo.png')
+    assert response.headers['X-Accel-Redirect'] == '/protected-uploads/logo.png'
+    assert response.headers['Cache-Control'] == f'max-age={60 * 60 * 24 * 7}, public'